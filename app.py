@@ -1,11 +1,24 @@
+import functools
 import os
+import threading
+import time
+import click
 import uuid
 from pathlib import Path
-from flask import Flask, render_template, redirect, request, url_for, jsonify, session, abort
+from flask import Flask, Response, render_template, redirect, request, url_for, jsonify, session, abort, g
+from flask import before_render_template, template_rendered
 from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
+import migrations
+from cache import ALL, CacheFactory
 from dbhandler import DBHandler
+from image_index import ImageIndex
+from jobs import JobQueue
+from metrics import QueryBudgetExceeded
+from images import PROFILE_VARIANTS, RECIPE_VARIANTS, generate_variants, image_sources, is_variant_file
+from pagination import decode_cursor, encode_cursor
+from sessions import ServerSideSessionInterface
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -43,36 +56,100 @@ if missing_required:
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY") or os.urandom(32)
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10 MB
+AUTOCOMPLETE_BUDGET_MS = float(os.environ.get("AUTOCOMPLETE_BUDGET_MS", "10"))
+# How each listing learns whether more pages exist: "count" shows "Page N of M" from a
+# cached total, "probe" fetches one extra row and only shows "Page N".
+LISTING_TOTALS = {
+    "feed": os.environ.get("FEED_TOTALS", "count"),
+    "search": os.environ.get("SEARCH_TOTALS", "count"),
+    "admin_ratings": os.environ.get("ADMIN_RATINGS_TOTALS", "probe"),
+}
+# Per-request profiling: a request issuing more than QUERY_BUDGET DB round-trips, or the same
+# statement N_PLUS_ONE_THRESHOLD times, logs a warning (raises QueryBudgetExceeded when testing
+# or with QUERY_BUDGET_STRICT=1). SERVER_TIMING=0 drops the Server-Timing header.
+app.config.update(
+    QUERY_BUDGET=int(os.environ.get("QUERY_BUDGET", "12")),
+    N_PLUS_ONE_THRESHOLD=int(os.environ.get("N_PLUS_ONE_THRESHOLD", "5")),
+    QUERY_BUDGET_STRICT=os.environ.get("QUERY_BUDGET_STRICT", "0") == "1",
+    SERVER_TIMING=os.environ.get("SERVER_TIMING", "1") == "1",
+)
 app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_SIZE
 app.config.update(
     SESSION_COOKIE_HTTPONLY=True,
     SESSION_COOKIE_SAMESITE="Lax",
     SESSION_COOKIE_SECURE=os.environ.get("SESSION_COOKIE_SECURE", "false").lower() == "true",
 )
+# Logged-in sessions stay server-side (SESSION_BACKEND: sqlite by default so every
+# worker shares it, "local" for a single process, or "redis"); their cookie only
+# carries a signed id. Anonymous sessions live in a signed cookie. The store has
+# no size cap unless SESSION_STORE_SIZE is set, so entries leave it only by expiry
+# or logout. Stored entries are signed with the app's secret key.
+app.session_interface = ServerSideSessionInterface(
+    CacheFactory(
+        backend=os.environ.get("SESSION_BACKEND", "sqlite"),
+        path=os.environ.get("SESSION_PATH") or BASE_DIR / "sessions.sqlite3",
+        bus_path=False,
+        secret=app.secret_key,
+    ).create(
+        "session",
+        maxsize=int(os.environ["SESSION_STORE_SIZE"]) if os.environ.get("SESSION_STORE_SIZE") else None,
+        ttl=app.permanent_session_lifetime.total_seconds(),
+    )
+)
 mydb = DBHandler()
-
-
-@app.before_request
-def ensure_session_role():
-    """Populate session role for logged in users."""
-    user_id = session.get('user') or session.get('user_id')
-    if user_id and not session.get('role'):
-        role = mydb.fetch_user_role(user_id)
-        if role:
-            session['role'] = role
-    if user_id and not session.get('user_id'):
-        session['user_id'] = user_id
-    if user_id and not session.get('user'):
-        session['user'] = user_id
-
-
-def get_current_user():
-    """Return (user_id, role) and hydrate session role if missing."""
+image_index = ImageIndex(
+    app.root_path,
+    refresh_interval=float(os.environ.get("IMAGE_INDEX_REFRESH", "30")),
+    on_lookup=lambda stat: mydb.metrics.note("fs_stats" if stat else "fs_lookups"),
+)
+if mydb.caches.bus is not None:
+    # Files written by another worker (uploads, variants) are indexed here as soon as it announces them.
+    mydb.caches.bus.subscribe("image_index", lambda path: image_index.scan() if path is ALL else image_index.add(path))
+app.jinja_env.globals["image_sources"] = lambda path, slot: image_sources(path, slot, image_index.exists)
+job_queue = JobQueue(
+    os.environ.get("JOB_QUEUE_PATH") or BASE_DIR / "jobs.sqlite3",
+    workers=int(os.environ.get("JOB_WORKERS", "2")),
+    on_job_done=mydb.release,
+    on_worker_start=mydb.use_background_pool,
+)
+mydb.use_job_queue(job_queue)
+_serving_lock = threading.Lock()
+_serving_started = False
+
+
+def start_serving():
+    """Build the in-memory indexes, check query plans and start the job workers, once per process.
+
+    Runs on the first request rather than at import, so CLI commands (flask migrate,
+    set-role, rebuild-*) neither pay for the scans nor start job workers that would
+    be killed mid-job when the command exits.
+    """
+    global _serving_started
+    if _serving_started:
+        return
+    with _serving_lock:
+        if _serving_started:
+            return
+        mydb.build_search_index()
+        # EXPLAIN the hot queries once so a missing index shows up in the logs, not as slow pages.
+        if os.environ.get("VERIFY_INDEXES", "1") == "1":
+            migrations.verify_indexes(mydb)
+        mydb.release()
+        image_index.scan()
+        job_queue.start()
+        _serving_started = True
+
+
+def get_current_user(fresh=False):
+    """Return (user_id, role); the role comes from the cached lookup so changes apply without re-login.
+
+    Admin-only views pass fresh=True so a revoked role takes effect at once in every worker.
+    """
     user_id = session.get('user') or session.get('user_id')
     role = session.get('role')
-    if user_id and not role:
-        role = mydb.fetch_user_role(user_id)
-        if role:
+    if user_id:
+        role = mydb.fetch_user_role(user_id, fresh=fresh) or role
+        if role and role != session.get('role'):
             session['role'] = role
     if user_id and not session.get('user_id'):
         session['user_id'] = user_id
@@ -90,6 +167,64 @@ def generate_csrf_token():
     return token
 
 
+@app.before_request
+def ensure_serving_started():
+    """Finish process startup on the first request (see start_serving)."""
+    start_serving()
+
+
+@app.before_request
+def start_query_metrics():
+    """Start counting DB round-trips for this request (see metrics.QueryMetrics)."""
+    g.query_metrics_token = mydb.metrics.start_request(request.endpoint)
+
+
+@app.before_request
+def apply_invalidations():
+    """Pick up cache/index invalidations published by the other workers (see cache.InvalidationBus)."""
+    mydb.poll_invalidations()
+
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def stop_template_timer(sender, template, context, **extra):
+    started = g.pop("template_started", None)
+    if started is not None:
+        mydb.metrics.note("template_time", time.perf_counter() - started)
+
+
+@app.after_request
+def report_request_profile(response):
+    """Emit a Server-Timing header and check the request against the query budget and N+1 pattern."""
+    mydb.flush_query_metrics()
+    stats = mydb.metrics.request_stats()
+    if stats is None:
+        return response
+    if app.config["SERVER_TIMING"]:
+        total_ms = (time.perf_counter() - stats["started"]) * 1000
+        response.headers["Server-Timing"] = ", ".join([
+            f'db;dur={stats["db_time"] * 1000:.1f};desc="{stats["queries"]} queries, {stats["rows"]} rows"',
+            f'tpl;dur={stats["template_time"] * 1000:.1f}',
+            f'fs;desc="{stats["fs_lookups"]} indexed, {stats["fs_stats"]} stat"',
+            f"total;dur={total_ms:.1f}",
+        ])
+    problems = []
+    if stats["queries"] > app.config["QUERY_BUDGET"]:
+        problems.append(f'{stats["queries"]} DB round-trips (budget {app.config["QUERY_BUDGET"]})')
+    for count, method, sql in mydb.metrics.repeated_statements(app.config["N_PLUS_ONE_THRESHOLD"]):
+        problems.append(f"possible N+1: {method} ran {count}x: {sql[:160]}")
+    if problems:
+        message = f'{request.method} {request.path} [{stats["endpoint"]}]: ' + "; ".join(problems)
+        if app.testing or app.config["QUERY_BUDGET_STRICT"]:
+            raise QueryBudgetExceeded(message)
+        app.logger.warning(message)
+    return response
+
+
 @app.before_request
 def csrf_protect():
     """Guard all POST requests by validating CSRF token from form/header/json."""
@@ -97,9 +232,11 @@ def csrf_protect():
         session_token = session.get("csrf_token")
         form_token = request.form.get("csrf_token")
         header_token = request.headers.get("X-CSRFToken") or request.headers.get("X-CSRF-Token")
-        json_payload = request.get_json(silent=True) or {}
-        json_token = json_payload.get("csrf_token") if isinstance(json_payload, dict) else None
-        token = form_token or header_token or json_token
+        token = form_token or header_token
+        if not token and request.is_json:
+            # Only parse JSON bodies when no form field or header carried the token.
+            json_payload = request.get_json(silent=True) or {}
+            token = json_payload.get("csrf_token") if isinstance(json_payload, dict) else None
         if not session_token or not token or session_token != token:
             abort(400)
 
@@ -110,6 +247,15 @@ def inject_csrf():
     return {"csrf_token": generate_csrf_token}
 
 
+@app.teardown_appcontext
+def release_db_connection(exc):
+    """Return the request's pooled DB connection once the request is done."""
+    mydb.release()
+    token = g.pop("query_metrics_token", None)
+    if token is not None:
+        mydb.metrics.finish_request(token)
+
+
 def create_user_account(name: str, email: str, password: str) -> bool:
     """Create a new user account and return True on success."""
     if not all([name, email, password]):
@@ -165,16 +311,90 @@ def detect_image_type(header_bytes: bytes):
     return None
 
 
-def build_difficulty_collections():
+DIFFICULTY_LEVELS = [
+    {"value": "Easy", "title": "Easy recipes"},
+    {"value": "Medium", "title": "Medium recipes"},
+    {"value": "Difficult", "title": "Difficult recipes"},
+]
+
+
+def register_image(path):
+    """Add a file written by this process to the image index and announce it to the other workers."""
+    image_index.add(path)
+    if mydb.caches.bus is not None:
+        mydb.caches.bus.publish("image_index", path)
+
+
+def store_image_variants(path, variants):
+    """Generate resized variants for an uploaded image and register them in the image index."""
+    for variant_path in generate_variants(app.root_path, path, variants):
+        register_image(variant_path)
+
+
+job_queue.register("image_variants", lambda payload: store_image_variants(payload["path"], payload["variants"]))
+
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Apply pending schema migrations."""
+    applied = migrations.migrate(mydb)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date.")
+    if applied:
+        interval = os.environ.get("SCHEMA_CHECK_INTERVAL", "30")
+        print(
+            f"Running servers switch to the new schema within {interval}s (or restart them). Writes made "
+            "before that skip the new counters: then run 'flask rebuild-ratings' and 'flask rebuild-user-stats'."
+        )
+
+
+@app.cli.command("rebuild-ratings")
+def rebuild_ratings_command():
+    """Rebuild rating_sum/rating_count counters and averages from the Ratings table."""
+    print("Rating aggregates rebuilt." if mydb.rebuild_rating_aggregates() else "Rebuild failed.")
+
+
+@app.cli.command("rebuild-user-stats")
+def rebuild_user_stats_command():
+    """Recompute the denormalized UserStats profile counters for every user."""
+    print("User stats rebuilt." if mydb.rebuild_user_stats() else "Rebuild failed.")
+
+
+@app.cli.command("rebuild-recommendations")
+def rebuild_recommendations_command():
+    """Recompute the precomputed similar-recipe lists for every active recipe."""
+    print("Recommendations rebuilt." if mydb.rebuild_recipe_neighbors() else "Rebuild failed.")
+
+
+@app.cli.command("set-role")
+@click.argument("user_id", type=int)
+@click.argument("role")
+def set_role_command(user_id, role):
+    """Change a user's role (e.g. admin/user); cached roles are invalidated."""
+    print("Role updated." if mydb.set_user_role(user_id, role) else "No such user or update failed.")
+
+
+@app.cli.command("generate-image-variants")
+def generate_image_variants_command():
+    """Backfill card/detail/avatar variants for images uploaded before the pipeline existed."""
+    for folder, variants in (("recipes", RECIPE_VARIANTS), ("profile", PROFILE_VARIANTS)):
+        upload_dir = os.path.join(app.root_path, "static", "img", folder)
+        if not os.path.isdir(upload_dir):
+            continue
+        for filename in sorted(os.listdir(upload_dir)):
+            if is_variant_file(filename):
+                continue
+            written = generate_variants(app.root_path, f"/static/img/{folder}/{filename}", variants)
+            print(f"{folder}/{filename}: {len(written)} variants")
+    image_index.scan()
+    if mydb.caches.bus is not None:
+        mydb.caches.bus.publish("image_index", ALL)
+
+
+def build_difficulty_collections(latest_by_difficulty):
     """Return home page collections for easy/medium/difficult recipes."""
-    difficulty_levels = [
-        {"value": "Easy", "title": "Easy recipes"},
-        {"value": "Medium", "title": "Medium recipes"},
-        {"value": "Difficult", "title": "Difficult recipes"},
-    ]
     collections = []
-    for level in difficulty_levels:
-        latest = mydb.fetch_latest_recipe_by_difficulty(level["value"])
+    for level in DIFFICULTY_LEVELS:
+        latest = latest_by_difficulty.get(level["value"])
         collections.append({
             "title": level["title"],
             "difficulty": level["value"],
@@ -188,8 +408,7 @@ def resolve_image_path(path: str):
     default_path = url_for('static', filename='media/registration.png')
     if not path:
         return default_path
-    candidate = os.path.join(app.root_path, path.lstrip("/"))
-    if os.path.exists(candidate):
+    if image_index.exists(path):
         return path
     return default_path
 
@@ -202,11 +421,77 @@ def apply_image_fallbacks(items: list, key: str = "image"):
         if not val:
             item[key] = default_path
             continue
-        candidate = os.path.join(app.root_path, str(val).lstrip("/"))
-        if not os.path.exists(candidate):
+        if not image_index.exists(val):
             item[key] = default_path
 
 
+def paginate_listing(endpoint: str, fetch, count, page: int, per_page: int, backward: bool = False):
+    """Fetch one listing page and its navigation using the endpoint's LISTING_TOTALS mode.
+
+    fetch(limit) returns rows carrying a sort_key; count() returns the exact total.
+    total_count/total_pages are None in probe mode. Page 2 links back to page 1
+    without a cursor so the first page stays cacheable.
+    """
+    if LISTING_TOTALS.get(endpoint) == "probe":
+        total_count = total_pages = None
+        if backward:
+            # Walking back from a later page: a next page exists by construction.
+            rows, has_next = fetch(per_page), True
+        else:
+            rows = fetch(per_page + 1)
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+    else:
+        total_count = count()
+        total_pages = max(1, (total_count + per_page - 1) // per_page)
+        rows = fetch(per_page)
+        has_next = page < total_pages
+    prev_page = page - 1 if page > 1 and (total_pages is None or page <= total_pages) else None
+    return {
+        "rows": rows,
+        "total_count": total_count,
+        "total_pages": total_pages,
+        "prev_page": prev_page,
+        "next_page": page + 1 if has_next else None,
+        "prev_before": encode_cursor(rows[0]["sort_key"]) if rows and page > 2 else None,
+        "next_after": encode_cursor(rows[-1]["sort_key"]) if rows and has_next else None,
+    }
+
+
+def async_view(view):
+    """Wrap an async view so DB work done on its event-loop thread is released afterwards.
+
+    Flask runs async views on an event loop that may live in another thread than
+    the request, so teardown alone would not return that thread's connection.
+    The app stays WSGI: deploy it on a threaded server (e.g. ``gunicorn --threads 8
+    app:app``) so requests run side by side, each fanning its reads out through
+    DBHandler.gather_reads.
+    """
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await view(*args, **kwargs)
+        finally:
+            mydb.release()
+    return wrapper
+
+
+def render_home_page(sections=None):
+    """Render the landing page from the cached home sections snapshot."""
+    if sections is None:
+        sections = mydb.fetch_home_sections([level["value"] for level in DIFFICULTY_LEVELS])
+    apply_image_fallbacks(sections["recent"])
+    apply_image_fallbacks(sections["more"])
+    apply_image_fallbacks(sections["popular"])
+    return render_template(
+        'pages/home.html',
+        recent_recipes=sections["recent"],
+        more_recipes=sections["more"],
+        popular_recipes=sections["popular"],
+        difficulty_collections=build_difficulty_collections(sections["by_difficulty"])
+    )
+
+
 # adding comment, making change
 @app.route('/signout', methods=['GET', 'POST'])
 def signout():
@@ -224,27 +509,16 @@ def test_git():
     pass
 
 @app.route('/')
-def index():
+@async_view
+async def index():
     """Render home page with recent, more, popular recipes and difficulty collections."""
-    recent_recipes = mydb.fetch_recent_recipes()
-    more_recipes = mydb.fetch_recent_recipes(offset=4)
-    popular_recipes = mydb.fetch_popular_recipes()
-    apply_image_fallbacks(recent_recipes)
-    apply_image_fallbacks(more_recipes)
-    apply_image_fallbacks(popular_recipes)
-    difficulty_collections = build_difficulty_collections()
-    return render_template(
-        'pages/home.html',
-        recent_recipes=recent_recipes,
-        more_recipes=more_recipes,
-        popular_recipes=popular_recipes,
-        difficulty_collections=difficulty_collections
-    )
+    sections = await mydb.fetch_home_sections_async([level["value"] for level in DIFFICULTY_LEVELS])
+    return render_home_page(sections)
 
 
 @app.route('/api/search')
 def api_search():
-    """Autocomplete search endpoint for recipe titles, categories, and ingredients."""
+    """Autocomplete search endpoint for recipe titles, tags, and ingredients."""
     query = (request.args.get('q') or "").strip()
     limit_raw = request.args.get('limit')
     try:
@@ -253,7 +527,11 @@ def api_search():
         limit = 5
     limit = max(1, min(limit, 15))
 
-    results = mydb.search_recipes(query, limit=limit, offset=0)
+    started = time.perf_counter()
+    results = mydb.autocomplete_recipes(query, limit=limit)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms > AUTOCOMPLETE_BUDGET_MS:
+        print(f"Autocomplete over budget: {elapsed_ms:.2f}ms > {AUTOCOMPLETE_BUDGET_MS}ms for q={query!r}")
     apply_image_fallbacks(results)
     return jsonify([
         {
@@ -275,11 +553,24 @@ def search():
     per_page = 12
     offset = (page - 1) * per_page
 
-    recipes = mydb.search_recipes(query, limit=per_page, offset=offset, user_id=user_id) if query else []
-    total_count = mydb.search_recipes_count(query) if query else 0
-    total_pages = max(1, (total_count + per_page - 1) // per_page) if query else 1
-    prev_page = page - 1 if page > 1 and page <= total_pages else None
-    next_page = page + 1 if page < total_pages else None
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before'))
+
+    if query:
+        listing = paginate_listing(
+            "search",
+            lambda limit: mydb.search_recipes(
+                query, limit=limit, offset=offset, user_id=user_id, after=after, before=before
+            ),
+            lambda: mydb.search_recipes_count(query),
+            page,
+            per_page,
+            backward=bool(before and not after),
+        )
+    else:
+        listing = {"rows": [], "total_count": 0, "total_pages": 1, "prev_page": None, "next_page": None,
+                   "prev_before": None, "next_after": None}
+    recipes = listing["rows"]
 
     apply_image_fallbacks(recipes)
 
@@ -288,10 +579,12 @@ def search():
         query=query,
         recipes=recipes,
         page=page,
-        total_pages=total_pages,
-        prev_page=prev_page,
-        next_page=next_page,
-        total_count=total_count,
+        total_pages=listing["total_pages"],
+        prev_page=listing["prev_page"],
+        next_page=listing["next_page"],
+        prev_before=listing["prev_before"],
+        next_after=listing["next_after"],
+        total_count=listing["total_count"],
     )
 
 
@@ -310,20 +603,28 @@ def feed():
     page = int(page_raw) if page_raw.isdigit() and int(page_raw) > 0 else 1
     per_page = 12
     offset = (page - 1) * per_page
+    after = decode_cursor(request.args.get('after'), size=2)
+    before = decode_cursor(request.args.get('before'), size=2)
 
     filters = mydb.fetch_feed_filters()
-    total_count = mydb.fetch_feed_count(category=category, difficulty=difficulty, max_time=max_time)
-    recipes = mydb.fetch_feed_recipes(
-        category=category,
-        difficulty=difficulty,
-        max_time=max_time,
-        limit=per_page,
-        offset=offset,
-        user_id=user_id
+    listing = paginate_listing(
+        "feed",
+        lambda limit: mydb.fetch_feed_recipes(
+            category=category,
+            difficulty=difficulty,
+            max_time=max_time,
+            limit=limit,
+            offset=offset,
+            user_id=user_id,
+            after=after,
+            before=before
+        ),
+        lambda: mydb.fetch_feed_count(category=category, difficulty=difficulty, max_time=max_time),
+        page,
+        per_page,
+        backward=bool(before and not after),
     )
-    total_pages = max(1, (total_count + per_page - 1) // per_page)
-    prev_page = page - 1 if page > 1 else None
-    next_page = page + 1 if page < total_pages else None
+    recipes = listing["rows"]
 
     apply_image_fallbacks(recipes)
 
@@ -335,9 +636,11 @@ def feed():
         active_difficulty=difficulty,
         active_max_time=max_time_raw or "",
         page=page,
-        total_pages=total_pages,
-        prev_page=prev_page,
-        next_page=next_page
+        total_pages=listing["total_pages"],
+        prev_page=listing["prev_page"],
+        next_page=listing["next_page"],
+        prev_before=listing["prev_before"],
+        next_after=listing["next_after"]
     )
 
 @app.route('/api/recipes/<int:recipe_id>/favorite', methods=['POST', 'DELETE'])
@@ -356,43 +659,28 @@ def api_favorite_recipe(recipe_id: int):
 
 
 @app.route('/recipe/<int:recipe_id>', methods=['GET', 'POST'])
-def recipe(recipe_id: int):
+@async_view
+async def recipe(recipe_id: int):
     """Render recipe detail and handle favorites/reviews submissions."""
     session_user, session_role = get_current_user()
     is_admin = session_role == 'admin'
 
-    recipe_row = mydb.fetch_recipe_detail(recipe_id, include_inactive=is_admin)
-    if not recipe_row:
-        abort(404)
-    if recipe_row.get("status") != "active" and not is_admin:
+    page = mydb.recipe_page_cache.get(recipe_id)
+    if page is None:
+        page = await build_recipe_page(recipe_id, include_inactive=is_admin)
+        if page is None:
+            abort(404)
+        if page["recipe"]["status"] == "active":
+            mydb.recipe_page_cache.set(recipe_id, page)
+    if page["recipe"]["status"] != "active" and not is_admin:
         abort(404)
 
-    image_path = recipe_row.get("cover_img_path")
-    default_image = url_for('static', filename='media/registration.png')
-    if image_path:
-        fs_path = image_path.lstrip("/")
-        candidate = os.path.join(app.root_path, fs_path)
-        print("candidate: ", candidate, "!!!!!!!!!!!!   !!! !!!!    !!!!    !!!!")
-        if not os.path.exists(candidate):
-            image_path = default_image
-    else:
-        image_path = default_image
-    rating_value = float(recipe_row.get("rating") or 0)
-    ingredients = recipe_row.get("ingredients", [])
-    tags = recipe_row.get("tags", [])
-    is_favorited = False
-    if session_user:
-        is_favorited = mydb.has_user_liked_recipe(session_user, recipe_id)
-
     if request.method == 'POST':
         action = request.form.get('action')
         if action == 'toggle_favorite':
             if not session_user:
                 return redirect(url_for('login'))
-            if is_favorited:
-                mydb.remove_recipe_like(session_user, recipe_id)
-            else:
-                mydb.add_recipe_like(session_user, recipe_id)
+            mydb.toggle_recipe_like(session_user, recipe_id)
         elif action == 'add_review':
             if not session_user:
                 return redirect(url_for('login'))
@@ -407,6 +695,33 @@ def recipe(recipe_id: int):
 
         return redirect(url_for('recipe', recipe_id=recipe_id))
 
+    liked = mydb.fetch_liked_recipe_ids(session_user, [recipe_id] + [rec["id"] for rec in page["recommendations"]])
+    is_favorited = recipe_id in liked
+
+    recipe_data = dict(page["recipe"], is_favorited=is_favorited, is_admin=is_admin)
+    recommendations = [dict(rec, is_favorited=rec["id"] in liked) for rec in page["recommendations"]]
+
+    return render_template('pages/recipe.html', recipe=recipe_data, recommendations=recommendations)
+
+
+async def build_recipe_page(recipe_id: int, include_inactive: bool = False):
+    """Assemble the viewer-independent /recipe/<id> payload (recipe data plus recommendations).
+
+    The detail and recommendation reads run concurrently. The result is what recipe()
+    caches in mydb.recipe_page_cache; like state and the admin flag are added per request.
+    """
+    recipe_row, recommendations = await mydb.gather_reads(
+        functools.partial(mydb.fetch_recipe_detail, recipe_id, include_inactive=include_inactive),
+        functools.partial(mydb.fetch_recommended_recipes, recipe_id, limit=5),
+    )
+    if not recipe_row:
+        return None
+
+    image_path = resolve_image_path(recipe_row.get("cover_img_path"))
+    rating_value = float(recipe_row.get("rating") or 0)
+    ingredients = recipe_row.get("ingredients", [])
+    tags = recipe_row.get("tags", [])
+
     nutrition = []
     nutrition_map = {
         "Protein": recipe_row.get("protein"),
@@ -454,15 +769,14 @@ def recipe(recipe_id: int):
         "procedure": procedure_text,
         "tags": tags,
         "reviews": reviews,
-        "is_favorited": is_favorited,
         "status": recipe_row.get("status"),
-        "is_admin": is_admin
     }
 
-    recommendations = mydb.fetch_recommended_recipes(recipe_id, limit=5)
     apply_image_fallbacks(recommendations)
+    for rec in recommendations:
+        rec.pop("is_favorited", None)
 
-    return render_template('pages/recipe.html', recipe=recipe_data, recommendations=recommendations)
+    return {"recipe": recipe_data, "recommendations": recommendations}
 
 
 @app.route('/home', methods=['GET', 'POST'])
@@ -470,20 +784,7 @@ def home():
     """Show home page for logged-in users; otherwise redirects to login."""
     if 'user' not in session:
         return redirect(url_for('login'))
-    recent_recipes = mydb.fetch_recent_recipes()
-    more_recipes = mydb.fetch_recent_recipes(offset=4)
-    popular_recipes = mydb.fetch_popular_recipes()
-    apply_image_fallbacks(recent_recipes)
-    apply_image_fallbacks(more_recipes)
-    apply_image_fallbacks(popular_recipes)
-    difficulty_collections = build_difficulty_collections()
-    return render_template(
-        'pages/home.html',
-        recent_recipes=recent_recipes,
-        more_recipes=more_recipes,
-        popular_recipes=popular_recipes,
-        difficulty_collections=difficulty_collections
-    )
+    return render_home_page()
 
 @app.route('/profile')
 def profile():
@@ -493,15 +794,14 @@ def profile():
     return redirect(url_for('profile_view', user_id=session['user']))
 
 @app.route('/profile/<int:user_id>', methods=['GET', 'POST'])
-def profile_view(user_id: int):
+@async_view
+async def profile_view(user_id: int):
     """Display a user's profile, recipes, and follower actions."""
-    profile_data = mydb.fetch_user_basic(user_id)
-    if not profile_data:
-        abort(404)
-
     session_user, _ = get_current_user()
     is_owner = session_user == user_id
     if request.method == 'POST':
+        if not mydb.fetch_user_basic(user_id):
+            abort(404)
         if not session_user:
             return redirect(url_for('login'))
         action = request.form.get('action')
@@ -511,14 +811,19 @@ def profile_view(user_id: int):
             mydb.unfollow_user(user_id, session_user)
         return redirect(url_for('profile_view', user_id=user_id))
 
-    stats = mydb.fetch_user_stats(user_id)
-    recipes = mydb.fetch_user_recipes(user_id, limit=4, viewer_id=session_user)
-    favorites = mydb.fetch_user_liked_recipes(user_id, limit=4) if is_owner else []
+    # The profile, stats, listings and follow check are independent reads.
+    profile_data, stats, recipes, favorites, is_following = await mydb.gather_reads(
+        functools.partial(mydb.fetch_user_basic, user_id),
+        functools.partial(mydb.fetch_user_stats, user_id),
+        functools.partial(mydb.fetch_user_recipes, user_id, limit=4, viewer_id=session_user),
+        functools.partial(mydb.fetch_user_liked_recipes, user_id, limit=4) if is_owner else (lambda: []),
+        functools.partial(mydb.is_following_user, user_id, session_user)
+        if session_user and not is_owner else (lambda: False),
+    )
+    if not profile_data:
+        abort(404)
     apply_image_fallbacks(recipes)
     apply_image_fallbacks(favorites)
-    is_following = False
-    if session_user and not is_owner:
-        is_following = mydb.is_following_user(user_id, session_user)
 
     return render_template(
         'pages/profile.html',
@@ -568,6 +873,8 @@ def edit_profile():
                 file_path = os.path.join(upload_dir, final_name)
                 photo_file.save(file_path)
                 profile_img_path = f"/static/img/profile/{final_name}"
+                register_image(profile_img_path)
+                job_queue.enqueue("image_variants", {"path": profile_img_path, "variants": PROFILE_VARIANTS})
 
             hashed_password = generate_password_hash(new_password) if new_password else None
 
@@ -662,22 +969,27 @@ def add():
             file_path = os.path.join(upload_dir, final_name)
             photo_file.save(file_path)
             cover_img_path = f"/static/img/recipes/{final_name}"
-
-        recipe_id = mydb.create_recipe(
-            title=title,
-            author_id=session_user,
-            procedure=procedure_text,
-            prepare_time=prepare_time,
-            calories=calories,
-            category=category,
-            difficulty=difficulty,
-            cover_img_path=cover_img_path,
-            nutrition=nutrition_map,
-            status="inactive",
-        )
-        if recipe_id:
-            mydb.add_recipe_ingredients(recipe_id, ingredients)
-            mydb.add_recipe_tags(recipe_id, [t.strip() for t in tags if t.strip()])
+            register_image(cover_img_path)
+            job_queue.enqueue("image_variants", {"path": cover_img_path, "variants": RECIPE_VARIANTS})
+
+        # Recipe, ingredients and tags are written as one unit with a single commit.
+        with mydb.transaction() as tx:
+            recipe_id = tx.create_recipe(
+                title=title,
+                author_id=session_user,
+                procedure=procedure_text,
+                prepare_time=prepare_time,
+                calories=calories,
+                category=category,
+                difficulty=difficulty,
+                cover_img_path=cover_img_path,
+                nutrition=nutrition_map,
+                status="inactive",
+            )
+            if recipe_id:
+                tx.add_recipe_ingredients(recipe_id, ingredients)
+                tx.add_recipe_tags(recipe_id, [t.strip() for t in tags if t.strip()])
+        if recipe_id and tx.ok:
             if session_role == 'admin':
                 return redirect(url_for('recipe', recipe_id=recipe_id))
             return render_template('pages/add.html', success="Your recipe was submitted for admin approval.")
@@ -689,9 +1001,7 @@ def add():
 @app.route('/admin/recipes', methods=['GET', 'POST'])
 def admin_recipes():
     """Admin interface for approving/deleting recipes and moderating ratings."""
-    user_id, role = get_current_user()
-    print("USER ID AND ROLE !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
-    print(user_id, role)
+    user_id, role = get_current_user(fresh=True)
     if not user_id:
         return redirect(url_for('login'))
     if role != 'admin':
@@ -712,7 +1022,12 @@ def admin_recipes():
                 mydb.update_recipe_status(recipe_id, 'active', actor_id=user_id)
             elif action == 'delete':
                 mydb.delete_recipe(recipe_id, actor_id=user_id)
-        return redirect(url_for('admin_recipes', reviews_page=request.args.get('reviews_page', '1')))
+        return redirect(url_for(
+            'admin_recipes',
+            reviews_page=request.args.get('reviews_page', '1'),
+            reviews_after=request.args.get('reviews_after'),
+            reviews_before=request.args.get('reviews_before'),
+        ))
 
     pending_recipes = mydb.fetch_inactive_recipes()
 
@@ -720,22 +1035,72 @@ def admin_recipes():
     reviews_page = int(reviews_page_raw) if reviews_page_raw.isdigit() and int(reviews_page_raw) > 0 else 1
     reviews_per_page = 20
     reviews_offset = (reviews_page - 1) * reviews_per_page
-    reviews_total = mydb.fetch_ratings_count()
-    reviews_total_pages = max(1, (reviews_total + reviews_per_page - 1) // reviews_per_page)
-    reviews_prev = reviews_page - 1 if reviews_page > 1 else None
-    reviews_next = reviews_page + 1 if reviews_page < reviews_total_pages else None
-    ratings = mydb.fetch_ratings_admin(limit=reviews_per_page, offset=reviews_offset)
+    reviews_after = decode_cursor(request.args.get('reviews_after'), size=2)
+    reviews_before = decode_cursor(request.args.get('reviews_before'), size=2)
+    reviews = paginate_listing(
+        "admin_ratings",
+        lambda limit: mydb.fetch_ratings_admin(
+            limit=limit, offset=reviews_offset, after=reviews_after, before=reviews_before
+        ),
+        mydb.fetch_ratings_count,
+        reviews_page,
+        reviews_per_page,
+        backward=bool(reviews_before and not reviews_after),
+    )
+    ratings = reviews["rows"]
 
     return render_template(
         'pages/admin_recipes.html',
         recipes=pending_recipes,
         ratings=ratings,
         reviews_page=reviews_page,
-        reviews_total_pages=reviews_total_pages,
-        reviews_prev=reviews_prev,
-        reviews_next=reviews_next,
+        reviews_total_pages=reviews["total_pages"],
+        reviews_prev=reviews["prev_page"],
+        reviews_next=reviews["next_page"],
+        reviews_prev_before=reviews["prev_before"],
+        reviews_next_after=reviews["next_after"],
     )
 
+@app.route('/admin/db-pool')
+def admin_db_pool():
+    """Admin-only JSON snapshot of DB connection pool usage."""
+    user_id, role = get_current_user(fresh=True)
+    if not user_id:
+        return redirect(url_for('login'))
+    if role != 'admin':
+        abort(403)
+    return jsonify(mydb.pool_stats())
+
+@app.route('/admin/cache')
+def admin_cache():
+    """Admin-only JSON snapshot of read-path cache hit/miss metrics."""
+    user_id, role = get_current_user(fresh=True)
+    if not user_id:
+        return redirect(url_for('login'))
+    if role != 'admin':
+        abort(403)
+    return jsonify(mydb.cache_stats())
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    """Admin-only DB query metrics (latency histograms, rows, round-trips) in Prometheus text format."""
+    user_id, role = get_current_user(fresh=True)
+    if not user_id:
+        return redirect(url_for('login'))
+    if role != 'admin':
+        abort(403)
+    return Response(mydb.metrics_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/admin/jobs')
+def admin_jobs():
+    """Admin-only JSON snapshot of the background job queue (depth, retries, failures)."""
+    user_id, role = get_current_user(fresh=True)
+    if not user_id:
+        return redirect(url_for('login'))
+    if role != 'admin':
+        abort(403)
+    return jsonify(job_queue.stats())
+
 @app.route('/notifications', methods=['GET', 'POST'])
 def notifications():
     """Render notifications page for current user (requires login)."""
@@ -0,0 +1,67 @@
+"""Time AutocompleteIndex.suggest on a synthetic catalog (no database needed).
+
+Usage (from the project root):
+
+    python benchmarks/autocomplete.py [recipes] [repeat]
+
+Builds the index from seeded random documents and prints the build time and
+p50/p95/p99 suggest latency in milliseconds over a fixed set of prefix,
+multi-word and misspelled queries.
+"""
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search_index import AutocompleteIndex  # noqa: E402
+
+QUERIES = ["c", "chi", "chicken", "chiken", "garlic bas", "sourdogh", "pumpkin12", "c garlic"]
+WORDS = ["chicken", "tomato", "garlic", "basil", "pasta", "salmon", "lentil", "maple", "tofu", "chili",
+         "pumpkin", "harissa", "peach", "sourdough", "meatballs", "barbacoa", "citrus", "herb"]
+
+
+def synthetic_documents(size, seed=7):
+    rng = random.Random(seed)
+    words = WORDS + [f"{rng.choice(WORDS)}{i}" for i in range(5000)]
+    return [
+        {
+            "id": i,
+            "title": " ".join(rng.sample(words, 3)),
+            "ingredients": rng.sample(words, 6),
+            "tags": rng.sample(words, 2),
+            "category": rng.choice(["Dinner", "Lunch", "Dessert", "Soup"]),
+            "author": f"Bench{rng.randrange(size // 5 + 1)} User",
+            "rating": rng.randint(1, 5),
+        } for i in range(size)
+    ]
+
+
+def benchmark(index, queries, repeat=200):
+    """Time index.suggest over queries; return latency percentiles in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            index.suggest(query, limit=6)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    pick = lambda q: round(timings[min(len(timings) - 1, int(len(timings) * q))], 4)  # noqa: E731
+    return {"calls": len(timings), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "max_ms": round(timings[-1], 4)}
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    index = AutocompleteIndex()
+    start = time.perf_counter()
+    index.build(synthetic_documents(size))
+    built = time.perf_counter() - start
+    print(json.dumps(dict(recipes=len(index), build_s=round(built, 2), **benchmark(index, QUERIES, repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
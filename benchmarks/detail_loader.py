@@ -0,0 +1,70 @@
+"""Compare the single round-trip recipe detail loader with the four-query loader.
+
+Usage (from the project root, with the DB_* variables exported):
+
+    python benchmarks/detail_loader.py [recipes] [repeat]
+
+Both loaders run against the same sample of active recipes, alternating per
+call so cache warmth and server load affect them equally. Prints p50/p95/p99
+latency in milliseconds and the statement count per call for each loader.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dbhandler import DBHandler  # noqa: E402
+
+
+class CountingCursor():
+    """Cursor proxy counting execute() calls (one round-trip each)."""
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.statements = 0
+
+    def execute(self, *args, **kwargs):
+        self.statements += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    pick = lambda q: round(timings[min(len(timings) - 1, int(len(timings) * q))], 3)
+    return {"calls": len(timings), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(timings[-1], 3)}
+
+
+def run(db, recipe_ids, repeat):
+    loaders = {
+        "json_single_query": db._fetch_recipe_detail_json,
+        "four_queries": db._fetch_recipe_detail_queries,
+    }
+    timings = {name: [] for name in loaders}
+    statements = {}
+    for _ in range(repeat):
+        for recipe_id in recipe_ids:
+            for name, loader in loaders.items():
+                cursor = CountingCursor(db.cursor)
+                db._local.cursor = cursor
+                start = time.perf_counter()
+                loader(recipe_id)
+                timings[name].append((time.perf_counter() - start) * 1000)
+                db._local.cursor = cursor._cursor
+                statements[name] = cursor.statements
+    return {name: dict(percentiles(values), statements_per_call=statements[name]) for name, values in timings.items()}
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    db = DBHandler()
+    db.cursor.execute("select recipe_id from Recipes where status = 'active' order by recipe_id desc limit %s", (size,))
+    ids = [row[0] for row in db.cursor.fetchall()]
+    if not ids:
+        sys.exit("No active recipes to benchmark")
+    print(json.dumps(run(db, ids, repeat), indent=2))
+    db.release()
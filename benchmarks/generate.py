@@ -0,0 +1,230 @@
+"""Fill a benchmark database with a synthetic recipe catalog.
+
+Usage (from the project root, with the DB_* variables pointing at a scratch
+MySQL/MariaDB database, e.g. ``docker run -e MYSQL_ROOT_PASSWORD=bench
+-e MYSQL_DATABASE=bench -p 3306:3306 mysql:8``):
+
+    python benchmarks/generate.py --recipes 10000 [--users N] [--seed 1] [--reset]
+
+Creates the tables from schema.sql, loads users, recipes, ingredients, tags,
+ratings, likes, followers and notifications with skewed (Zipf-like)
+popularity, then runs the schema migrations so counters, UserStats,
+RecipeNeighbors and indexes are backfilled exactly as in production.
+Every user can log in as user<N>@bench.local with password "benchmark".
+The same seed and volumes always produce the same catalog.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import migrations  # noqa: E402
+from dbhandler import DBHandler  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+SCHEMA = Path(__file__).resolve().parent / "schema.sql"
+TABLES = ("Notifications", "Followers", "Likes", "Ratings", "Tags", "Ingredients", "RecipeNeighbors",
+          "UserStats", "Recipes", "Users", "SchemaVersion")
+BATCH = 5000
+PASSWORD = "benchmark"
+
+CATEGORIES = ["Dinner", "Lunch", "Breakfast", "Dessert", "Soup", "Salad", "Snack", "Drinks", "Baking", "Sides"]
+DIFFICULTIES = ["Easy", "Medium", "Difficult"]
+INGREDIENTS = [
+    "salt", "olive oil", "garlic", "onion", "butter", "black pepper", "egg", "flour", "sugar", "milk",
+    "tomato", "lemon", "parsley", "chicken breast", "rice", "pasta", "parmesan", "basil", "carrot", "potato",
+    "cream", "honey", "ginger", "soy sauce", "chili", "cumin", "paprika", "spinach", "mushroom", "bell pepper",
+    "beef", "pork", "salmon", "shrimp", "tofu", "chickpeas", "lentils", "coconut milk", "yogurt", "feta",
+    "cheddar", "mozzarella", "avocado", "lime", "cilantro", "thyme", "rosemary", "oregano", "cinnamon", "vanilla",
+    "chocolate", "almonds", "walnuts", "oats", "banana", "apple", "strawberry", "blueberry", "zucchini", "eggplant",
+    "cabbage", "broccoli", "cauliflower", "corn", "black beans", "quinoa", "couscous", "bread crumbs", "mustard", "vinegar",
+]
+TAGS = [
+    "quick", "vegetarian", "vegan", "gluten-free", "spicy", "healthy", "comfort food", "family", "budget", "meal prep",
+    "low carb", "high protein", "one pot", "summer", "winter", "holiday", "kids", "party", "italian", "asian",
+    "mexican", "indian", "french", "greek", "bbq", "baking", "no bake", "breakfast", "brunch", "dairy-free",
+]
+ADJECTIVES = ["Creamy", "Crispy", "Easy", "Roasted", "Spicy", "Smoky", "Zesty", "Classic", "Rustic", "Golden", "Fresh", "Hearty"]
+DISHES = ["Pasta", "Salad", "Soup", "Stew", "Curry", "Bowl", "Tacos", "Pie", "Cake", "Stir-Fry", "Bake", "Sandwich", "Risotto"]
+
+
+def zipf_weights(n, s=1.1):
+    return [1.0 / (rank + 1) ** s for rank in range(n)]
+
+
+class Generator():
+    """Deterministic row generator for one catalog size."""
+    def __init__(self, db, args):
+        self.db = db
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.users = args.users or max(50, args.recipes // 5)
+        self.now = datetime(2025, 1, 1)
+        self.counts = {}
+        # Popular users write, rate and get followed more often than the long tail.
+        self.user_weights = zipf_weights(self.users, 0.8)
+        self.ingredient_weights = zipf_weights(len(INGREDIENTS))
+        self.tag_weights = zipf_weights(len(TAGS))
+
+    def insert(self, table, columns, rows):
+        """Insert rows (any iterable) in BATCH-sized multi-row statements; returns the row count."""
+        query = f"insert into {table} ({', '.join(columns)}) values ({', '.join(['%s'] * len(columns))})"
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH:
+                self.db.cursor.executemany(query, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.db.cursor.executemany(query, batch)
+            total += len(batch)
+        self.db.cnx.commit()
+        self.counts[table] = self.counts.get(table, 0) + total
+        return total
+
+    def some_user(self):
+        return self.random.choices(range(1, self.users + 1), weights=self.user_weights)[0]
+
+    def some_date(self, days=730):
+        return self.now - timedelta(seconds=self.random.randrange(days * 86400))
+
+    def distinct_users(self, count, exclude=None):
+        picked = set()
+        while len(picked) < min(count, self.users - 1):
+            user_id = self.some_user()
+            if user_id != exclude:
+                picked.add(user_id)
+        return picked
+
+    def user_rows(self):
+        password = generate_password_hash(PASSWORD)
+        for i in range(1, self.users + 1):
+            role = "admin" if i == 1 else "user"
+            yield (f"user{i}@bench.local", password, f"Bench{i}", "User", None, None, self.some_date(), role)
+
+    def recipe_rows(self):
+        for _ in range(self.args.recipes):
+            title = f"{self.random.choice(ADJECTIVES)} {self.random.choice(INGREDIENTS).title()} {self.random.choice(DISHES)}"
+            status = "active" if self.random.random() < 0.95 else "inactive"
+            yield (
+                title, self.some_user(), self.random.choice(CATEGORIES), self.random.choice(DIFFICULTIES), None,
+                self.random.choice([10, 15, 20, 30, 45, 60, 90, 120]), self.random.randrange(80, 1200),
+                "Mix everything, cook until done and serve. " * self.random.randrange(2, 8),
+                round(self.random.uniform(0, 60), 1), round(self.random.uniform(0, 120), 1),
+                round(self.random.uniform(0, 60), 1), round(self.random.uniform(0, 50), 1),
+                round(self.random.uniform(0, 15), 1), status, self.some_date(),
+            )
+
+    def ingredient_rows(self):
+        for recipe_id in range(1, self.args.recipes + 1):
+            count = self.random.randrange(4, 13)
+            for ingredient in set(self.random.choices(INGREDIENTS, weights=self.ingredient_weights, k=count)):
+                yield (recipe_id, ingredient)
+
+    def tag_rows(self):
+        for recipe_id in range(1, self.args.recipes + 1):
+            for tag in set(self.random.choices(TAGS, weights=self.tag_weights, k=self.random.randrange(1, 5))):
+                yield (recipe_id, tag)
+
+    def per_recipe(self, mean):
+        """Skewed per-recipe count with the given mean: a few recipes get most of the activity."""
+        return int(self.random.expovariate(1.0 / mean)) if mean > 0 else 0
+
+    def rating_rows(self):
+        for recipe_id in range(1, self.args.recipes + 1):
+            for user_id in self.distinct_users(self.per_recipe(self.args.ratings_per_recipe)):
+                yield (recipe_id, user_id, self.random.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 6, 6])[0],
+                       "Synthetic review", self.some_date(365))
+
+    def like_rows(self):
+        for recipe_id in range(1, self.args.recipes + 1):
+            for user_id in self.distinct_users(self.per_recipe(self.args.likes_per_recipe)):
+                yield (recipe_id, user_id, self.some_date(365))
+
+    def follower_rows(self):
+        for follower_id in range(1, self.users + 1):
+            for user_id in self.distinct_users(self.per_recipe(self.args.follows_per_user), exclude=follower_id):
+                yield (user_id, follower_id)
+
+    def notification_rows(self):
+        for user_id in range(1, self.users + 1):
+            for _ in range(self.per_recipe(self.args.notifications_per_user)):
+                kind = self.random.choice(["follow", "rating", "recipe_status"])
+                recipe_id = self.random.randrange(1, self.args.recipes + 1) if kind != "follow" else None
+                yield (user_id, self.some_user(), recipe_id, kind, f"Synthetic {kind} notification",
+                       int(self.random.random() < 0.7), self.some_date(90))
+
+    def run(self):
+        self.insert("Users", ("email", "password", "name", "surname", "about_me", "profile_img_path",
+                              "date_registered", "role"), self.user_rows())
+        self.insert("Recipes", ("title", "author_id", "category", "difficulty", "cover_img_path", "prepare_time",
+                                "calories", "procedure_description", "protein", "carbs", "fats", "sugar", "fiber",
+                                "status", "date_posted"), self.recipe_rows())
+        self.insert("Ingredients", ("recipe_id", "ingredient"), self.ingredient_rows())
+        self.insert("Tags", ("recipe_id", "tag_name"), self.tag_rows())
+        self.insert("Ratings", ("recipe_id", "user_id", "rating", "comment", "date_posted"), self.rating_rows())
+        self.insert("Likes", ("recipe_id", "user_id", "date_liked"), self.like_rows())
+        self.insert("Followers", ("user_id", "follower_id"), self.follower_rows())
+        self.insert("Notifications", ("user_id", "actor_id", "recipe_id", "type", "message", "is_read", "created_at"),
+                    self.notification_rows())
+        # Legacy average column, as the pre-migration app maintained it.
+        self.db.cursor.execute(
+            "update Recipes r set rating = (select avg(rt.rating) from Ratings rt where rt.recipe_id = r.recipe_id)"
+        )
+        self.db.cnx.commit()
+
+
+def create_schema(db, reset):
+    db.cursor.execute("show tables")
+    existing = {row[0] for row in db.cursor.fetchall()}
+    if existing & set(TABLES) and not reset:
+        sys.exit("Database already has application tables; pass --reset to drop them (scratch databases only).")
+    db.cursor.execute("set foreign_key_checks = 0")
+    for table in TABLES:
+        db.cursor.execute(f"drop table if exists {table}")
+    db.cursor.execute("set foreign_key_checks = 1")
+    for statement in SCHEMA.read_text().split(";"):
+        lines = [line for line in statement.splitlines() if line.strip() and not line.strip().startswith("--")]
+        if lines:
+            db.cursor.execute("\n".join(lines))
+    db.cnx.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=1000, help="number of recipes (1k to 1M)")
+    parser.add_argument("--users", type=int, default=None, help="number of users (default recipes / 5, at least 50)")
+    parser.add_argument("--ratings-per-recipe", type=float, default=4.0)
+    parser.add_argument("--likes-per-recipe", type=float, default=8.0)
+    parser.add_argument("--follows-per-user", type=float, default=6.0)
+    parser.add_argument("--notifications-per-user", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="drop existing application tables first")
+    args = parser.parse_args(argv)
+
+    db = DBHandler()
+    started = time.perf_counter()
+    create_schema(db, args.reset)
+    generator = Generator(db, args)
+    generator.run()
+    loaded = time.perf_counter()
+    applied = migrations.migrate(db)
+    db.release()
+    print(json.dumps({
+        "seed": args.seed,
+        "rows": generator.counts,
+        "migrations": applied,
+        "load_s": round(loaded - started, 2),
+        "migrate_s": round(time.perf_counter() - loaded, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Replay a weighted traffic mix against the app and report per-route latency.
+
+Usage (from the project root, after generate.py filled the DB_* database):
+
+    python benchmarks/replay.py [--requests 2000] [--concurrency 4] [--url http://127.0.0.1:8000]
+                                [--seed 1] [--output run.json]
+
+Without --url requests go through app.test_client() in this process; with it
+they go over HTTP to a running server (e.g. gunicorn) using the same database.
+Each worker logs in as a generated user, so likes and reviews are real writes.
+The request plan depends only on the seed and the catalog, so runs on different
+commits replay the same traffic. Prints (and optionally writes) a JSON report
+with throughput and p50/p95/p99 latency per route.
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from detail_loader import percentiles  # noqa: E402
+from generate import PASSWORD  # noqa: E402
+
+# Route name -> share of the traffic mix.
+MIX = {
+    "home": 15,
+    "feed": 12,
+    "feed_filtered": 10,
+    "search": 10,
+    "autocomplete": 18,
+    "recipe": 25,
+    "like": 6,
+    "rate": 4,
+}
+CSRF_META = re.compile(r'name="csrf-token" content="([^"]+)"')
+
+
+class TestClientSession():
+    """In-process client over app.test_client(); keeps its own cookie jar."""
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.client.open(path, method=method, data=data, headers=headers)
+        return response.status_code, response.get_data(as_text=True)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession():
+    """HTTP client for a running server; redirects are not followed, like the test client."""
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode(errors="replace")
+        except urllib.error.HTTPError as err:
+            return err.code, err.read().decode(errors="replace")
+
+
+def sample_targets(db, seed, size=500):
+    """Pick the recipe ids, filters and search terms the plan draws from."""
+    db.cursor.execute("select recipe_id from Recipes where status = 'active' order by recipe_id limit 100000")
+    recipe_ids = [row[0] for row in db.cursor.fetchall()]
+    db.cursor.execute("select distinct category from Recipes where category is not null")
+    categories = [row[0] for row in db.cursor.fetchall()]
+    db.cursor.execute("select distinct difficulty from Recipes where difficulty is not null")
+    difficulties = [row[0] for row in db.cursor.fetchall()]
+    db.cursor.execute("select ingredient, count(*) from Ingredients group by ingredient order by count(*) desc limit 200")
+    terms = [row[0] for row in db.cursor.fetchall()]
+    db.cursor.execute("select count(*) from Users where email like %s", ("%@bench.local",))
+    users = db.cursor.fetchone()[0]
+    db.release()
+    if not recipe_ids or not users:
+        sys.exit("No generated catalog found; run benchmarks/generate.py first")
+    rng = random.Random(seed)
+    return {
+        "recipe_ids": rng.sample(recipe_ids, min(size, len(recipe_ids))),
+        "categories": categories,
+        "difficulties": difficulties,
+        "terms": terms,
+        "users": users,
+    }
+
+
+def build_plan(targets, requests, seed):
+    """Return [(route, method, path, data)] drawn from MIX with a seeded RNG."""
+    rng = random.Random(seed)
+    routes = list(MIX)
+    plan = []
+    for route in rng.choices(routes, weights=[MIX[r] for r in routes], k=requests):
+        # Popular recipes get most detail views, like a real catalog.
+        recipe_id = targets["recipe_ids"][min(int(rng.expovariate(1 / 20)), len(targets["recipe_ids"]) - 1)]
+        term = rng.choice(targets["terms"])
+        if route == "home":
+            plan.append((route, "GET", "/", None))
+        elif route == "feed":
+            plan.append((route, "GET", f"/feed?page={rng.choice([1, 1, 1, 2, 3])}", None))
+        elif route == "feed_filtered":
+            query = urllib.parse.urlencode({
+                "category": rng.choice(targets["categories"]),
+                "difficulty": rng.choice(targets["difficulties"]),
+                "max_time": rng.choice([30, 60, 120]),
+            })
+            plan.append((route, "GET", f"/feed?{query}", None))
+        elif route == "search":
+            plan.append((route, "GET", "/search?" + urllib.parse.urlencode({"q": term}), None))
+        elif route == "autocomplete":
+            plan.append((route, "GET", "/api/search?" + urllib.parse.urlencode({"q": term[:rng.randint(2, 5)]}), None))
+        elif route == "recipe":
+            plan.append((route, "GET", f"/recipe/{recipe_id}", None))
+        elif route == "like":
+            plan.append((route, rng.choice(["POST", "DELETE"]), f"/api/recipes/{recipe_id}/favorite", None))
+        elif route == "rate":
+            data = {"action": "add_review", "rating": str(rng.randint(1, 5)), "comment": "Benchmark review"}
+            plan.append((route, "POST", f"/recipe/{recipe_id}", data))
+    return plan
+
+
+def login(session, user_number):
+    """Log in as a generated user; returns the CSRF token of the new session."""
+    status, body = session.request("GET", "/login")
+    token = CSRF_META.search(body)
+    data = {"email": f"user{user_number}@bench.local", "password": PASSWORD, "csrf_token": token.group(1) if token else ""}
+    status, _ = session.request("POST", "/login", data=data)
+    if status != 302:
+        raise RuntimeError(f"Login failed for user{user_number}@bench.local (status {status})")
+    _, body = session.request("GET", "/")
+    token = CSRF_META.search(body)
+    return token.group(1) if token else ""
+
+
+def worker(session, csrf, plan, results):
+    for route, method, path, data in plan:
+        headers = {"X-CSRFToken": csrf} if method != "GET" else None
+        if data is not None:
+            data = dict(data, csrf_token=csrf)
+        start = time.perf_counter()
+        try:
+            status, _ = session.request(method, path, data=data, headers=headers)
+        except Exception:
+            status = 599
+        results.append((route, (time.perf_counter() - start) * 1000, status))
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, elapsed, args):
+    routes = {}
+    for route in MIX:
+        timings = [ms for name, ms, _ in results if name == route]
+        if not timings:
+            continue
+        errors = sum(1 for name, _, status in results if name == route and status >= 400)
+        routes[route] = dict(percentiles(timings), errors=errors, throughput_rps=round(len(timings) / elapsed, 2))
+    return {
+        "commit": current_commit(),
+        "target": args.url or "test_client",
+        "seed": args.seed,
+        "requests": len(results),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "errors": sum(1 for _, _, status in results if status >= 400),
+        "routes": routes,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=100, help="requests replayed before timing starts")
+    parser.add_argument("--url", help="base URL of a running server (default: in-process test client)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        from dbhandler import DBHandler
+        db = DBHandler()
+        make_session = lambda: HttpSession(args.url)  # noqa: E731
+    else:
+        from app import app, mydb as db
+        make_session = lambda: TestClientSession(app)  # noqa: E731
+    targets = sample_targets(db, args.seed)
+    plan = build_plan(targets, args.warmup + args.requests, args.seed)
+    warmup, plan = plan[:args.warmup], plan[args.warmup:]
+
+    sessions = []
+    for i in range(args.concurrency):
+        session = make_session()
+        sessions.append((session, login(session, 2 + i % max(1, targets["users"] - 1))))
+    worker(*sessions[0], warmup, [])
+
+    results = []
+    threads = [
+        threading.Thread(target=worker, args=(session, csrf, plan[i::args.concurrency], results))
+        for i, (session, csrf) in enumerate(sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    output = json.dumps(report(results, time.perf_counter() - started, args), indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
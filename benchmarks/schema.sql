@@ -0,0 +1,92 @@
+-- Base schema for benchmark databases, as the application expects it before
+-- migrations.py runs. generate.py applies this file, loads the synthetic
+-- catalog and then runs the migrations (counters, UserStats, RecipeNeighbors,
+-- indexes), so a benchmark database matches a migrated production schema.
+
+create table if not exists Users (
+    user_id int auto_increment primary key,
+    email varchar(255) not null unique,
+    password varchar(255) not null,
+    name varchar(100) not null,
+    surname varchar(100),
+    about_me text,
+    profile_img_path varchar(255),
+    date_registered datetime not null default current_timestamp,
+    role varchar(20) not null default 'user',
+    rating decimal(3, 2)
+);
+
+create table if not exists Recipes (
+    recipe_id int auto_increment primary key,
+    title varchar(255) not null,
+    author_id int not null,
+    category varchar(100),
+    difficulty varchar(20),
+    cover_img_path varchar(255),
+    prepare_time int,
+    calories int,
+    procedure_description text,
+    protein decimal(6, 1),
+    carbs decimal(6, 1),
+    fats decimal(6, 1),
+    sugar decimal(6, 1),
+    fiber decimal(6, 1),
+    status varchar(20) not null default 'inactive',
+    rating decimal(3, 2),
+    date_posted datetime not null default current_timestamp,
+    foreign key (author_id) references Users (user_id)
+);
+
+create table if not exists Ingredients (
+    ingredient_id int auto_increment primary key,
+    recipe_id int not null,
+    ingredient varchar(255) not null,
+    foreign key (recipe_id) references Recipes (recipe_id) on delete cascade
+);
+
+create table if not exists Tags (
+    tag_id int auto_increment primary key,
+    recipe_id int not null,
+    tag_name varchar(100) not null,
+    foreign key (recipe_id) references Recipes (recipe_id) on delete cascade
+);
+
+create table if not exists Ratings (
+    rate_id int auto_increment primary key,
+    recipe_id int not null,
+    user_id int not null,
+    rating tinyint not null,
+    comment text,
+    date_posted datetime not null default current_timestamp,
+    foreign key (recipe_id) references Recipes (recipe_id) on delete cascade,
+    foreign key (user_id) references Users (user_id)
+);
+
+create table if not exists Likes (
+    recipe_id int not null,
+    user_id int not null,
+    date_liked datetime not null default current_timestamp,
+    primary key (recipe_id, user_id),
+    foreign key (recipe_id) references Recipes (recipe_id) on delete cascade,
+    foreign key (user_id) references Users (user_id)
+);
+
+create table if not exists Followers (
+    user_id int not null,
+    follower_id int not null,
+    primary key (user_id, follower_id),
+    foreign key (user_id) references Users (user_id),
+    foreign key (follower_id) references Users (user_id)
+);
+
+create table if not exists Notifications (
+    notification_id int auto_increment primary key,
+    user_id int not null,
+    actor_id int,
+    recipe_id int,
+    type varchar(50) not null,
+    message varchar(255),
+    is_read tinyint(1) not null default 0,
+    created_at datetime not null default current_timestamp,
+    foreign key (user_id) references Users (user_id)
+);
@@ -0,0 +1,476 @@
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # redis is optional; only needed for CACHE_BACKEND=redis.
+    redis = None
+
+_MISSING = object()
+# Key handed to bus subscribers when a whole cache (or index) is invalidated.
+ALL = _MISSING
+
+
+class SignedPickle():
+    """Pickle values behind an HMAC-SHA256 tag so only holders of secret can plant entries.
+
+    Shared stores (a SQLite file, a Redis server) may be writable by more than
+    the app; unpickling an unsigned entry from them would run arbitrary code.
+    """
+    def __init__(self, secret):
+        if isinstance(secret, str):
+            secret = secret.encode()
+        self._key = hashlib.sha256(b"cache-values:" + secret).digest()
+
+    def _tag(self, data):
+        return hmac.new(self._key, data, hashlib.sha256).digest()
+
+    def dumps(self, value):
+        data = pickle.dumps(value)
+        return self._tag(data) + data
+
+    def loads(self, blob):
+        """Return the value, or raise ValueError for an unsigned or tampered entry."""
+        blob = bytes(blob)
+        tag, data = blob[:32], blob[32:]
+        if not hmac.compare_digest(tag, self._tag(data)):
+            raise ValueError("cache entry has no valid signature")
+        return pickle.loads(data)
+
+
+def _key_to_json(key):
+    """Encode an invalidation key (nested tuples/lists of str, int, float, None) as JSON."""
+    return json.dumps(key, default=float)
+
+
+def _key_from_json(text):
+    """Decode a key from _key_to_json, turning JSON arrays back into tuples."""
+    def tuples(value):
+        return tuple(tuples(item) for item in value) if isinstance(value, list) else value
+    return tuples(json.loads(text))
+
+
+class TTLCache():
+    """Thread-safe LRU cache whose entries also expire after ttl seconds (maxsize None: no LRU cap).
+
+    With a bus, delete/clear/update are broadcast so the copies held by other
+    worker processes are dropped too.
+    """
+    def __init__(self, maxsize=128, ttl=60, name=None, bus=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.bus = bus
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if bus is not None:
+            bus.subscribe(name, self._drop)
+
+    def get(self, key, default=None):
+        """Return a live cached value or default."""
+        if self.bus is not None:
+            self.bus.poll()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def update(self, key, value):
+        """Store a changed value here and drop other workers' stale copies."""
+        self.set(key, value)
+        if self.bus is not None:
+            self.bus.publish(self.name, key)
+
+    def delete(self, key):
+        self._drop(key)
+        if self.bus is not None:
+            self.bus.publish(self.name, key)
+
+    def clear(self):
+        self._drop(ALL)
+        if self.bus is not None:
+            self.bus.publish(self.name, ALL)
+
+    def _drop(self, key):
+        """Apply an invalidation locally; ALL means everything."""
+        with self._lock:
+            if key is ALL:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            return {"backend": "local", "hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+class InvalidationBus():
+    """Cross-process invalidation messages for per-worker state, via a shared SQLite file.
+
+    Each worker appends (name, key) rows on delete/clear and, at most every
+    poll_interval seconds, hands rows written by other workers to the handler
+    subscribed under that name (TTLCaches, the in-memory search indexes, ...).
+    Keys are stored as JSON (lists come back as tuples), never pickled, so a
+    foreign row can at worst invalidate entries.
+    """
+    def __init__(self, path, poll_interval=0.5, retention=300):
+        self.path = str(path)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._handlers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_poll = 0.0
+        self.published = 0
+        self.received = 0
+        conn = self._connection()
+        conn.execute(
+            """
+            create table if not exists invalidations (
+                id integer primary key autoincrement,
+                origin text not null,
+                cache text not null,
+                cache_key blob,
+                created_at real not null
+            )
+            """
+        )
+        row = conn.execute("select coalesce(max(id), 0) from invalidations").fetchone()
+        self._last_id = row[0]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            self._local.conn = conn
+        return conn
+
+    def subscribe(self, name, handler):
+        """Call handler(key) for invalidations of name published by other processes (key ALL: everything)."""
+        self._handlers[name] = handler
+
+    def publish(self, name, key):
+        """Record an invalidation of key (or of the whole cache) for other workers."""
+        try:
+            payload = None if key is ALL else _key_to_json(key)
+        except (TypeError, ValueError):
+            # Not JSON-encodable: invalidate everything under name instead.
+            payload = None
+        try:
+            self._connection().execute(
+                "insert into invalidations (origin, cache, cache_key, created_at) values (?, ?, ?, ?)",
+                (self.origin, name, payload, time.time()),
+            )
+            self.published += 1
+        except sqlite3.Error as err:
+            print("Failed to publish cache invalidation:", err)
+
+    def poll(self, force=False):
+        """Apply invalidations from other workers if poll_interval has elapsed."""
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return
+        with self._lock:
+            if not force and now < self._next_poll:
+                return
+            self._next_poll = now + self.poll_interval
+            try:
+                conn = self._connection()
+                rows = conn.execute(
+                    "select id, origin, cache, cache_key from invalidations where id > ? order by id",
+                    (self._last_id,),
+                ).fetchall()
+                if rows:
+                    self._last_id = rows[-1][0]
+                    conn.execute("delete from invalidations where created_at < ?", (time.time() - self.retention,))
+            except sqlite3.Error as err:
+                print("Failed to poll cache invalidations:", err)
+                return
+        for _, origin, name, payload in rows:
+            handler = self._handlers.get(name)
+            if origin == self.origin or handler is None:
+                continue
+            try:
+                handler(ALL if payload is None else _key_from_json(payload))
+            except Exception as err:
+                print(f"Failed to apply {name} invalidation:", err)
+            self.received += 1
+
+    def stats(self):
+        return {"published": self.published, "received": self.received, "last_id": self._last_id}
+
+
+class SQLiteCache():
+    """TTL cache shared by all worker processes on one host, stored in a SQLite file.
+
+    Values are pickled and signed with secret (see SignedPickle); entries without
+    a valid signature are dropped as misses. The least recently written entries
+    beyond maxsize (None: no cap, only expiry) are evicted every few writes rather
+    than on each one.
+    """
+    def __init__(self, path, name, secret, maxsize=128, ttl=60):
+        self.path = str(path)
+        self.name = name
+        self._values = SignedPickle(secret)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._connection().execute(
+            """
+            create table if not exists cache_entries (
+                cache text not null,
+                cache_key blob not null,
+                value blob not null,
+                expires_at real not null,
+                written_at real not null,
+                primary key (cache, cache_key)
+            )
+            """
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key, default=None):
+        try:
+            row = self._connection().execute(
+                "select value from cache_entries where cache = ? and cache_key = ? and expires_at > ?",
+                (self.name, pickle.dumps(key), time.time()),
+            ).fetchone()
+        except sqlite3.Error as err:
+            print("Failed to read shared cache:", err)
+            row = None
+        value = _MISSING
+        if row is not None:
+            try:
+                value = self._values.loads(row[0])
+            except ValueError as err:
+                print(f"Rejected {self.name} cache entry:", err)
+                self.delete(key)
+        self._count(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value):
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "insert or replace into cache_entries (cache, cache_key, value, expires_at, written_at) values (?, ?, ?, ?, ?)",
+                (self.name, pickle.dumps(key), self._values.dumps(value), now + self.ttl, now),
+            )
+            with self._stats_lock:
+                self._writes += 1
+                evict = self._writes % 64 == 0
+            if evict:
+                conn.execute("delete from cache_entries where cache = ? and expires_at <= ?", (self.name, now))
+            if evict and self.maxsize is not None:
+                conn.execute(
+                    """
+                    delete from cache_entries where cache = ? and cache_key in (
+                        select cache_key from cache_entries where cache = ?
+                        order by written_at desc limit -1 offset ?
+                    )
+                    """,
+                    (self.name, self.name, self.maxsize),
+                )
+        except sqlite3.Error as err:
+            print("Failed to write shared cache:", err)
+
+    update = set
+
+    def delete(self, key):
+        try:
+            self._connection().execute(
+                "delete from cache_entries where cache = ? and cache_key = ?", (self.name, pickle.dumps(key))
+            )
+        except sqlite3.Error as err:
+            print("Failed to delete from shared cache:", err)
+
+    def clear(self):
+        try:
+            self._connection().execute("delete from cache_entries where cache = ?", (self.name,))
+        except sqlite3.Error as err:
+            print("Failed to clear shared cache:", err)
+
+    def stats(self):
+        try:
+            size = self._connection().execute(
+                "select count(*) from cache_entries where cache = ?", (self.name,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        with self._stats_lock:
+            return {"backend": "sqlite", "hits": self.hits, "misses": self.misses, "size": size, "maxsize": self.maxsize}
+
+
+class RedisCache():
+    """TTL cache shared through a Redis (or protocol-compatible) server.
+
+    Entries live under "<prefix>:<name>:<pickled key hex>" with SETEX, so Redis
+    handles expiry; maxsize is left to the server's eviction policy. Values are
+    signed like SQLiteCache's.
+    """
+    def __init__(self, client, name, secret, maxsize=128, ttl=60, prefix="recipes"):
+        self.client = client
+        self.name = name
+        self._values = SignedPickle(secret)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prefix = f"{prefix}:{name}:"
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key):
+        return self.prefix + pickle.dumps(key).hex()
+
+    def get(self, key, default=None):
+        try:
+            raw = self.client.get(self._key(key))
+        except redis.RedisError as err:
+            print("Failed to read Redis cache:", err)
+            raw = None
+        value = _MISSING
+        if raw is not None:
+            try:
+                value = self._values.loads(raw)
+            except ValueError as err:
+                print(f"Rejected {self.name} cache entry:", err)
+                self.delete(key)
+        with self._stats_lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return default if value is _MISSING else value
+
+    def set(self, key, value):
+        try:
+            self.client.setex(self._key(key), max(1, int(self.ttl)), self._values.dumps(value))
+        except redis.RedisError as err:
+            print("Failed to write Redis cache:", err)
+
+    update = set
+
+    def delete(self, key):
+        try:
+            self.client.delete(self._key(key))
+        except redis.RedisError as err:
+            print("Failed to delete from Redis cache:", err)
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + "*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as err:
+            print("Failed to clear Redis cache:", err)
+
+    def stats(self):
+        with self._stats_lock:
+            return {"backend": "redis", "hits": self.hits, "misses": self.misses, "size": None, "maxsize": self.maxsize}
+
+
+class CacheFactory():
+    """Build the named caches used by DBHandler on the backend chosen by CACHE_BACKEND.
+
+    "local" (default): per-process TTLCache.
+    "sqlite": one SQLiteCache file (CACHE_PATH) shared by every worker on the host.
+    "redis": RedisCache on REDIS_URL (requires the redis package).
+
+    Whatever the backend, an InvalidationBus (CACHE_BUS_PATH, default
+    "<CACHE_PATH stem>-bus.sqlite3") broadcasts invalidations to the other worker
+    processes on the host: local caches subscribe to it, and so can other
+    per-process state such as the search indexes. CACHE_BUS_PATH=off (or
+    bus_path=False) disables it for single-process setups.
+
+    The shared backends sign their values with secret (default FLASK_SECRET_KEY),
+    which must be the same in every worker.
+    """
+    def __init__(self, backend=None, path=None, bus_path=None, redis_url=None, secret=None):
+        self.backend = (backend or os.environ.get("CACHE_BACKEND", "local")).lower()
+        self.path = path or os.environ.get("CACHE_PATH", "cache.sqlite3")
+        self.secret = secret or os.environ.get("FLASK_SECRET_KEY")
+        if self.backend in ("sqlite", "redis") and not self.secret:
+            raise RuntimeError(f"CACHE_BACKEND={self.backend} requires FLASK_SECRET_KEY to sign cached values")
+        self.caches = {}
+        self.bus = None
+        self._redis = None
+        if bus_path is None:
+            bus_path = os.environ.get("CACHE_BUS_PATH") or os.path.splitext(str(self.path))[0] + "-bus.sqlite3"
+        if bus_path and bus_path != "off":
+            self.bus = InvalidationBus(bus_path)
+        if self.backend == "redis":
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+            self._redis = redis.Redis.from_url(redis_url or os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+        elif self.backend not in ("local", "sqlite"):
+            raise RuntimeError(f"Unknown CACHE_BACKEND: {self.backend}")
+
+    def create(self, name, maxsize=128, ttl=60):
+        """Return a cache called name (the name scopes keys and invalidations)."""
+        if self.backend == "sqlite":
+            cache = SQLiteCache(self.path, name, self.secret, maxsize=maxsize, ttl=ttl)
+        elif self.backend == "redis":
+            cache = RedisCache(self._redis, name, self.secret, maxsize=maxsize, ttl=ttl)
+        else:
+            cache = TTLCache(maxsize=maxsize, ttl=ttl, name=name, bus=self.bus)
+        self.caches[name] = cache
+        return cache
+
+    def stats(self):
+        """Return per-cache hit/miss metrics (plus bus counters when a bus is attached)."""
+        stats = {name: dict(cache.stats(), hit_ratio=_ratio(cache.hits, cache.misses)) for name, cache in self.caches.items()}
+        if self.bus is not None:
+            stats["_bus"] = self.bus.stats()
+        return stats
+
+
+def _ratio(hits, misses):
+    total = hits + misses
+    return round(hits / total, 4) if total else None
@@ -1,14 +1,94 @@
+import asyncio
+import copy
+import json
 import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool, CNX_POOL_MAXSIZE
+from cache import ALL, CacheFactory
+from metrics import InstrumentedCursor, QueryMetrics
+from pagination import seek_clause
+from recommendations import MAX_POSTING, build_all, features, merge_neighbor, similarity, top_neighbors
+from search_index import AutocompleteIndex, SearchIndex
+
+def _json_list(value):
+    """Decode a JSON array column (str/bytes from the driver, NULL for no rows) into a list."""
+    if value is None:
+        return []
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode()
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+
+class Transaction():
+    """Unit-of-work handle yielded by DBHandler.transaction(); proxies DBHandler methods."""
+    def __init__(self, db):
+        self._db = db
+        self.ok = True
+        self.callbacks = []
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def rollback_only(self):
+        """Mark the unit of work so it rolls back instead of committing."""
+        self.ok = False
+
 
 class DBHandler():
     """Database access layer for user, recipe, rating, and feed operations."""
     def __init__(self):
-        """Initialize handler with config from env and open a connection."""
-        self.cnx = None
-        self.cursor = None
+        """Initialize handler with config from env and open a connection pool."""
+        self._local = threading.local()
+        self._pool = None
         self._user_rating_column = None
+        self._rating_counters = None
+        self._user_stats_table = None
+        self._recipe_neighbors_table = None
+        self._json_detail = True
+        # Migrations applied by another process (flask migrate while serving) are noticed within this interval.
+        self._schema_check_interval = float(os.environ.get('SCHEMA_CHECK_INTERVAL', '30'))
+        self._schema_version = None
+        self._next_schema_check = 0.0
+        # RecipeNeighbors.neighbor_rank is a tinyint.
+        self.recommend_k = max(1, min(127, int(os.environ.get('RECOMMEND_NEIGHBORS', '10'))))
+        # Ingredients/tags too common to generate neighbor candidates, as (expires_at, ingredients, tags).
+        self._common_features_ttl = float(os.environ.get('COMMON_FEATURES_TTL', '3600'))
+        self._common_features = None
+        # Async views run independent reads on separate pooled connections; 0 runs them one by one.
+        self.concurrent_reads = os.environ.get('DB_CONCURRENT_READS', '1') == '1'
+        self.search_index = SearchIndex()
+        self.autocomplete_index = AutocompleteIndex()
+        self.job_queue = None
+        self.metrics = QueryMetrics()
+        # Read-path caches on the CACHE_BACKEND chosen for this deployment (see cache.CacheFactory).
+        self.caches = CacheFactory(
+            path=os.environ.get('CACHE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache.sqlite3')
+        )
+        self.home_cache = self.caches.create("home", maxsize=4, ttl=float(os.environ.get('HOME_CACHE_TTL', '60')))
+        self.recipe_page_cache = self.caches.create(
+            "recipe_page",
+            maxsize=int(os.environ.get('RECIPE_PAGE_CACHE_SIZE', '512')),
+            ttl=float(os.environ.get('RECIPE_PAGE_CACHE_TTL', '120')),
+        )
+        self.feed_cache = self.caches.create("feed", maxsize=256, ttl=float(os.environ.get('FEED_CACHE_TTL', '60')))
+        # A per-process liked set would go stale in other workers, so it needs a
+        # shared backend or the invalidation bus.
+        liked_cache_users = int(os.environ.get('LIKED_CACHE_USERS', '1024'))
+        shared = self.caches.bus is not None or self.caches.backend != "local"
+        self.liked_cache = self.caches.create(
+            "liked", maxsize=liked_cache_users, ttl=float(os.environ.get('LIKED_CACHE_TTL', '300'))
+        ) if liked_cache_users > 0 and shared else None
+        self.role_cache = self.caches.create("role", maxsize=4096, ttl=float(os.environ.get('ROLE_CACHE_TTL', '300')))
+        self.count_cache = self.caches.create("count", maxsize=512, ttl=float(os.environ.get('COUNT_CACHE_TTL', '300')))
+        if self.caches.bus is not None:
+            # The search indexes live in each worker; writes in one worker are replayed in the others.
+            self.caches.bus.subscribe("search_index", self._apply_search_change)
         self._db_config = {
             "user": os.environ.get('DB_USER'),
             "password": os.environ.get('DB_PASSWORD'),
@@ -18,40 +98,488 @@ class DBHandler():
         }
         if not all([self._db_config["user"], self._db_config["host"], self._db_config["database"], self._db_config["password"]]):
             raise RuntimeError("Database configuration missing. Please set DB_USER, DB_PASSWORD, DB_HOST, DB_NAME.")
+        try:
+            self._pool_size = int(os.environ.get('DB_POOL_SIZE', '5'))
+            self._pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', '5'))
+        except ValueError:
+            raise RuntimeError("DB_POOL_SIZE and DB_POOL_TIMEOUT must be numbers.")
+        if not 1 <= self._pool_size <= CNX_POOL_MAXSIZE:
+            raise RuntimeError(f"DB_POOL_SIZE must be between 1 and {CNX_POOL_MAXSIZE}.")
+        self._job_pool_size = int(os.environ.get('DB_JOB_POOL_SIZE', '2'))
+        self._job_pool = None
+        self._stats_lock = threading.Lock()
+        self._pool_stats = {"checkouts": 0, "releases": 0, "in_use": 0, "waits": 0, "timeouts": 0}
         self._connect()
 
     def _connect(self):
-        """Establish a DB connection and cursor."""
+        """Create the connection pool; connections are checked out per thread."""
         try:
-            self.cnx = mysql.connector.connect(**self._db_config)
-            self.cursor = self.cnx.cursor()
-            self._user_rating_column = None
+            self._pool = MySQLConnectionPool(
+                pool_name=os.environ.get('DB_POOL_NAME', 'dbhandler'),
+                pool_size=self._pool_size,
+                pool_reset_session=True,
+                **self._db_config,
+            )
+            self.reset_schema_flags()
             print("DBhandler initiated")
         except Error as e:
-            self.cnx = None
-            self.cursor = None
+            self._pool = None
             raise RuntimeError(f"Database connection failed: {e}")
 
+    @property
+    def cnx(self):
+        """Connection checked out by the current thread, or None."""
+        return getattr(self._local, "cnx", None)
+
+    @property
+    def cursor(self):
+        """Cursor of the current thread, checking out a pooled connection on first use."""
+        if getattr(self._local, "cursor", None) is None:
+            self._checkout()
+        return self._local.cursor
+
+    def _checkout(self):
+        """Take a connection from the pool for the current thread, waiting up to DB_POOL_TIMEOUT.
+
+        The pool pings a connection when handing it out and reconnects it if the
+        server dropped it, so callers never see a stale socket.
+        """
+        pool = getattr(self._local, "pool", None) or self._pool
+        deadline = time.monotonic() + self._pool_timeout
+        waited = False
+        while True:
+            try:
+                cnx = pool.get_connection()
+                break
+            except PoolError:
+                if time.monotonic() >= deadline:
+                    if pool is self._pool:
+                        with self._stats_lock:
+                            self._pool_stats["timeouts"] += 1
+                    raise RuntimeError(f"No database connection available after {self._pool_timeout}s (pool size {pool.pool_size}).")
+                waited = True
+                time.sleep(0.01)
+            except Error as e:
+                raise RuntimeError(f"Database connection failed: {e}")
+        self._local.cnx = cnx
+        self._local.cursor = InstrumentedCursor(cnx.cursor(), self.metrics, __file__)
+        self._local.counted = pool is self._pool
+        if self._local.counted:
+            with self._stats_lock:
+                self._pool_stats["checkouts"] += 1
+                self._pool_stats["in_use"] += 1
+                if waited:
+                    self._pool_stats["waits"] += 1
+        self._check_schema_version()
+
+    def _check_schema_version(self):
+        """Reset the cached schema flags when SchemaVersion changed since the last look.
+
+        Checked at most every SCHEMA_CHECK_INTERVAL seconds on connection checkout, so a
+        migration run by another process switches every worker to the new code paths
+        (rating counters, UserStats, RecipeNeighbors) without a restart.
+        """
+        now = time.monotonic()
+        if now < self._next_schema_check:
+            return
+        self._next_schema_check = now + self._schema_check_interval
+        try:
+            self._local.cursor.execute("select coalesce(max(version), 0) from SchemaVersion")
+            version = self._local.cursor.fetchone()[0]
+        except Error:
+            version = 0  # No SchemaVersion table yet: nothing migrated.
+        if self._schema_version is not None and version != self._schema_version:
+            print(f"Schema version changed ({self._schema_version} -> {version}); re-checking schema features")
+            self.reset_schema_flags()
+        self._schema_version = version
+
+    def use_background_pool(self):
+        """Route the calling thread (a job worker) to a separate DB_JOB_POOL_SIZE pool.
+
+        Background jobs then never take connections from the pool that serves requests.
+        """
+        with self._stats_lock:
+            if self._job_pool is None:
+                try:
+                    self._job_pool = MySQLConnectionPool(
+                        pool_name=os.environ.get('DB_POOL_NAME', 'dbhandler') + "-jobs",
+                        pool_size=self._job_pool_size,
+                        pool_reset_session=True,
+                        **self._db_config,
+                    )
+                except Error as e:
+                    raise RuntimeError(f"Database connection failed: {e}")
+        self._local.pool = self._job_pool
+
     def _ensure_cursor(self):
-        """Ensure cursor/connection is alive or reconnect."""
-        if self.cnx is None or self.cursor is None or not self.cnx.is_connected():
-            self._connect()
+        """Ensure the current thread holds a pooled connection and cursor."""
+        if self.cnx is None or getattr(self._local, "cursor", None) is None:
+            self._checkout()
+
+    def release(self):
+        """Return the current thread's connection to the pool (end of request/unit of work)."""
+        cursor = getattr(self._local, "cursor", None)
+        cnx = getattr(self._local, "cnx", None)
+        self._local.cursor = None
+        self._local.cnx = None
+        self._local.tx = None
+        if cnx is None:
+            return
+        try:
+            if cursor is not None:
+                cursor.close()
+        except Error as err:
+            print("Failed to close cursor:", err)
+        try:
+            cnx.close()
+        except Error as err:
+            print("Failed to return connection to pool:", err)
+        if not getattr(self._local, "counted", True):
+            return
+        with self._stats_lock:
+            self._pool_stats["releases"] += 1
+            self._pool_stats["in_use"] -= 1
+
+    async def gather_reads(self, *reads):
+        """Run independent read callables concurrently and return their results in order.
+
+        Each read runs in a worker thread on its own pooled connection, which is
+        released as soon as the read returns, so a page waits for its slowest
+        query rather than the sum. Reads must not depend on an open transaction.
+        The caller's own connection goes back to the pool first, so a request never
+        holds one connection while waiting for more (size DB_POOL_SIZE for the
+        server's threads times the reads of the busiest page).
+        """
+        if not self.concurrent_reads:
+            return [read() for read in reads]
+        if getattr(self._local, "tx", None) is None:
+            self.release()
+
+        def run(read):
+            try:
+                return read()
+            finally:
+                self.release()
+        return await asyncio.gather(*(asyncio.to_thread(run, read) for read in reads))
+
+    @contextmanager
+    def transaction(self):
+        """Run several DBHandler calls on one cursor with a single commit.
+
+        Usage: ``with mydb.transaction() as tx: tx.create_recipe(...)``. Methods called
+        inside skip their own commit; a failing method marks the unit for rollback and
+        ``tx.ok`` reports the outcome after the block. Nested calls join the outer unit.
+        """
+        current = getattr(self._local, "tx", None)
+        if current is not None:
+            yield current
+            return
+        self._ensure_cursor()
+        tx = Transaction(self)
+        self._local.tx = tx
+        try:
+            yield tx
+        except Exception:
+            tx.ok = False
+            self._local.tx = None
+            self.cnx.rollback()
+            raise
+        self._local.tx = None
+        if not tx.ok:
+            self.cnx.rollback()
+            return
+        try:
+            self.cnx.commit()
+        except Error as err:
+            print("Failed to commit transaction:", err)
+            tx.ok = False
+            self.cnx.rollback()
+            return
+        for callback in tx.callbacks:
+            self._run_callback(callback)
+
+    def _commit(self):
+        """Commit now, or leave it to the enclosing transaction() if one is open."""
+        if getattr(self._local, "tx", None) is None:
+            self.cnx.commit()
+
+    def _rollback(self):
+        """Roll back now, or mark the enclosing transaction() for rollback."""
+        tx = getattr(self._local, "tx", None)
+        if tx is not None:
+            tx.ok = False
+        else:
+            self.cnx.rollback()
+
+    def _after_commit(self, callback):
+        """Run callback once the current write is committed (deferred inside transaction())."""
+        tx = getattr(self._local, "tx", None)
+        if tx is not None:
+            tx.callbacks.append(callback)
+        else:
+            self._run_callback(callback)
+
+    def _run_callback(self, callback):
+        try:
+            callback()
+        except Exception as err:
+            print("Post-commit hook failed:", err)
+
+    def use_job_queue(self, queue):
+        """Run notification inserts and rating recalculation on a background JobQueue."""
+        self.job_queue = queue
+        queue.register("notification", self._run_notification_job)
+        queue.register("recalc_recipe_rating", lambda payload: self.recalc_recipe_rating(payload["recipe_id"]))
+        queue.register("recipe_neighbors", self._run_neighbors_job)
+
+    def _run_neighbors_job(self, payload):
+        if not self.refresh_recipe_neighbors(payload["recipe_ids"]):
+            raise RuntimeError("Recipe neighbor refresh failed")
+
+    def _run_notification_job(self, payload):
+        if not self.add_notification(**payload):
+            raise RuntimeError("Notification insert failed")
+
+    def _queue_notification(self, user_id: int, notification_type: str, actor_id=None, recipe_id=None, message=None):
+        """Add a notification once the primary write commits (on the job queue if one is attached).
+
+        Notifications are never part of the caller's unit of work: a failed insert
+        must not roll back the rating, follow or status change that triggered it.
+        """
+        if self.job_queue is None:
+            self._after_commit(lambda: self.add_notification(
+                user_id, notification_type, actor_id=actor_id, recipe_id=recipe_id, message=message
+            ))
+            return True
+        payload = {
+            "user_id": user_id,
+            "notification_type": notification_type,
+            "actor_id": actor_id,
+            "recipe_id": recipe_id,
+            "message": message,
+        }
+        self._after_commit(lambda: self.job_queue.enqueue("notification", payload))
+        return True
+
+    def _schedule_rating_recalc(self, recipe_id: int):
+        """Recalculate recipe/author ratings now, or on the job queue after commit."""
+        if self.job_queue is None:
+            self.recalc_recipe_rating(recipe_id)
+        else:
+            self._after_commit(lambda: self.job_queue.enqueue("recalc_recipe_rating", {"recipe_id": recipe_id}))
+
+    def _schedule_neighbor_refresh(self, recipe_ids):
+        """Update precomputed recommendations for changed recipes once the write commits."""
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids or not self._recipe_neighbors_available():
+            return
+        if self.job_queue is None:
+            self._after_commit(lambda: self.refresh_recipe_neighbors(recipe_ids))
+        else:
+            self._after_commit(lambda: self.job_queue.enqueue("recipe_neighbors", {"recipe_ids": recipe_ids}))
+
+    def poll_invalidations(self):
+        """Apply invalidations other worker processes published on the cache bus (time-gated)."""
+        if self.caches.bus is not None:
+            self.caches.bus.poll()
+
+    def cache_stats(self):
+        """Return hit/miss metrics of the read-path caches."""
+        return self.caches.stats()
+
+    def pool_stats(self):
+        """Return a snapshot of pool usage counters."""
+        with self._stats_lock:
+            stats = dict(self._pool_stats)
+        stats["size"] = self._pool_size
+        stats["available"] = max(0, self._pool_size - stats["in_use"])
+        return stats
+
+    def flush_query_metrics(self):
+        """Record the current thread's in-progress statement so request totals are complete."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is not None:
+            cursor.flush()
+
+    def metrics_text(self):
+        """Return query metrics plus pool gauges in the Prometheus text format."""
+        pool = self.pool_stats()
+        return self.metrics.render_prometheus({
+            "dbhandler_pool_size": ("Configured connection pool size.", pool["size"]),
+            "dbhandler_pool_in_use": ("Pooled connections currently checked out.", pool["in_use"]),
+            "dbhandler_pool_waits_total": ("Checkouts that had to wait for a free connection.", pool["waits"]),
+            "dbhandler_pool_timeouts_total": ("Checkouts that gave up after DB_POOL_TIMEOUT.", pool["timeouts"]),
+        })
 
     def closer_connection(self):
-        """Close the DB connection and clear cursor references."""
+        """Return the current thread's connection to the pool and clear cursor references."""
         if self.cnx:
-            self.cnx.close()
-            self.cnx = None
-            self.cursor = None
+            self.release()
             print("Database connection closed!")
+    def fetch_search_documents(self, recipe_ids=None, author_id=None):
+        """Return searchable documents (text fields plus card image/rating) of active recipes."""
+        where = ["r.status = 'active'"]
+        params = []
+        if recipe_ids is not None:
+            if not recipe_ids:
+                return []
+            where.append(f"r.recipe_id in ({', '.join(['%s'] * len(recipe_ids))})")
+            params.extend(recipe_ids)
+        if author_id is not None:
+            where.append("r.author_id = %s")
+            params.append(author_id)
+        where_sql = " and ".join(where)
+        recipe_query = f"""
+            select r.recipe_id, r.title, r.category, r.date_posted, concat_ws(' ', u.name, u.surname),
+                   r.cover_img_path, r.rating, r.author_id
+            from Recipes r
+            left join Users u on u.user_id = r.author_id
+            where {where_sql}
+        """
+        ing_query = f"select i.recipe_id, i.ingredient from Ingredients i join Recipes r on r.recipe_id = i.recipe_id where {where_sql}"
+        tag_query = f"select t.recipe_id, t.tag_name from Tags t join Recipes r on r.recipe_id = t.recipe_id where {where_sql}"
+        try:
+            self.cursor.execute(recipe_query, tuple(params))
+            docs = {
+                row[0]: {
+                    "id": row[0],
+                    "title": row[1],
+                    "category": row[2],
+                    "date_posted": row[3],
+                    "author": row[4],
+                    "image": row[5],
+                    "rating": row[6],
+                    "author_id": row[7],
+                    "ingredients": [],
+                    "tags": [],
+                } for row in self.cursor.fetchall()
+            }
+            self.cursor.execute(ing_query, tuple(params))
+            for recipe_id, ingredient in self.cursor.fetchall():
+                if recipe_id in docs:
+                    docs[recipe_id]["ingredients"].append(ingredient)
+            self.cursor.execute(tag_query, tuple(params))
+            for recipe_id, tag_name in self.cursor.fetchall():
+                if recipe_id in docs:
+                    docs[recipe_id]["tags"].append(tag_name)
+            return list(docs.values())
+        except Error as err:
+            print("Failed to fetch search documents:", err)
+            return None
+
+    def build_search_index(self):
+        """(Re)build the in-memory search and autocomplete indexes from all active recipes."""
+        docs = self.fetch_search_documents()
+        if docs is None:
+            return False
+        self.search_index.build(docs)
+        self.autocomplete_index.build(docs)
+        print(f"Search index built with {len(docs)} recipes")
+        return True
+
+    def _refresh_search_index(self, recipe_ids=(), author_id=None):
+        """Re-index the given recipes; ids no longer active are dropped from the index."""
+        if not self.search_index.ready:
+            return
+        recipe_ids = list(recipe_ids)
+        if author_id is not None:
+            docs = self.fetch_search_documents(author_id=author_id)
+        else:
+            docs = self.fetch_search_documents(recipe_ids=recipe_ids)
+        if docs is None:
+            return
+        found = set()
+        for doc in docs:
+            self.search_index.add(doc)
+            self.autocomplete_index.add(doc)
+            found.add(doc["id"])
+        for recipe_id in recipe_ids:
+            if recipe_id not in found:
+                self._unindex_recipe(recipe_id)
+
+    def _search_index_changed(self, recipe_ids=(), author_id=None, removed=(), rebuild=False):
+        """Update this worker's search indexes after a commit and announce the change to the other workers."""
+        recipe_ids = list(recipe_ids)
+        if rebuild:
+            if self.search_index.ready:
+                self.build_search_index()
+        else:
+            for recipe_id in removed:
+                self._unindex_recipe(recipe_id)
+            if recipe_ids or author_id is not None:
+                self._refresh_search_index(recipe_ids, author_id=author_id)
+        if self.caches.bus is not None:
+            self.caches.bus.publish(
+                "search_index", ALL if rebuild else ("recipes", recipe_ids + list(removed), author_id)
+            )
+
+    def _apply_search_change(self, change):
+        """Replay a search index change published by another worker."""
+        if change is ALL:
+            self.build_search_index()
+        elif change[0] == "recipes":
+            _, recipe_ids, author_id = change
+            if recipe_ids:
+                self._refresh_search_index(recipe_ids)
+            if author_id is not None:
+                self._refresh_search_index(author_id=author_id)
+        elif change[0] == "rating":
+            self.autocomplete_index.update_card(change[1], rating=change[2])
+
+    def _autocomplete_rating_changed(self, recipe_id, rating):
+        """Update the rating shown on a suggestion card here and in the other workers."""
+        self.autocomplete_index.update_card(recipe_id, rating=rating)
+        if self.caches.bus is not None:
+            self.caches.bus.publish("search_index", ("rating", recipe_id, rating))
+
+    def _unindex_recipe(self, recipe_id):
+        """Drop a recipe from the in-memory search and autocomplete indexes."""
+        self.search_index.remove(recipe_id)
+        self.autocomplete_index.remove(recipe_id)
+
+    def autocomplete_recipes(self, query: str, limit: int = 5):
+        """Return up to limit suggestion cards (id, title, image, rating) for a partial query.
+
+        Answered from the in-memory autocomplete index without touching MySQL;
+        falls back to search_recipes when the index has not been built.
+        """
+        if not query or not query.strip():
+            return []
+        if self.autocomplete_index.ready:
+            return self.autocomplete_index.suggest(query, limit=limit)
+        return self.search_recipes(query, limit=limit, offset=0)
+
+    def _fetch_recipe_cards(self, recipe_ids, viewer_id=None):
+        """Return card dicts for the given active recipe ids, preserving their order."""
+        if not recipe_ids:
+            return []
+        query = f"""
+            select r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time
+            from Recipes r
+            where r.status = 'active' and r.recipe_id in ({', '.join(['%s'] * len(recipe_ids))})
+        """
+        try:
+            self.cursor.execute(query, tuple(recipe_ids))
+            cards = {
+                row[0]: {
+                    "id": row[0],
+                    "title": row[1],
+                    "image": row[2],
+                    "rating": row[3],
+                    "prepare_time": row[4],
+                } for row in self.cursor.fetchall()
+            }
+            return self._overlay_liked([cards[recipe_id] for recipe_id in recipe_ids if recipe_id in cards], viewer_id)
+        except Error as err:
+            print("Failed to fetch recipe cards:", err)
+            return []
+
     def check_user_login(self, login):
         """Lookup user credentials by email; returns (user_id, password hash) tuple or None."""
         query = "select user_id, password from Users where email=%s"
         self._ensure_cursor()
         self.cursor.execute(query, (login,))
-        result = self.cursor.fetchone()
-        print("result: ", result)
-        return result
+        return self.cursor.fetchone()
     
     def register_new_user(self, name, login, password):
         """Create a new user; inputs are strings, returns bool success."""
@@ -62,22 +590,168 @@ class DBHandler():
         try:
             self._ensure_cursor()
             self.cursor.execute(query, (login, password, name))
-            self.cnx.commit()
+            self._commit()
             return True
         except Error as err:
             print(err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
-    def fetch_user_role(self, user_id: int):
-        """Return the role for the given user id."""
+    def fetch_user_role(self, user_id: int, fresh: bool = False):
+        """Return the role for the given user id (cached until set_user_role changes it).
+
+        fresh=True reads it from Users regardless of the cache, for admin-gated actions.
+        """
+        role = None if fresh else self.role_cache.get(user_id)
+        if role is not None:
+            return role
         try:
             self.cursor.execute("select role from Users where user_id = %s", (user_id,))
             row = self.cursor.fetchone()
-            return row[0] if row else None
         except Error as err:
             print("Failed to fetch user role:", err)
             return None
+        role = row[0] if row else None
+        if role is not None:
+            self.role_cache.set(user_id, role)
+        return role
+
+    def set_user_role(self, user_id: int, role: str):
+        """Change a user's role and drop the cached role once committed."""
+        try:
+            self.cursor.execute("update Users set role = %s where user_id = %s", (role, user_id))
+            updated = self.cursor.rowcount > 0
+            self._commit()
+            self._after_commit(lambda: self.role_cache.delete(user_id))
+            return updated
+        except Error as err:
+            print("Failed to set user role:", err)
+            self._rollback()
+            return False
+
+    def reset_schema_flags(self):
+        """Forget cached schema checks (call after migrations change columns)."""
+        self._user_rating_column = None
+        self._rating_counters = None
+        self._user_stats_table = None
+        self._recipe_neighbors_table = None
+        self._json_detail = True
+
+    def _user_stats_available(self):
+        """Check once whether the denormalized UserStats table exists (migration 2)."""
+        if self._user_stats_table is not None:
+            return self._user_stats_table
+        try:
+            self.cursor.execute("show tables like 'UserStats'")
+            self._user_stats_table = self.cursor.fetchone() is not None
+        except Error as err:
+            print("Failed to inspect UserStats table:", err)
+            self._user_stats_table = False
+        return self._user_stats_table
+
+    # Counter columns of UserStats, in table order.
+    USER_STATS_COLUMNS = ("likes", "followers", "reviews", "posted", "rating_sum", "rating_count")
+
+    def _bump_user_stats(self, user_id=None, active_recipe_id=None, **deltas):
+        """Add deltas to a user's UserStats row, creating it if missing.
+
+        With active_recipe_id the row of that recipe's author is updated, and only
+        when the recipe is active (stats only count active recipes).
+        """
+        if not self._user_stats_available():
+            return
+        columns = [name for name in self.USER_STATS_COLUMNS if deltas.get(name)]
+        if not columns:
+            return
+        updates = ", ".join(f"{name} = {name} + values({name})" for name in columns)
+        values = [deltas[name] for name in columns]
+        if active_recipe_id is not None:
+            query = f"""
+                insert into UserStats (user_id, {', '.join(columns)})
+                select r.author_id, {', '.join(['%s'] * len(columns))}
+                from Recipes r
+                where r.recipe_id = %s and r.status = 'active'
+                on duplicate key update {updates}
+            """
+            params = values + [active_recipe_id]
+        else:
+            query = f"""
+                insert into UserStats (user_id, {', '.join(columns)})
+                values (%s, {', '.join(['%s'] * len(columns))})
+                on duplicate key update {updates}
+            """
+            params = [user_id] + values
+        self.cursor.execute(query, tuple(params))
+
+    def _recipe_stats_contribution(self, recipe_id: int):
+        """Return the UserStats deltas a single active recipe contributes to its author."""
+        self.cursor.execute(
+            """
+            select (select count(*) from Likes where recipe_id = %s),
+                   (select count(*) from Ratings where recipe_id = %s),
+                   (select coalesce(sum(rating), 0) from Ratings where recipe_id = %s),
+                   (select count(rating) from Ratings where recipe_id = %s)
+            """,
+            (recipe_id, recipe_id, recipe_id, recipe_id),
+        )
+        row = self.cursor.fetchone()
+        return {"likes": row[0], "reviews": row[1], "rating_sum": int(row[2]), "rating_count": row[3], "posted": 1}
+
+    def rebuild_user_stats(self, user_ids=None):
+        """Recompute UserStats rows from the source tables (all users, or the given ids)."""
+        if user_ids is not None and not user_ids:
+            return True
+        where = f"where u.user_id in ({', '.join(['%s'] * len(user_ids))})" if user_ids else ""
+        query = f"""
+            insert into UserStats (user_id, likes, followers, reviews, posted, rating_sum, rating_count)
+            select u.user_id,
+                   (select count(*) from Likes l join Recipes r on l.recipe_id = r.recipe_id
+                     where r.author_id = u.user_id and r.status = 'active'),
+                   (select count(*) from Followers f where f.user_id = u.user_id),
+                   (select count(*) from Ratings rt join Recipes r on rt.recipe_id = r.recipe_id
+                     where r.author_id = u.user_id and r.status = 'active'),
+                   (select count(*) from Recipes r where r.author_id = u.user_id and r.status = 'active'),
+                   (select coalesce(sum(rt.rating), 0) from Ratings rt join Recipes r on rt.recipe_id = r.recipe_id
+                     where r.author_id = u.user_id and r.status = 'active'),
+                   (select count(rt.rating) from Ratings rt join Recipes r on rt.recipe_id = r.recipe_id
+                     where r.author_id = u.user_id and r.status = 'active')
+            from Users u
+            {where}
+            on duplicate key update likes = values(likes), followers = values(followers), reviews = values(reviews),
+                                    posted = values(posted), rating_sum = values(rating_sum), rating_count = values(rating_count)
+        """
+        try:
+            self.cursor.execute(query, tuple(user_ids or ()))
+            self._commit()
+            return True
+        except Error as err:
+            print("Failed to rebuild user stats:", err)
+            self._rollback()
+            return False
+
+    def _recipe_neighbors_available(self):
+        """Check once whether the precomputed RecipeNeighbors table exists (migration 3)."""
+        if self._recipe_neighbors_table is not None:
+            return self._recipe_neighbors_table
+        try:
+            self.cursor.execute("show tables like 'RecipeNeighbors'")
+            self._recipe_neighbors_table = self.cursor.fetchone() is not None
+        except Error as err:
+            print("Failed to inspect RecipeNeighbors table:", err)
+            self._recipe_neighbors_table = False
+        return self._recipe_neighbors_table
+
+    def _rating_counters_available(self):
+        """Check once whether Recipes/Users carry rating_sum/rating_count counters (migration 1)."""
+        if self._rating_counters is not None:
+            return self._rating_counters
+        try:
+            self.cursor.execute("show columns from Recipes like 'rating_count'")
+            self._rating_counters = self.cursor.fetchone() is not None
+        except Error as err:
+            print("Failed to inspect Recipes.rating_count column:", err)
+            self._rating_counters = False
+        return self._rating_counters
 
     def _user_rating_column_available(self):
         """Check once whether Users table has a rating column to persist profile rating."""
@@ -102,16 +776,16 @@ class DBHandler():
             return None
 
     def fetch_recipe_brief(self, recipe_id: int):
-        """Return basic recipe info (author, title) for notifications."""
+        """Return basic recipe info (author, title, status) for notifications and counters."""
         try:
             self.cursor.execute(
-                "select recipe_id, author_id, title from Recipes where recipe_id = %s",
+                "select recipe_id, author_id, title, status from Recipes where recipe_id = %s",
                 (recipe_id,)
             )
             row = self.cursor.fetchone()
             if not row:
                 return None
-            return {"id": row[0], "author_id": row[1], "title": row[2]}
+            return {"id": row[0], "author_id": row[1], "title": row[2], "status": row[3]}
         except Error as err:
             print("Failed to fetch recipe brief:", err)
             return None
@@ -124,11 +798,11 @@ class DBHandler():
         """
         try:
             self.cursor.execute(query, (user_id, actor_id, recipe_id, notification_type, message))
-            self.cnx.commit()
+            self._commit()
             return True
         except Error as err:
             print("Failed to add notification:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def fetch_unread_notifications(self, user_id: int, limit=50):
@@ -174,21 +848,21 @@ class DBHandler():
                 "update Notifications set is_read = 1 where notification_id = %s and user_id = %s",
                 (notification_id, user_id)
             )
-            self.cnx.commit()
+            self._commit()
             return self.cursor.rowcount > 0
         except Error as err:
             print("Failed to mark notification read:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def mark_all_notifications_read(self, user_id: int):
         try:
             self.cursor.execute("update Notifications set is_read = 1 where user_id = %s", (user_id,))
-            self.cnx.commit()
+            self._commit()
             return True
         except Error as err:
             print("Failed to mark all notifications read:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def fetch_recent_recipes(self, limit=4, offset=0):
@@ -239,28 +913,113 @@ class DBHandler():
             print("Failed to fetch popular recipes:", err)
             return []
 
-    def fetch_latest_recipe_by_difficulty(self, difficulty: str):
-        """Return the most recent active recipe for a given difficulty level."""
-        query = """
-            select recipe_id, title, cover_img_path
-            from Recipes
-            where status = 'active' and difficulty = %s
-            order by date_posted desc
-            limit 1
+    # Grouping columns accepted by fetch_latest_recipes_by_group.
+    LATEST_GROUP_COLUMNS = {
+        "difficulty": "r.difficulty",
+        "category": "r.category",
+        "tag": "t.tag_name",
+    }
+
+    def fetch_latest_recipes_by_group(self, group_by: str, values):
+        """Return {value: newest active recipe} for each grouping value in one round-trip.
+
+        group_by is one of LATEST_GROUP_COLUMNS (difficulty, category, tag); values with
+        no active recipe are missing from the result.
+        """
+        column = self.LATEST_GROUP_COLUMNS.get(group_by)
+        if column is None:
+            raise ValueError(f"Unsupported recipe grouping: {group_by}")
+        values = list(dict.fromkeys(values))
+        if not values:
+            return {}
+        tag_join = "join Tags t on t.recipe_id = r.recipe_id" if group_by == "tag" else ""
+        query = f"""
+            select grp, recipe_id, title, cover_img_path
+            from (
+                select {column} as grp, r.recipe_id, r.title, r.cover_img_path,
+                       row_number() over (partition by {column} order by r.date_posted desc, r.recipe_id desc) as rn
+                from Recipes r
+                {tag_join}
+                where r.status = 'active' and {column} in ({', '.join(['%s'] * len(values))})
+            ) ranked
+            where rn = 1
         """
         try:
-            self.cursor.execute(query, (difficulty,))
-            row = self.cursor.fetchone()
-            if not row:
-                return None
+            self.cursor.execute(query, tuple(values))
             return {
-                "id": row[0],
-                "title": row[1],
-                "image": row[2]
+                row[0]: {
+                    "id": row[1],
+                    "title": row[2],
+                    "image": row[3]
+                } for row in self.cursor.fetchall()
             }
         except Error as err:
-            print("Failed to fetch latest recipe by difficulty:", err)
-            return None
+            print(f"Failed to fetch latest recipes by {group_by}:", err)
+            return {}
+
+    def fetch_latest_recipe_by_difficulty(self, difficulty: str):
+        """Return the most recent active recipe for a given difficulty level."""
+        return self.fetch_latest_recipes_by_group("difficulty", [difficulty]).get(difficulty)
+
+    def fetch_home_sections(self, difficulties=("Easy", "Medium", "Difficult")):
+        """Return landing page sections (recent, more, popular, latest per difficulty).
+
+        Served from a TTL snapshot that is dropped whenever recipes are activated,
+        deleted or re-rated, so a cache hit costs no queries.
+        """
+        key = tuple(difficulties)
+        sections = self.home_cache.get(key)
+        if sections is None:
+            sections = {name: read() for name, read in self._home_section_reads(difficulties).items()}
+            self.home_cache.set(key, sections)
+        return copy.deepcopy(sections)
+
+    async def fetch_home_sections_async(self, difficulties=("Easy", "Medium", "Difficult")):
+        """Like fetch_home_sections, but a cache miss runs the four listings concurrently."""
+        key = tuple(difficulties)
+        sections = self.home_cache.get(key)
+        if sections is None:
+            reads = self._home_section_reads(difficulties)
+            sections = dict(zip(reads, await self.gather_reads(*reads.values())))
+            self.home_cache.set(key, sections)
+        return copy.deepcopy(sections)
+
+    def _home_section_reads(self, difficulties):
+        return {
+            "recent": self.fetch_recent_recipes,
+            "more": partial(self.fetch_recent_recipes, offset=4),
+            "popular": self.fetch_popular_recipes,
+            "by_difficulty": partial(self.fetch_latest_recipes_by_group, "difficulty", difficulties),
+        }
+
+    def _invalidate_home(self):
+        """Drop the landing page snapshot once the current write commits."""
+        self._after_commit(self.home_cache.clear)
+
+    def _invalidate_recipe_page(self, recipe_id: int):
+        """Drop the cached /recipe/<id> page payload once the current write commits."""
+        self._after_commit(lambda: self.recipe_page_cache.delete(recipe_id))
+
+    def _invalidate_feed(self):
+        """Drop cached anonymous feed pages once the current write commits."""
+        self._after_commit(self.feed_cache.clear)
+
+    def _invalidate_counts(self):
+        """Drop cached listing totals once the current write commits."""
+        self._after_commit(self.count_cache.clear)
+
+    def _cached_count(self, key, compute):
+        """Return the total for a normalized listing key, running compute() on a miss.
+
+        Failed counts (None) are not cached.
+        """
+        total = self.count_cache.get(key)
+        if total is None:
+            total = compute()
+            if total is None:
+                return 0
+            self.count_cache.set(key, total)
+        return total
 
     def fetch_inactive_recipes(self):
         """Return recipes that are not active for admin review."""
@@ -297,53 +1056,103 @@ class DBHandler():
         recipe_brief = self.fetch_recipe_brief(recipe_id)
         query = "update Recipes set status = %s where recipe_id = %s"
         try:
-            self.cursor.execute(query, (status, recipe_id))
-            self.cnx.commit()
-            if status == "active" and recipe_brief and recipe_brief.get("author_id"):
-                self.add_notification(
-                    recipe_brief["author_id"],
-                    "recipe_status",
-                    actor_id=actor_id,
-                    recipe_id=recipe_id,
-                    message=f"Your recipe '{recipe_brief.get('title') or 'Recipe'}' was approved."
-                )
-            return True
+            with self.transaction() as tx:
+                self.cursor.execute(query, (status, recipe_id))
+                previous = recipe_brief.get("status") if recipe_brief else None
+                if recipe_brief and previous != status and "active" in (previous, status) and self._user_stats_available():
+                    sign = 1 if status == "active" else -1
+                    contribution = self._recipe_stats_contribution(recipe_id)
+                    self._bump_user_stats(
+                        user_id=recipe_brief["author_id"],
+                        **{name: sign * value for name, value in contribution.items()}
+                    )
+                if status == "active" and recipe_brief and recipe_brief.get("author_id"):
+                    self._queue_notification(
+                        recipe_brief["author_id"],
+                        "recipe_status",
+                        actor_id=actor_id,
+                        recipe_id=recipe_id,
+                        message=f"Your recipe '{recipe_brief.get('title') or 'Recipe'}' was approved."
+                    )
+                self._after_commit(lambda: self._search_index_changed([recipe_id]))
+                self._schedule_neighbor_refresh([recipe_id])
+                self._invalidate_recipe_page(recipe_id)
+                self._invalidate_home()
+                self._invalidate_feed()
+                self._invalidate_counts()
+            return tx.ok
         except Error as err:
             print("Failed to update recipe status:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def activate_all_pending_recipes(self):
         """Mark all inactive recipes as active."""
         try:
-            self.cursor.execute("update Recipes set status = 'active' where status = 'inactive'")
-            self.cnx.commit()
-            return True
+            with self.transaction() as tx:
+                self.cursor.execute("select recipe_id, author_id from Recipes where status = 'inactive'")
+                pending = self.cursor.fetchall()
+                pending_ids = [row[0] for row in pending]
+                self.cursor.execute("update Recipes set status = 'active' where status = 'inactive'")
+                if self._user_stats_available():
+                    self.rebuild_user_stats(sorted({row[1] for row in pending if row[1]}))
+                self._after_commit(lambda: self._search_index_changed(pending_ids))
+                self._schedule_neighbor_refresh(pending_ids)
+                self._invalidate_home()
+                self._invalidate_feed()
+                self._invalidate_counts()
+            return tx.ok
         except Error as err:
             print("Failed to activate all recipes:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def delete_recipe(self, recipe_id: int, actor_id=None):
         """Delete a recipe by id and notify the author."""
         recipe_brief = self.fetch_recipe_brief(recipe_id)
         try:
-            self.cursor.execute("delete from Recipes where recipe_id = %s", (recipe_id,))
-            self.cnx.commit()
-            author_id = recipe_brief.get("author_id") if recipe_brief else None
-            title = recipe_brief.get("title") if recipe_brief else None
-            if author_id:
-                self.add_notification(
-                    author_id,
-                    "recipe_status",
-                    actor_id=actor_id,
-                    recipe_id=recipe_id,
-                    message=f"Your recipe '{title or 'Recipe'}' was deleted by admin."
-                )
-            return True
+            with self.transaction() as tx:
+                author_id = recipe_brief.get("author_id") if recipe_brief else None
+                if author_id and self._rating_counters_available():
+                    # The recipe's ratings no longer count towards its author's rating.
+                    self.cursor.execute(
+                        """
+                        update Users u
+                        join Recipes r on r.author_id = u.user_id
+                        set u.rating_sum = u.rating_sum - r.rating_sum,
+                            u.rating_count = u.rating_count - r.rating_count
+                        where r.recipe_id = %s
+                        """,
+                        (recipe_id,),
+                    )
+                    if self._user_rating_column_available():
+                        self.cursor.execute(
+                            "update Users set rating = if(rating_count > 0, rating_sum / rating_count, null) where user_id = %s",
+                            (author_id,),
+                        )
+                if author_id and recipe_brief.get("status") == "active" and self._user_stats_available():
+                    contribution = self._recipe_stats_contribution(recipe_id)
+                    self._bump_user_stats(user_id=author_id, **{name: -value for name, value in contribution.items()})
+                self.cursor.execute("delete from Recipes where recipe_id = %s", (recipe_id,))
+                title = recipe_brief.get("title") if recipe_brief else None
+                if author_id:
+                    self._queue_notification(
+                        author_id,
+                        "recipe_status",
+                        actor_id=actor_id,
+                        recipe_id=recipe_id,
+                        message=f"Your recipe '{title or 'Recipe'}' was deleted by admin."
+                    )
+                self._after_commit(lambda: self._search_index_changed(removed=[recipe_id]))
+                self._schedule_neighbor_refresh([recipe_id])
+                self._invalidate_recipe_page(recipe_id)
+                self._invalidate_home()
+                self._invalidate_feed()
+                self._invalidate_counts()
+            return tx.ok
         except Error as err:
             print("Failed to delete recipe:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def create_recipe(self, *, title: str, author_id: int, procedure: str, prepare_time=None, calories=None,
@@ -376,11 +1185,20 @@ class DBHandler():
                     status,
                 ),
             )
-            self.cnx.commit()
-            return self.cursor.lastrowid
+            recipe_id = self.cursor.lastrowid
+            if status == "active":
+                # A new recipe has no likes or ratings yet; it only adds to posted.
+                self._bump_user_stats(user_id=author_id, posted=1)
+            self._commit()
+            if status == "active":
+                self._after_commit(lambda: self._search_index_changed([recipe_id]))
+                self._schedule_neighbor_refresh([recipe_id])
+                self._invalidate_counts()
+                self._invalidate_feed()
+            return recipe_id
         except Error as err:
             print("Failed to create recipe:", err)
-            self.cnx.rollback()
+            self._rollback()
             return None
 
     def add_recipe_ingredients(self, recipe_id: int, ingredients: list[str]):
@@ -390,11 +1208,11 @@ class DBHandler():
         query = "insert into Ingredients (recipe_id, ingredient) values (%s, %s)"
         try:
             self.cursor.executemany(query, [(recipe_id, ing) for ing in ingredients])
-            self.cnx.commit()
+            self._commit()
             return True
         except Error as err:
             print("Failed to insert ingredients:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def add_recipe_tags(self, recipe_id: int, tags: list[str]):
@@ -404,15 +1222,74 @@ class DBHandler():
         query = "insert into Tags (recipe_id, tag_name) values (%s, %s)"
         try:
             self.cursor.executemany(query, [(recipe_id, tag) for tag in tags])
-            self.cnx.commit()
+            self._commit()
             return True
         except Error as err:
             print("Failed to insert tags:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def fetch_recipe_detail(self, recipe_id: int, include_inactive: bool = False):
-        """Return full recipe details for a given recipe_id."""
+        """Return full recipe details for a given recipe_id.
+
+        Loads the recipe, ingredients, tags and latest reviews in one round-trip with
+        JSON_ARRAYAGG; servers without JSON aggregation use the four-query loader.
+        """
+        if self._json_detail:
+            try:
+                return self._fetch_recipe_detail_json(recipe_id, include_inactive)
+            except Error as err:
+                # 1305: FUNCTION does not exist (MySQL < 5.7.22 / older MariaDB).
+                if getattr(err, "errno", None) != 1305:
+                    print("Failed to fetch recipe detail:", err)
+                    return None
+                print("JSON_ARRAYAGG unavailable, using multi-query recipe detail loader")
+                self._json_detail = False
+        return self._fetch_recipe_detail_queries(recipe_id, include_inactive)
+
+    def _fetch_recipe_detail_json(self, recipe_id: int, include_inactive: bool = False):
+        """Single-statement detail loader; raises Error so the caller can fall back."""
+        query = """
+            select r.recipe_id, r.title, r.category, r.difficulty, r.rating, r.cover_img_path, r.prepare_time,
+                   r.calories, r.protein, r.carbs, r.fats, r.sugar, r.fiber, r.procedure_description, r.status,
+                   r.author_id,
+                   concat_ws(' ', u.name, u.surname) as author_name,
+                   (select json_arrayagg(json_array(i.ingredient_id, i.ingredient))
+                    from Ingredients i where i.recipe_id = %s) as ingredients,
+                   (select json_arrayagg(json_array(t.tag_id, t.tag_name))
+                    from Tags t where t.recipe_id = %s) as tags,
+                   (select json_arrayagg(json_array(rv.rate_id, rv.date_posted, rv.name, rv.surname, rv.comment, rv.rating))
+                    from (
+                        select rt.rate_id, rt.date_posted, coalesce(ru.name, 'User') as name,
+                               coalesce(ru.surname, '') as surname, rt.comment, rt.rating
+                        from Ratings rt
+                        left join Users ru on rt.user_id = ru.user_id
+                        where rt.recipe_id = %s
+                        order by rt.date_posted desc
+                        limit 5
+                    ) rv) as reviews
+            from Recipes r
+            left join Users u on u.user_id = r.author_id
+            where r.recipe_id = %s {status_clause}
+        """
+        status_clause = "" if include_inactive else "and r.status = 'active'"
+        self.cursor.execute(query.format(status_clause=status_clause), (recipe_id, recipe_id, recipe_id, recipe_id))
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        # JSON_ARRAYAGG has no ORDER BY; restore the loader's ordering from the ids/dates.
+        ing_rows = sorted(_json_list(row[17]), key=lambda item: item[0])
+        tag_rows = sorted(_json_list(row[18]), key=lambda item: item[0])
+        review_rows = sorted(_json_list(row[19]), key=lambda item: (item[1] or "", item[0]), reverse=True)
+        return self._recipe_detail_dict(
+            row[:17],
+            [item[1] for item in ing_rows],
+            [item[1] for item in tag_rows],
+            [item[2:] for item in review_rows],
+        )
+
+    def _fetch_recipe_detail_queries(self, recipe_id: int, include_inactive: bool = False):
+        """Original four-query detail loader, kept as the fallback and benchmark baseline."""
         recipe_query = """
             select recipe_id, title, category, difficulty, rating, cover_img_path, prepare_time, calories,
                    protein, carbs, fats, sugar, fiber, procedure_description, status,
@@ -447,171 +1324,433 @@ class DBHandler():
             self.cursor.execute(review_query, (recipe_id,))
             review_rows = self.cursor.fetchall()
 
-            recipe = {
-                "id": recipe_row[0],
-                "title": recipe_row[1],
-                "category": recipe_row[2],
-                "difficulty": recipe_row[3],
-                "rating": recipe_row[4],
-                "cover_img_path": recipe_row[5],
-                "prepare_time": recipe_row[6],
-                "calories": recipe_row[7],
-                "protein": recipe_row[8],
-                "carbs": recipe_row[9],
-                "fats": recipe_row[10],
-                "sugar": recipe_row[11],
-                "fiber": recipe_row[12],
-                "procedure_description": recipe_row[13] or "",
-                "status": recipe_row[14],
-                "author_id": recipe_row[15],
-                "author_name": recipe_row[16] or "User",
-                "ingredients": [row[0] for row in ing_rows],
-                "tags": [row[0] for row in tag_rows],
-                "reviews": [
-                    {
-                        "author": (row[0] + (" " + row[1] if row[1] else "")).strip(),
-                        "content": row[2],
-                        "rating": row[3] or 0
-                    } for row in review_rows if row[2] or row[3] is not None
-                ],
-            }
-            recipe["rating_count"] = len(review_rows)
-            return recipe
+            return self._recipe_detail_dict(
+                recipe_row, [row[0] for row in ing_rows], [row[0] for row in tag_rows], review_rows
+            )
         except Error as err:
             print("Failed to fetch recipe detail:", err)
             return None
 
-    def fetch_recommended_recipes(self, recipe_id: int, limit: int = 5):
-        """Return similar recipes based on shared ingredients, tags, category, or author."""
-        query = """
-            with base as (
-                select recipe_id, category, author_id
-                from Recipes
-                where recipe_id = %s
-            )
-            select
-                r.recipe_id,
-                r.title,
-                r.cover_img_path,
-                r.rating,
-                r.prepare_time,
-                (
-                    (case when r.category = b.category and b.category is not null then 1 else 0 end) +
-                    (case when r.author_id = b.author_id then 1 else 0 end) +
-                    (
-                        select count(*) from Ingredients i
-                        where i.recipe_id = r.recipe_id
-                          and i.ingredient in (select ingredient from Ingredients where recipe_id = b.recipe_id)
-                    ) +
-                    (
-                        select count(*) from Tags t
-                        where t.recipe_id = r.recipe_id
-                          and t.tag_name in (select tag_name from Tags where recipe_id = b.recipe_id)
-                    )
-                ) as score
-            from Recipes r
-            join base b
-            where r.recipe_id <> b.recipe_id
-              and r.status = 'active'
-            having score > 0
-            order by score desc, r.date_posted desc
-            limit %s
+    def _recipe_detail_dict(self, recipe_row, ingredients, tags, review_rows):
+        """Shape a detail row plus its child lists; review rows are (name, surname, comment, rating)."""
+        recipe = {
+            "id": recipe_row[0],
+            "title": recipe_row[1],
+            "category": recipe_row[2],
+            "difficulty": recipe_row[3],
+            "rating": recipe_row[4],
+            "cover_img_path": recipe_row[5],
+            "prepare_time": recipe_row[6],
+            "calories": recipe_row[7],
+            "protein": recipe_row[8],
+            "carbs": recipe_row[9],
+            "fats": recipe_row[10],
+            "sugar": recipe_row[11],
+            "fiber": recipe_row[12],
+            "procedure_description": recipe_row[13] or "",
+            "status": recipe_row[14],
+            "author_id": recipe_row[15],
+            "author_name": recipe_row[16] or "User",
+            "ingredients": ingredients,
+            "tags": tags,
+            "reviews": [
+                {
+                    "author": (row[0] + (" " + row[1] if row[1] else "")).strip(),
+                    "content": row[2],
+                    "rating": row[3] or 0
+                } for row in review_rows if row[2] or row[3] is not None
+            ],
+        }
+        recipe["rating_count"] = len(review_rows)
+        return recipe
+
+    def fetch_recommended_recipes(self, recipe_id: int, limit: int = 5, viewer_id=None):
+        """Return similar recipes based on shared ingredients, tags, category, or author.
+
+        Reads the precomputed RecipeNeighbors list once migration 3 is applied;
+        otherwise scores every active recipe live.
         """
+        if self._recipe_neighbors_available():
+            query = """
+                select r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time
+                from RecipeNeighbors n
+                join Recipes r on r.recipe_id = n.neighbor_id
+                where n.recipe_id = %s and r.status = 'active'
+                order by n.neighbor_rank
+                limit %s
+            """
+        else:
+            query = """
+                with base as (
+                    select recipe_id, category, author_id
+                    from Recipes
+                    where recipe_id = %s
+                )
+                select
+                    r.recipe_id,
+                    r.title,
+                    r.cover_img_path,
+                    r.rating,
+                    r.prepare_time,
+                    (
+                        (case when r.category = b.category and b.category is not null then 1 else 0 end) +
+                        (case when r.author_id = b.author_id then 1 else 0 end) +
+                        (
+                            select count(*) from Ingredients i
+                            where i.recipe_id = r.recipe_id
+                              and i.ingredient in (select ingredient from Ingredients where recipe_id = b.recipe_id)
+                        ) +
+                        (
+                            select count(*) from Tags t
+                            where t.recipe_id = r.recipe_id
+                              and t.tag_name in (select tag_name from Tags where recipe_id = b.recipe_id)
+                        )
+                    ) as score
+                from Recipes r
+                join base b
+                where r.recipe_id <> b.recipe_id
+                  and r.status = 'active'
+                having score > 0
+                order by score desc, r.date_posted desc
+                limit %s
+            """
         try:
             self.cursor.execute(query, (recipe_id, limit))
             rows = self.cursor.fetchall()
-            return [
+            cards = [
                 {
                     "id": row[0],
                     "title": row[1],
                     "image": row[2],
                     "rating": row[3],
                     "prepare_time": row[4],
-                    "is_favorited": False,
                 }
                 for row in rows
             ]
+            return self._overlay_liked(cards, viewer_id)
         except Error as err:
             print("Failed to fetch recommended recipes:", err)
             return []
 
-    def recalc_user_rating(self, user_id: int, auto_commit: bool = True):
-        """Recalculate average rating for a user based on their recipes' ratings."""
+    def _fetch_neighbor_lists(self, recipe_ids):
+        """Return the stored {recipe_id: [(neighbor_id, score)]} lists, best first."""
+        if not recipe_ids:
+            return {}
+        self.cursor.execute(
+            f"""
+            select recipe_id, neighbor_id, score from RecipeNeighbors
+            where recipe_id in ({', '.join(['%s'] * len(recipe_ids))})
+            order by recipe_id, neighbor_rank
+            """,
+            tuple(recipe_ids),
+        )
+        lists = {}
+        for recipe_id, neighbor_id, score in self.cursor.fetchall():
+            lists.setdefault(recipe_id, []).append((neighbor_id, score))
+        return lists
+
+    def _store_neighbor_lists(self, lists):
+        """Replace the stored neighbor lists of the given recipes."""
+        if not lists:
+            return
+        ids = list(lists)
+        self.cursor.execute(
+            f"delete from RecipeNeighbors where recipe_id in ({', '.join(['%s'] * len(ids))})", tuple(ids)
+        )
+        rows = [
+            (recipe_id, rank, neighbor_id, score)
+            for recipe_id, neighbors in lists.items()
+            for rank, (neighbor_id, score) in enumerate(neighbors)
+        ]
+        if rows:
+            self.cursor.executemany(
+                "insert into RecipeNeighbors (recipe_id, neighbor_rank, neighbor_id, score) values (%s, %s, %s, %s)",
+                rows,
+            )
+        for recipe_id in ids:
+            self._invalidate_recipe_page(recipe_id)
+
+    def _common_features(self, refresh=False):
+        """Return (ingredients, tags) shared by more than MAX_POSTING recipes.
+
+        Cached for COMMON_FEATURES_TTL seconds so incremental neighbor refreshes
+        don't group the whole Ingredients and Tags tables on every edit.
+        """
+        cached = self._common_features
+        if cached is not None and not refresh and cached[0] > time.monotonic():
+            return cached[1], cached[2]
+        self.cursor.execute(
+            "select ingredient from Ingredients group by ingredient having count(*) > %s", (MAX_POSTING,)
+        )
+        ingredients = [row[0] for row in self.cursor.fetchall()]
+        self.cursor.execute("select tag_name from Tags group by tag_name having count(*) > %s", (MAX_POSTING,))
+        tags = [row[0] for row in self.cursor.fetchall()]
+        self._common_features = (time.monotonic() + self._common_features_ttl, ingredients, tags)
+        return ingredients, tags
+
+    def _neighbor_candidates(self, recipe_id: int):
+        """Return documents of active recipes sharing a selective ingredient, tag or the author."""
+        common_ingredients, common_tags = self._common_features()
+        ingredient_filter = (
+            f"and i1.ingredient not in ({', '.join(['%s'] * len(common_ingredients))})" if common_ingredients else ""
+        )
+        tag_filter = f"and t1.tag_name not in ({', '.join(['%s'] * len(common_tags))})" if common_tags else ""
+        self.cursor.execute(
+            f"""
+            select i2.recipe_id
+            from Ingredients i1
+            join Ingredients i2 on i2.ingredient = i1.ingredient
+            where i1.recipe_id = %s {ingredient_filter}
+            union
+            select t2.recipe_id
+            from Tags t1
+            join Tags t2 on t2.tag_name = t1.tag_name
+            where t1.recipe_id = %s {tag_filter}
+            union
+            (select r2.recipe_id
+             from Recipes r1
+             join Recipes r2 on r2.author_id = r1.author_id
+             where r1.recipe_id = %s
+             order by r2.recipe_id desc
+             limit %s)
+            """,
+            (recipe_id, *common_ingredients, recipe_id, *common_tags, recipe_id, MAX_POSTING),
+        )
+        ids = [row[0] for row in self.cursor.fetchall() if row[0] != recipe_id]
+        return self.fetch_search_documents(recipe_ids=ids)
+
+    def rebuild_recipe_neighbors(self):
+        """Recompute the top-K similar recipes of every active recipe into RecipeNeighbors."""
+        docs = self.fetch_search_documents()
+        if docs is None:
+            return False
+        lists = build_all(docs, self.recommend_k)
         try:
-            self.cursor.execute(
-                """
-                select avg(rt.rating)
-                from Ratings rt
-                join Recipes r on rt.recipe_id = r.recipe_id
-                where r.author_id = %s
-                """,
-                (user_id,),
+            self._common_features(refresh=True)
+            with self.transaction() as tx:
+                self.cursor.execute("delete from RecipeNeighbors")
+                self._store_neighbor_lists(lists)
+            return tx.ok
+        except Error as err:
+            print("Failed to rebuild recipe neighbors:", err)
+            self._rollback()
+            return False
+
+    def refresh_recipe_neighbors(self, recipe_ids):
+        """Incrementally update neighbor lists after recipes were activated, deactivated or deleted.
+
+        An active recipe gets its own list and is merged into its candidates' lists;
+        a recipe that is gone loses its list and every list naming it is recomputed.
+        """
+        try:
+            with self.transaction() as tx:
+                for recipe_id in recipe_ids:
+                    docs = self.fetch_search_documents(recipe_ids=[recipe_id])
+                    if docs is None:
+                        tx.rollback_only()
+                        break
+                    if docs:
+                        updates = self._neighbors_after_add(docs[0])
+                    else:
+                        updates = self._neighbors_after_remove(recipe_id)
+                    if updates is None:
+                        tx.rollback_only()
+                        break
+                    self._store_neighbor_lists(updates)
+            return tx.ok
+        except Error as err:
+            print("Failed to refresh recipe neighbors:", err)
+            self._rollback()
+            return False
+
+    def _neighbors_after_add(self, doc):
+        candidates = self._neighbor_candidates(doc["id"])
+        if candidates is None:
+            return None
+        updates = {doc["id"]: top_neighbors(doc, candidates, self.recommend_k)}
+        current = self._fetch_neighbor_lists([candidate["id"] for candidate in candidates])
+        vector = features(doc)
+        for candidate in candidates:
+            merged = merge_neighbor(
+                current.get(candidate["id"], []),
+                doc["id"],
+                similarity(vector, features(candidate)),
+                self.recommend_k,
             )
-            row = self.cursor.fetchone()
-            avg_rating = float(row[0]) if row and row[0] is not None else None
+            if merged is not None:
+                updates[candidate["id"]] = merged
+        return updates
+
+    def _neighbors_after_remove(self, recipe_id: int):
+        self.cursor.execute("select distinct recipe_id from RecipeNeighbors where neighbor_id = %s", (recipe_id,))
+        affected = [row[0] for row in self.cursor.fetchall()]
+        updates = {recipe_id: []}
+        docs = self.fetch_search_documents(recipe_ids=affected) if affected else []
+        if docs is None:
+            return None
+        active = {doc["id"]: doc for doc in docs}
+        for other_id in affected:
+            doc = active.get(other_id)
+            if doc is None:
+                updates[other_id] = []
+                continue
+            candidates = self._neighbor_candidates(other_id)
+            if candidates is None:
+                return None
+            updates[other_id] = top_neighbors(doc, candidates, self.recommend_k)
+        return updates
 
-            if self._user_rating_column_available():
-                self.cursor.execute("update Users set rating = %s where user_id = %s", (avg_rating, user_id))
+    def recalc_user_rating(self, user_id: int):
+        """Recalculate average rating for a user based on their recipes' ratings."""
+        try:
+            with self.transaction():
+                self.cursor.execute(
+                    """
+                    select avg(rt.rating)
+                    from Ratings rt
+                    join Recipes r on rt.recipe_id = r.recipe_id
+                    where r.author_id = %s
+                    """,
+                    (user_id,),
+                )
+                row = self.cursor.fetchone()
+                avg_rating = float(row[0]) if row and row[0] is not None else None
 
-            if auto_commit:
-                self.cnx.commit()
+                if self._user_rating_column_available():
+                    self.cursor.execute("update Users set rating = %s where user_id = %s", (avg_rating, user_id))
             return avg_rating
         except Error as err:
             print("Failed to recalc user rating:", err)
-            if auto_commit:
-                self.cnx.rollback()
             raise
 
-    def recalc_recipe_rating(self, recipe_id: int, auto_commit: bool = True):
+    def recalc_recipe_rating(self, recipe_id: int):
         """Recalculate recipe.rating from all posted ratings and update the author rating."""
         try:
-            self.cursor.execute("select avg(rating) from Ratings where recipe_id = %s", (recipe_id,))
-            row = self.cursor.fetchone()
-            avg_rating = float(row[0]) if row and row[0] is not None else None
-
-            self.cursor.execute("update Recipes set rating = %s where recipe_id = %s", (avg_rating, recipe_id))
-
-            author_id = self._fetch_recipe_author(recipe_id)
-            if author_id:
-                # Update the author's profile rating whenever a recipe rating changes.
-                self.recalc_user_rating(author_id, auto_commit=False)
-
-            if auto_commit:
-                self.cnx.commit()
+            with self.transaction():
+                self.cursor.execute("select avg(rating) from Ratings where recipe_id = %s", (recipe_id,))
+                row = self.cursor.fetchone()
+                avg_rating = float(row[0]) if row and row[0] is not None else None
+
+                self.cursor.execute("update Recipes set rating = %s where recipe_id = %s", (avg_rating, recipe_id))
+                self._after_commit(lambda: self._autocomplete_rating_changed(recipe_id, avg_rating))
+                self._invalidate_recipe_page(recipe_id)
+                self._invalidate_home()
+                self._invalidate_feed()
+
+                author_id = self._fetch_recipe_author(recipe_id)
+                if author_id:
+                    # Update the author's profile rating whenever a recipe rating changes.
+                    self.recalc_user_rating(author_id)
             return avg_rating
         except Error as err:
             print("Failed to recalc recipe rating:", err)
-            if auto_commit:
-                self.cnx.rollback()
             raise
 
+    def _apply_rating_delta(self, recipe_id: int, author_id, delta_sum: int, delta_count: int):
+        """Adjust recipe and author rating counters in place and refresh their averages.
+
+        MySQL applies single-table UPDATE assignments left to right, so the average
+        is computed from the already-updated sum and count of the same row.
+        """
+        self.cursor.execute(
+            """
+            update Recipes
+            set rating_sum = rating_sum + %s,
+                rating_count = rating_count + %s,
+                rating = if(rating_count > 0, rating_sum / rating_count, null)
+            where recipe_id = %s
+            """,
+            (delta_sum, delta_count, recipe_id),
+        )
+        if author_id:
+            user_rating_sql = ", rating = if(rating_count > 0, rating_sum / rating_count, null)" if self._user_rating_column_available() else ""
+            self.cursor.execute(
+                f"update Users set rating_sum = rating_sum + %s, rating_count = rating_count + %s{user_rating_sql} where user_id = %s",
+                (delta_sum, delta_count, author_id),
+            )
+        self.cursor.execute("select rating from Recipes where recipe_id = %s", (recipe_id,))
+        row = self.cursor.fetchone()
+        avg_rating = float(row[0]) if row and row[0] is not None else None
+        self._after_commit(lambda: self._autocomplete_rating_changed(recipe_id, avg_rating))
+        self._invalidate_recipe_page(recipe_id)
+        self._invalidate_home()
+        self._invalidate_feed()
+
+    def rebuild_rating_aggregates(self):
+        """Recompute every rating counter and average from Ratings (drift repair)."""
+        statements = [
+            """
+            update Recipes r
+            left join (select recipe_id, sum(rating) as total, count(rating) as cnt from Ratings group by recipe_id) agg
+                on agg.recipe_id = r.recipe_id
+            set r.rating_sum = coalesce(agg.total, 0),
+                r.rating_count = coalesce(agg.cnt, 0)
+            """,
+            "update Recipes set rating = if(rating_count > 0, rating_sum / rating_count, null)",
+            """
+            update Users u
+            left join (
+                select r.author_id, sum(rt.rating) as total, count(rt.rating) as cnt
+                from Ratings rt
+                join Recipes r on rt.recipe_id = r.recipe_id
+                group by r.author_id
+            ) agg on agg.author_id = u.user_id
+            set u.rating_sum = coalesce(agg.total, 0),
+                u.rating_count = coalesce(agg.cnt, 0)
+            """,
+        ]
+        if self._user_rating_column_available():
+            statements.append("update Users set rating = if(rating_count > 0, rating_sum / rating_count, null)")
+        try:
+            with self.transaction() as tx:
+                for statement in statements:
+                    self.cursor.execute(statement)
+                self._after_commit(self.home_cache.clear)
+                self._after_commit(self.feed_cache.clear)
+                self._after_commit(self.recipe_page_cache.clear)
+                self._after_commit(lambda: self._search_index_changed(rebuild=True))
+            return tx.ok
+        except Error as err:
+            print("Failed to rebuild rating aggregates:", err)
+            self._rollback()
+            return False
+
     def add_rating(self, recipe_id: int, user_id: int, rating: int, comment: str = ""):
         """Insert a new rating, then refresh recipe and author aggregates and notify author."""
         try:
             recipe_brief = self.fetch_recipe_brief(recipe_id)
-            self.cursor.execute(
-                "insert into Ratings (recipe_id, user_id, rating, comment) values (%s, %s, %s, %s)",
-                (recipe_id, user_id, rating, comment),
-            )
-            self.recalc_recipe_rating(recipe_id, auto_commit=False)
-            self.cnx.commit()
-            author_id = recipe_brief.get("author_id") if recipe_brief else None
-            if author_id and author_id != user_id:
-                self.add_notification(
-                    author_id,
-                    "rating",
-                    actor_id=user_id,
-                    recipe_id=recipe_id,
-                    message=comment or None
+            with self.transaction() as tx:
+                self.cursor.execute(
+                    "insert into Ratings (recipe_id, user_id, rating, comment) values (%s, %s, %s, %s)",
+                    (recipe_id, user_id, rating, comment),
                 )
-            return True
+                author_id = recipe_brief.get("author_id") if recipe_brief else None
+                if self._rating_counters_available():
+                    self._apply_rating_delta(recipe_id, author_id, rating, 1)
+                else:
+                    self._schedule_rating_recalc(recipe_id)
+                self._bump_user_stats(active_recipe_id=recipe_id, reviews=1, rating_sum=rating, rating_count=1)
+                self._after_commit(lambda: self.count_cache.delete(("ratings",)))
+                self._invalidate_recipe_page(recipe_id)
+                if author_id and author_id != user_id:
+                    self._queue_notification(
+                        author_id,
+                        "rating",
+                        actor_id=user_id,
+                        recipe_id=recipe_id,
+                        message=comment or None
+                    )
+            return tx.ok
         except Error as err:
             print("Failed to add rating:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
-    def fetch_ratings_admin(self, limit=10, offset=0):
-        """Fetch ratings/comments with user and recipe info for admin view."""
+    def fetch_ratings_admin(self, limit=10, offset=0, after=None, before=None):
+        """Fetch ratings/comments with user and recipe info for admin view.
+
+        after/before are (date_posted, rate_id) sort keys for seek pagination.
+        """
         query = """
             select rat.rate_id,
                    rat.rating,
@@ -622,12 +1761,24 @@ class DBHandler():
             from Ratings rat
             join Users u on rat.user_id = u.user_id
             join Recipes rec on rat.recipe_id = rec.recipe_id
-            order by rat.date_posted desc
-            limit %s offset %s
+            {seek}
+            order by rat.date_posted {direction}, rat.rate_id {direction}
+            limit %s {offset}
         """
+        seek = after or before
+        params = []
+        if seek:
+            clause, params = seek_clause(("rat.date_posted", "rat.rate_id"), seek, "after" if after else "before")
+            query = query.format(seek="where " + clause, direction="desc" if after else "asc", offset="")
+            params.append(limit)
+        else:
+            query = query.format(seek="", direction="desc", offset="offset %s")
+            params.extend([limit, offset])
         try:
-            self.cursor.execute(query, (limit, offset))
+            self.cursor.execute(query, tuple(params))
             rows = self.cursor.fetchall()
+            if before and not after:
+                rows.reverse()
             return [
                 {
                     "id": row[0],
@@ -636,6 +1787,7 @@ class DBHandler():
                     "date_posted": row[3],
                     "user_name": row[4],
                     "recipe_title": row[5],
+                    "sort_key": (row[3], row[0]),
                 }
                 for row in rows
             ]
@@ -644,47 +1796,145 @@ class DBHandler():
             return []
 
     def fetch_ratings_count(self):
-        """Return total ratings count."""
-        try:
-            self.cursor.execute("select count(*) from Ratings")
-            row = self.cursor.fetchone()
-            return row[0] if row else 0
-        except Error as err:
-            print("Failed to count ratings:", err)
-            return 0
+        """Return total ratings count (cached until a rating is added or deleted)."""
+        def compute():
+            try:
+                self.cursor.execute("select count(*) from Ratings")
+                row = self.cursor.fetchone()
+                return row[0] if row else 0
+            except Error as err:
+                print("Failed to count ratings:", err)
+                return None
+        return self._cached_count(("ratings",), compute)
 
     def delete_rating(self, rate_id: int):
         """Delete a rating/comment by id."""
         try:
-            recipe_id = None
-            self.cursor.execute("select recipe_id from Ratings where rate_id = %s", (rate_id,))
-            row = self.cursor.fetchone()
-            if row:
-                recipe_id = row[0]
-
-            self.cursor.execute("delete from Ratings where rate_id = %s", (rate_id,))
-
-            if recipe_id:
-                self.recalc_recipe_rating(recipe_id, auto_commit=False)
-
-            self.cnx.commit()
-            return True
+            with self.transaction() as tx:
+                recipe_id = None
+                self.cursor.execute(
+                    """
+                    select rt.recipe_id, rt.rating, r.author_id
+                    from Ratings rt
+                    left join Recipes r on r.recipe_id = rt.recipe_id
+                    where rt.rate_id = %s
+                    for update
+                    """,
+                    (rate_id,),
+                )
+                row = self.cursor.fetchone()
+                if row:
+                    recipe_id = row[0]
+
+                self.cursor.execute("delete from Ratings where rate_id = %s", (rate_id,))
+                # Only the request that actually removed the row adjusts the counters.
+                deleted = self.cursor.rowcount == 1
+                self._after_commit(lambda: self.count_cache.delete(("ratings",)))
+                self._invalidate_recipe_page(recipe_id)
+
+                if recipe_id and deleted:
+                    rated = row[1] is not None
+                    self._bump_user_stats(
+                        active_recipe_id=recipe_id,
+                        reviews=-1,
+                        rating_sum=-(row[1] or 0),
+                        rating_count=-1 if rated else 0,
+                    )
+                if recipe_id and self._rating_counters_available():
+                    if deleted and row[1] is not None:
+                        self._apply_rating_delta(recipe_id, row[2], -row[1], -1)
+                elif recipe_id:
+                    self._schedule_rating_recalc(recipe_id)
+            return tx.ok
         except Error as err:
             print("Failed to delete rating:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
-    def fetch_feed_recipes(self, category=None, difficulty=None, max_time=None, limit=12, offset=0, user_id=None):
-        """Fetch recipes for the feed with optional filters."""
+    def fetch_feed_recipes(self, category=None, difficulty=None, max_time=None, limit=12, offset=0, user_id=None,
+                           after=None, before=None):
+        """Fetch recipes for the feed with optional filters.
+
+        after/before are (date_posted, recipe_id) sort keys of a neighbouring page;
+        when given, the page is found by an index seek instead of the offset.
+        The viewer-independent page is cached per filter/page key; the viewer's
+        likes are overlaid with one batched lookup on the returned ids.
+        """
+        key = (category, difficulty, max_time, limit, offset, after, before)
+        rows = self.feed_cache.get(key)
+        if rows is None:
+            rows = self._fetch_feed_page(category, difficulty, max_time, limit, offset, after, before)
+            if rows is None:
+                return []
+            self.feed_cache.set(key, rows)
+        return self._overlay_liked([dict(row) for row in rows], user_id)
+
+    # Users with more likes than this are not kept in the liked-set cache.
+    LIKED_SET_LIMIT = 5000
+
+    def fetch_liked_recipe_ids(self, user_id: int, recipe_ids):
+        """Return the subset of recipe_ids the user has liked.
+
+        Answered from the per-user liked-set cache when enabled, otherwise with one
+        primary-key IN query over just the given ids.
+        """
+        if not user_id or not recipe_ids:
+            return set()
+        liked = self._liked_set(user_id)
+        if liked is not None:
+            return liked.intersection(recipe_ids)
+        query = f"select recipe_id from Likes where user_id = %s and recipe_id in ({', '.join(['%s'] * len(recipe_ids))})"
+        try:
+            self.cursor.execute(query, (user_id, *recipe_ids))
+            return {row[0] for row in self.cursor.fetchall()}
+        except Error as err:
+            print("Failed to fetch liked recipes:", err)
+            return set()
+
+    def _liked_set(self, user_id: int):
+        """Return the user's cached frozenset of liked recipe ids, loading it on a miss.
+
+        Returns None when the cache is disabled or the user has too many likes to cache.
+        """
+        if self.liked_cache is None:
+            return None
+        liked = self.liked_cache.get(user_id)
+        if liked is None:
+            try:
+                self.cursor.execute(
+                    "select recipe_id from Likes where user_id = %s limit %s", (user_id, self.LIKED_SET_LIMIT + 1)
+                )
+                rows = self.cursor.fetchall()
+            except Error as err:
+                print("Failed to load liked set:", err)
+                return None
+            # False marks "too many to cache" so the load query isn't repeated.
+            liked = frozenset(row[0] for row in rows) if len(rows) <= self.LIKED_SET_LIMIT else False
+            self.liked_cache.set(user_id, liked)
+        return None if liked is False else liked
+
+    def _forget_liked_set(self, user_id: int):
+        """Drop the user's cached liked set after a committed like/unlike.
+
+        Dropping instead of patching the set avoids a read-modify-write race
+        between concurrent toggles; the next read reloads it.
+        """
+        if self.liked_cache is not None:
+            self.liked_cache.delete(user_id)
+
+    def _overlay_liked(self, cards, viewer_id):
+        """Set is_favorited on each card from one batched liked lookup."""
+        liked = self.fetch_liked_recipe_ids(viewer_id, [card["id"] for card in cards]) if viewer_id else set()
+        for card in cards:
+            card["is_favorited"] = card["id"] in liked
+        return cards
+
+    def _fetch_feed_page(self, category, difficulty, max_time, limit, offset, after, before):
+        """Run the viewer-independent feed query; returns None on error so failures aren't cached."""
         base = [
-            "select r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time"
+            "select r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time, r.date_posted"
         ]
         params = []
-        if user_id:
-            base.append(
-                ", exists(select 1 from Likes l where l.recipe_id = r.recipe_id and l.user_id = %s) as is_liked"
-            )
-            params.append(user_id)
         base.append(
             "from Recipes r where 1=1"
         )
@@ -698,13 +1948,23 @@ class DBHandler():
             base.append("and prepare_time <= %s")
             params.append(max_time)
         base.append("and status = 'active'")
-        base.append("order by date_posted desc limit %s offset %s")
-        params.extend([limit, offset])
+        seek = after or before
+        if seek:
+            clause, seek_params = seek_clause(("r.date_posted", "r.recipe_id"), seek, "after" if after else "before")
+            base.append("and " + clause)
+            params.extend(seek_params)
+            base.append(f"order by r.date_posted {'desc' if after else 'asc'}, r.recipe_id {'desc' if after else 'asc'} limit %s")
+            params.append(limit)
+        else:
+            base.append("order by r.date_posted desc, r.recipe_id desc limit %s offset %s")
+            params.extend([limit, offset])
 
         query = " ".join(base)
         try:
             self.cursor.execute(query, tuple(params))
             rows = self.cursor.fetchall()
+            if before and not after:
+                rows.reverse()
             return [
                 {
                     "id": row[0],
@@ -712,12 +1972,13 @@ class DBHandler():
                     "image": row[2],
                     "rating": row[3],
                     "prepare_time": row[4],
-                    "is_favorited": bool(row[5]) if user_id else False
+                    "date_posted": row[5],
+                    "sort_key": (row[5], row[0]),
                 } for row in rows
             ]
         except Error as err:
             print("Failed to fetch feed recipes:", err)
-            return []
+            return None
 
     def fetch_feed_filters(self):
         """Return distinct categories and difficulties for filters."""
@@ -737,7 +1998,13 @@ class DBHandler():
         return {"categories": categories, "difficulties": difficulties}
 
     def fetch_feed_count(self, category=None, difficulty=None, max_time=None):
-        """Count recipes matching filters."""
+        """Count recipes matching filters (cached per filter combination)."""
+        return self._cached_count(
+            ("feed", category, difficulty, max_time),
+            lambda: self._count_feed_recipes(category, difficulty, max_time),
+        )
+
+    def _count_feed_recipes(self, category, difficulty, max_time):
         base = ["select count(*) from Recipes where status = 'active'"]
         params = []
         if category:
@@ -756,7 +2023,7 @@ class DBHandler():
             return row[0] if row else 0
         except Error as err:
             print("Failed to count feed recipes:", err)
-            return 0
+            return None
 
     def fetch_user_basic(self, user_id: int):
         """Return basic user profile info."""
@@ -836,16 +2103,37 @@ class DBHandler():
         query = f"update Users set {', '.join(updates)} where user_id = %s"
         try:
             self.cursor.execute(query, tuple(params))
-            self.cnx.commit()
+            self._commit()
+            if name is not None or surname is not None:
+                # Author names are searchable, so re-index this user's recipes.
+                self._after_commit(lambda: self._search_index_changed(author_id=user_id))
+                # Names also appear as recipe author and reviewer on cached detail pages.
+                self._after_commit(self.recipe_page_cache.clear)
+                # Search totals by author name change too.
+                self._invalidate_counts()
             return True
         except Error as err:
             print("Failed to update user profile:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def fetch_user_stats(self, user_id: int):
-        """Return basic stats for user profile."""
+        """Return basic stats for user profile (one UserStats row once migration 2 is applied)."""
         stats = {"likes": 0, "followers": 0, "reviews": 0, "posted": 0, "rating_avg": 0, "rating_count": 0}
+        if self._user_stats_available():
+            try:
+                self.cursor.execute(
+                    "select likes, followers, reviews, posted, rating_sum, rating_count from UserStats where user_id = %s",
+                    (user_id,)
+                )
+                row = self.cursor.fetchone()
+                if row:
+                    stats.update({"likes": row[0], "followers": row[1], "reviews": row[2], "posted": row[3]})
+                    stats["rating_count"] = row[5]
+                    stats["rating_avg"] = float(row[4]) / row[5] if row[5] else 0
+            except Error as err:
+                print("Failed to fetch user stats:", err)
+            return stats
         try:
             self.cursor.execute(
                 """
@@ -890,14 +2178,32 @@ class DBHandler():
             print("Failed to fetch user stats:", err)
         return stats
 
-    def search_recipes(self, query: str, limit: int = 12, offset: int = 0, user_id=None):
-        """Search recipes by title, ingredient, or category for active recipes."""
+    def search_recipes(self, query: str, limit: int = 12, offset: int = 0, user_id=None, after=None, before=None):
+        """Search recipes by title, ingredient, tag, category, or author for active recipes.
+
+        Served from the in-memory search index (ranked by relevance); falls back to a
+        LIKE query over the joined tables when the index has not been built.
+        Each card carries a sort_key usable as after/before for the next request:
+        (score, timestamp, recipe_id) from the index, (date_posted, recipe_id) from SQL.
+        A key of the wrong shape (index built between requests) restarts at offset.
+        """
         if not query or not query.strip():
             return []
+        if self.search_index.ready:
+            after = after if after and len(after) == 3 else None
+            before = before if before and len(before) == 3 else None
+            hits = self.search_index.page(query, limit=limit, offset=offset, after=after, before=before)
+            cards = self._fetch_recipe_cards([hit[2] for hit in hits], viewer_id=user_id)
+            keys = {hit[2]: hit for hit in hits}
+            for card in cards:
+                card["sort_key"] = keys[card["id"]]
+            return cards
+        after = after if after and len(after) == 2 else None
+        before = before if before and len(before) == 2 else None
+        seek = after or before
         like_pattern = f"%{query.strip()}%"
         sql = """
-            select r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time
-                   {liked_select}
+            select r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time, r.date_posted
             from Recipes r
             left join Ingredients i on i.recipe_id = r.recipe_id
             left join Tags t on t.recipe_id = r.recipe_id
@@ -910,30 +2216,37 @@ class DBHandler():
                   or t.tag_name like %s
                   or concat_ws(' ', u.name, u.surname) like %s
               )
-            group by r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time
-            order by r.date_posted desc
-            limit %s offset %s
+              {seek}
+            group by r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time, r.date_posted
+            order by r.date_posted {direction}, r.recipe_id {direction}
+            limit %s {offset}
         """
         try:
-            liked_sql = ", exists(select 1 from Likes l where l.recipe_id = r.recipe_id and l.user_id = %s) as is_liked" if user_id else ""
-            final_sql = sql.format(liked_select=liked_sql)
-            params = []
-            if user_id:
-                params.append(user_id)
-            params.extend([like_pattern, like_pattern, like_pattern, like_pattern, like_pattern, limit, offset])
+            params = [like_pattern, like_pattern, like_pattern, like_pattern, like_pattern]
+            if seek:
+                clause, seek_params = seek_clause(("r.date_posted", "r.recipe_id"), seek, "after" if after else "before")
+                final_sql = sql.format(seek="and " + clause, direction="desc" if after else "asc", offset="")
+                params.extend(seek_params + [limit])
+            else:
+                final_sql = sql.format(seek="", direction="desc", offset="offset %s")
+                params.extend([limit, offset])
             self.cursor.execute(final_sql, tuple(params))
             rows = self.cursor.fetchall()
-            return [
+            if before and not after:
+                rows.reverse()
+            cards = [
                 {
                     "id": row[0],
                     "title": row[1],
                     "image": row[2],
                     "rating": row[3],
                     "prepare_time": row[4],
-                    "is_favorited": bool(row[5]) if user_id else False,
+                    "date_posted": row[5],
+                    "sort_key": (row[5], row[0]),
                 }
                 for row in rows
             ]
+            return self._overlay_liked(cards, user_id)
         except Error as err:
             print("Failed to search recipes:", err)
             return []
@@ -942,6 +2255,11 @@ class DBHandler():
         """Return total count of recipes that match the search query."""
         if not query or not query.strip():
             return 0
+        if self.search_index.ready:
+            return self.search_index.count(query)
+        return self._cached_count(("search", query.strip().lower()), lambda: self._count_search_like(query))
+
+    def _count_search_like(self, query: str):
         like_pattern = f"%{query.strip()}%"
         sql = """
             select count(distinct r.recipe_id)
@@ -964,36 +2282,29 @@ class DBHandler():
             return row[0] if row else 0
         except Error as err:
             print("Failed to count search recipes:", err)
-            return 0
+            return None
 
     def fetch_user_recipes(self, user_id: int, limit=8, viewer_id=None):
         query = """
             select r.recipe_id, r.title, r.cover_img_path, r.rating, r.prepare_time
-            {liked_select}
             from Recipes r
             where r.author_id = %s and r.status = 'active'
             order by date_posted desc
             limit %s
         """
         try:
-            liked_sql = ", exists(select 1 from Likes l where l.recipe_id = r.recipe_id and l.user_id = %s) as is_liked" if viewer_id else ""
-            final_sql = query.format(liked_select=liked_sql)
-            params = []
-            if viewer_id:
-                params.append(viewer_id)
-            params.extend([user_id, limit])
-            self.cursor.execute(final_sql, tuple(params))
+            self.cursor.execute(query, (user_id, limit))
             rows = self.cursor.fetchall()
-            return [
+            cards = [
                 {
                     "id": row[0],
                     "title": row[1],
                     "image": row[2],
                     "rating": row[3],
                     "prepare_time": row[4],
-                    "is_favorited": bool(row[5]) if viewer_id else False,
                 } for row in rows
             ]
+            return self._overlay_liked(cards, viewer_id)
         except Error as err:
             print("Failed to fetch user recipes:", err)
             return []
@@ -1025,36 +2336,58 @@ class DBHandler():
             return []
 
     def has_user_liked_recipe(self, user_id: int, recipe_id: int):
-        query = "select 1 from Likes where user_id = %s and recipe_id = %s limit 1"
-        try:
-            self.cursor.execute(query, (user_id, recipe_id))
-            return self.cursor.fetchone() is not None
-        except Error as err:
-            print("Failed to check like:", err)
-            return False
+        return recipe_id in self.fetch_liked_recipe_ids(user_id, [recipe_id])
 
     def add_recipe_like(self, user_id: int, recipe_id: int):
         query = "insert ignore into Likes (recipe_id, user_id) values (%s, %s)"
         try:
             self.cursor.execute(query, (recipe_id, user_id))
-            self.cnx.commit()
+            if self.cursor.rowcount > 0:
+                self._bump_user_stats(active_recipe_id=recipe_id, likes=1)
+            self._commit()
+            self._after_commit(lambda: self._forget_liked_set(user_id))
             return True
         except Error as err:
             print("Failed to like recipe:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def remove_recipe_like(self, user_id: int, recipe_id: int):
         query = "delete from Likes where recipe_id = %s and user_id = %s"
         try:
             self.cursor.execute(query, (recipe_id, user_id))
-            self.cnx.commit()
+            if self.cursor.rowcount > 0:
+                self._bump_user_stats(active_recipe_id=recipe_id, likes=-1)
+            self._commit()
+            self._after_commit(lambda: self._forget_liked_set(user_id))
             return True
         except Error as err:
             print("Failed to unlike recipe:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
+    def toggle_recipe_like(self, user_id: int, recipe_id: int):
+        """Like or unlike a recipe depending on the stored state; returns the new state or None.
+
+        The decision comes from the Likes row itself, not from a cached set that may be stale.
+        """
+        try:
+            self.cursor.execute("delete from Likes where recipe_id = %s and user_id = %s", (recipe_id, user_id))
+            liked = self.cursor.rowcount == 0
+            if liked:
+                self.cursor.execute("insert ignore into Likes (recipe_id, user_id) values (%s, %s)", (recipe_id, user_id))
+                if self.cursor.rowcount > 0:
+                    self._bump_user_stats(active_recipe_id=recipe_id, likes=1)
+            else:
+                self._bump_user_stats(active_recipe_id=recipe_id, likes=-1)
+            self._commit()
+            self._after_commit(lambda: self._forget_liked_set(user_id))
+            return liked
+        except Error as err:
+            print("Failed to toggle recipe like:", err)
+            self._rollback()
+            return None
+
     def is_following_user(self, target_user_id: int, follower_id: int):
         query = "select 1 from Followers where user_id = %s and follower_id = %s limit 1"
         try:
@@ -1069,19 +2402,20 @@ class DBHandler():
             return False
         query = "insert ignore into Followers (user_id, follower_id) values (%s, %s)"
         try:
-            self.cursor.execute(query, (target_user_id, follower_id))
-            self.cnx.commit()
-            if self.cursor.rowcount > 0:
-                self.add_notification(
-                    target_user_id,
-                    "follow",
-                    actor_id=follower_id,
-                    message=None
-                )
-            return True
+            with self.transaction() as tx:
+                self.cursor.execute(query, (target_user_id, follower_id))
+                if self.cursor.rowcount > 0:
+                    self._bump_user_stats(user_id=target_user_id, followers=1)
+                    self._queue_notification(
+                        target_user_id,
+                        "follow",
+                        actor_id=follower_id,
+                        message=None
+                    )
+            return tx.ok
         except Error as err:
             print("Follow failed:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
 
     def unfollow_user(self, target_user_id: int, follower_id: int):
@@ -1090,9 +2424,11 @@ class DBHandler():
         query = "delete from Followers where user_id = %s and follower_id = %s"
         try:
             self.cursor.execute(query, (target_user_id, follower_id))
-            self.cnx.commit()
+            if self.cursor.rowcount > 0:
+                self._bump_user_stats(user_id=target_user_id, followers=-1)
+            self._commit()
             return True
         except Error as err:
             print("Unfollow failed:", err)
-            self.cnx.rollback()
+            self._rollback()
             return False
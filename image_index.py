@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+
+class ImageIndex():
+    """In-memory set of files under the static image folders.
+
+    Lets the views decide image fallbacks with a set lookup instead of an
+    os.path.exists call per card. The index is filled at startup, updated by the
+    upload views, and refreshed by an mtime scan of the indexed directories at
+    most once every refresh_interval seconds. That picks up files added or
+    removed outside the app. Paths outside the indexed folders still use stat.
+    on_lookup(stat), if given, is called for every exists() check; stat tells
+    whether it had to hit the filesystem.
+    """
+    def __init__(self, root_path, directories=("static/img",), refresh_interval=30, on_lookup=None):
+        self.root_path = root_path
+        self.directories = tuple(d.strip("/") for d in directories)
+        self.refresh_interval = refresh_interval
+        self._files = set()
+        self._dir_mtimes = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self.stat_fallbacks = 0
+        self.on_lookup = on_lookup
+
+    def scan(self):
+        """Rebuild the index from disk."""
+        files = set()
+        dir_mtimes = {}
+        for directory in self.directories:
+            self._scan_dir(directory, files, dir_mtimes)
+        with self._lock:
+            self._files = files
+            self._dir_mtimes = dir_mtimes
+            self._last_refresh = time.monotonic()
+
+    def exists(self, path):
+        """Return True if the static path (e.g. /static/img/recipes/x.jpg) exists on disk."""
+        rel = str(path).lstrip("/")
+        indexed = self._is_indexed(rel)
+        if self.on_lookup:
+            self.on_lookup(not indexed)
+        if not indexed:
+            self.stat_fallbacks += 1
+            return os.path.exists(os.path.join(self.root_path, rel))
+        self._maybe_refresh()
+        return rel in self._files
+
+    def add(self, path):
+        """Record a file written by the app (e.g. an upload)."""
+        with self._lock:
+            self._files.add(str(path).lstrip("/"))
+
+    def discard(self, path):
+        """Forget a file removed by the app."""
+        with self._lock:
+            self._files.discard(str(path).lstrip("/"))
+
+    def __len__(self):
+        return len(self._files)
+
+    def _is_indexed(self, rel):
+        return any(rel.startswith(directory + "/") for directory in self.directories)
+
+    def _scan_dir(self, directory, files, dir_mtimes):
+        base = os.path.join(self.root_path, directory)
+        for current, _, filenames in os.walk(base):
+            rel_dir = os.path.relpath(current, self.root_path).replace(os.sep, "/")
+            try:
+                dir_mtimes[rel_dir] = os.stat(current).st_mtime
+            except OSError:
+                continue
+            for filename in filenames:
+                files.add(f"{rel_dir}/{filename}")
+
+    def _maybe_refresh(self):
+        """Rescan directories whose mtime changed since the last scan."""
+        if time.monotonic() - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._last_refresh < self.refresh_interval:
+                return
+            self._last_refresh = time.monotonic()
+            dir_mtimes = dict(self._dir_mtimes)
+        changed = False
+        for rel_dir, mtime in dir_mtimes.items():
+            try:
+                current = os.stat(os.path.join(self.root_path, rel_dir)).st_mtime
+            except OSError:
+                current = None
+            if current != mtime:
+                changed = True
+                break
+        if not changed:
+            for directory in self.directories:
+                # Catch newly created top-level folders (e.g. static/img/profile).
+                if directory not in dir_mtimes and os.path.isdir(os.path.join(self.root_path, directory)):
+                    changed = True
+        if changed:
+            self.scan()
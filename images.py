@@ -0,0 +1,135 @@
+import os
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional; without it uploads are served as-is.
+    Image = None
+
+# Uploads decoding to more pixels than this are skipped (decompression bombs).
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", "40000000"))
+if Image is not None:
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Fixed output widths per variant name.
+VARIANT_WIDTHS = {
+    "avatar": 160,
+    "card": 480,
+    "detail": 1200,
+}
+RECIPE_VARIANTS = ("card", "detail")
+PROFILE_VARIANTS = ("avatar",)
+
+# Variants offered in srcset for each display slot, and the matching sizes hint.
+SLOT_VARIANTS = {
+    "card": (("card", "detail"), "(max-width: 600px) 100vw, 480px"),
+    "detail": (("card", "detail"), "(max-width: 960px) 100vw, 50vw"),
+    "avatar": (("avatar",), "160px"),
+}
+
+FORMAT_MIME = {
+    "avif": "image/avif",
+    "webp": "image/webp",
+}
+VARIANT_DIR_PREFIX = "/static/img/"
+
+
+def modern_formats():
+    """Return the modern output formats the installed Pillow can encode, best first."""
+    if Image is None:
+        return ()
+    formats = []
+    if features.check("avif"):
+        formats.append("avif")
+    if features.check("webp"):
+        formats.append("webp")
+    return tuple(formats)
+
+
+def variant_path(path, variant, fmt):
+    """Map /static/img/recipes/abc.png to /static/img/recipes/abc_card.webp."""
+    stem = path.rsplit(".", 1)[0] if "." in path.rsplit("/", 1)[-1] else path
+    return f"{stem}_{variant}.{fmt}"
+
+
+def generate_variants(root_path, path, variants):
+    """Write resized variants of an uploaded image next to it; return their static paths.
+
+    Every variant is saved as JPEG (universal fallback) plus each modern format
+    Pillow supports (AVIF/WebP). Images are never upscaled.
+    """
+    if Image is None or not path or not path.startswith(VARIANT_DIR_PREFIX):
+        return []
+    source = os.path.join(root_path, path.lstrip("/"))
+    written = []
+    try:
+        with Image.open(source) as original:
+            # Pillow only warns between MAX_IMAGE_PIXELS and twice that; refuse those too.
+            if original.width * original.height > MAX_IMAGE_PIXELS:
+                raise Image.DecompressionBombError(f"{original.width}x{original.height} exceeds MAX_IMAGE_PIXELS")
+            original.seek(0)
+            image = ImageOps.exif_transpose(original)
+            if image.mode in ("RGBA", "LA", "P"):
+                # Flatten transparency onto white so JPEG variants don't turn it black.
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            else:
+                image = image.convert("RGB")
+    except Image.DecompressionBombError as err:
+        print(f"Skipped oversized image {path}:", err)
+        return []
+    except (OSError, ValueError) as err:
+        print(f"Failed to open image {path} for variants:", err)
+        return []
+    for variant in variants:
+        width = VARIANT_WIDTHS[variant]
+        if image.width > width:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        else:
+            resized = image
+        for fmt in ("jpg",) + modern_formats():
+            target_path = variant_path(path, variant, fmt)
+            target = os.path.join(root_path, target_path.lstrip("/"))
+            try:
+                if fmt == "jpg":
+                    resized.save(target, "JPEG", quality=82, optimize=True, progressive=True)
+                elif fmt == "webp":
+                    resized.save(target, "WEBP", quality=80, method=4)
+                else:
+                    resized.save(target, "AVIF", quality=60)
+                written.append(target_path)
+            except (OSError, ValueError) as err:
+                print(f"Failed to write {fmt} {variant} variant:", err)
+    return written
+
+
+def is_variant_file(filename):
+    """Return True for files written by generate_variants (e.g. abc_card.webp)."""
+    stem = filename.rsplit(".", 1)[0]
+    return any(stem.endswith(f"_{variant}") for variant in VARIANT_WIDTHS)
+
+
+def image_sources(path, slot, exists):
+    """Return {"src", "sources", "sizes"} for rendering path in a display slot.
+
+    sources lists <source> entries (type + srcset) for the modern formats whose
+    variants exist; src is the JPEG variant for the slot, or the original path.
+    exists is a callable answering whether a static path is on disk.
+    """
+    result = {"src": path, "sources": [], "sizes": ""}
+    if not path or not str(path).startswith(VARIANT_DIR_PREFIX) or slot not in SLOT_VARIANTS:
+        return result
+    variants, sizes = SLOT_VARIANTS[slot]
+    result["sizes"] = sizes
+    for fmt in ("avif", "webp"):
+        entries = [
+            f"{variant_path(path, variant, fmt)} {VARIANT_WIDTHS[variant]}w"
+            for variant in variants if exists(variant_path(path, variant, fmt))
+        ]
+        if entries:
+            result["sources"].append({"type": FORMAT_MIME[fmt], "srcset": ", ".join(entries)})
+    fallback = variant_path(path, variants[-1] if slot == "detail" else variants[0], "jpg")
+    if exists(fallback):
+        result["src"] = fallback
+    return result
@@ -0,0 +1,177 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class JobQueue():
+    """Persistent background job queue backed by a local SQLite file.
+
+    Request handlers enqueue named jobs with a JSON payload and return at once;
+    a pool of daemon worker threads runs the registered handler for each job.
+    A handler that raises is retried with exponential backoff up to max_attempts,
+    then the job is kept with status 'failed' for inspection. Jobs survive
+    restarts, and several processes may share the same queue file.
+    on_worker_start runs once in each worker thread before it claims jobs.
+    """
+    def __init__(self, path, workers=2, max_attempts=5, poll_interval=1.0, stale_after=300, on_job_done=None,
+                 on_worker_start=None):
+        self.path = str(path)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.on_job_done = on_job_done
+        self.on_worker_start = on_worker_start
+        self._handlers = {}
+        self._threads = []
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._counters = {"enqueued": 0, "completed": 0, "retried": 0, "failed": 0}
+        with self._connection() as conn:
+            conn.execute(
+                """
+                create table if not exists jobs (
+                    id integer primary key autoincrement,
+                    name text not null,
+                    payload text not null,
+                    status text not null default 'pending',
+                    attempts integer not null default 0,
+                    run_at real not null,
+                    claimed_at real,
+                    last_error text,
+                    created_at real not null
+                )
+                """
+            )
+            conn.execute("create index if not exists jobs_pending on jobs (status, run_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            self._local.conn = conn
+        return conn
+
+    def register(self, name, handler):
+        """Register handler(payload_dict) for jobs called name."""
+        self._handlers[name] = handler
+
+    def enqueue(self, name, payload=None, delay=0):
+        """Persist a job and wake a worker; returns the job id."""
+        if name not in self._handlers:
+            raise ValueError(f"Unknown job type: {name}")
+        now = time.time()
+        cur = self._connection().execute(
+            "insert into jobs (name, payload, run_at, created_at) values (?, ?, ?, ?)",
+            (name, json.dumps(payload or {}), now + delay, now),
+        )
+        with self._stats_lock:
+            self._counters["enqueued"] += 1
+        self._wakeup.set()
+        return cur.lastrowid
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """Ask workers to finish their current job and exit."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def depth(self):
+        """Return the number of jobs waiting to run (including scheduled retries)."""
+        row = self._connection().execute("select count(*) from jobs where status = 'pending'").fetchone()
+        return row[0]
+
+    def stats(self):
+        """Return queue depth plus enqueue/complete/retry/failure counters."""
+        rows = self._connection().execute("select status, count(*) from jobs group by status").fetchall()
+        by_status = dict(rows)
+        with self._stats_lock:
+            stats = dict(self._counters)
+        stats["pending"] = by_status.get("pending", 0)
+        stats["running"] = by_status.get("running", 0)
+        stats["failed_total"] = by_status.get("failed", 0)
+        stats["workers"] = len(self._threads)
+        return stats
+
+    def _claim(self):
+        """Atomically move the next due job to 'running' and return it, or None."""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("begin immediate")
+        try:
+            # Jobs left 'running' by a crashed process become due again.
+            conn.execute(
+                "update jobs set status = 'pending' where status = 'running' and claimed_at < ?",
+                (now - self.stale_after,),
+            )
+            row = conn.execute(
+                "select id, name, payload, attempts from jobs where status = 'pending' and run_at <= ? order by run_at, id limit 1",
+                (now,),
+            ).fetchone()
+            if row:
+                conn.execute("update jobs set status = 'running', claimed_at = ? where id = ?", (now, row[0]))
+            conn.execute("commit")
+            return row
+        except sqlite3.Error:
+            conn.execute("rollback")
+            raise
+
+    def _worker(self):
+        if self.on_worker_start:
+            self.on_worker_start()
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as err:
+                print("Job queue claim failed:", err)
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(*job)
+
+    def _run(self, job_id, name, payload, attempts):
+        conn = self._connection()
+        try:
+            self._handlers[name](json.loads(payload))
+        except Exception as err:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                conn.execute(
+                    "update jobs set status = 'failed', attempts = ?, last_error = ? where id = ?",
+                    (attempts, repr(err), job_id),
+                )
+                with self._stats_lock:
+                    self._counters["failed"] += 1
+                print(f"Job {name}#{job_id} failed permanently:", err)
+            else:
+                conn.execute(
+                    "update jobs set status = 'pending', attempts = ?, last_error = ?, run_at = ? where id = ?",
+                    (attempts, repr(err), time.time() + 2 ** attempts, job_id),
+                )
+                with self._stats_lock:
+                    self._counters["retried"] += 1
+        else:
+            conn.execute("delete from jobs where id = ?", (job_id,))
+            with self._stats_lock:
+                self._counters["completed"] += 1
+        finally:
+            if self.on_job_done:
+                self.on_job_done()
@@ -0,0 +1,287 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# Upper bounds (seconds) of the per-method latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Upper bounds of the DB round-trips-per-request histogram buckets.
+ROUND_TRIP_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+slow_log = logging.getLogger("dbhandler.slow_queries")
+if os.environ.get("SLOW_QUERY_LOG"):
+    _handler = logging.FileHandler(os.environ["SLOW_QUERY_LOG"])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    slow_log.addHandler(_handler)
+
+# Profiling totals (round-trips, DB/template time, file checks) of the HTTP request being served in this context (None outside requests).
+_request_stats = contextvars.ContextVar("db_request_stats", default=None)
+
+
+class Histogram():
+    """Prometheus-style histogram: cumulative bucket counts plus sum and count."""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        """Return the exposition lines of this histogram for one label set."""
+        out = []
+        for bound, count in zip(self.buckets, self.counts):
+            out.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        out.append(f"{name}_count{{{labels}}} {self.count}")
+        return out
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request issued more DB round-trips than its budget, or repeated one statement (N+1)."""
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _statement(sql):
+    """Collapse whitespace so a multi-line query logs as one line."""
+    return " ".join(str(sql).split())[:500]
+
+
+class QueryMetrics():
+    """Per-DBHandler-method query latency, rows and errors, plus DB round-trips per HTTP request.
+
+    Statements slower than slow_ms (SLOW_QUERY_MS, default 200) are written to the
+    "dbhandler.slow_queries" logger as one JSON object per line; parameters are never logged.
+    """
+    def __init__(self, slow_ms=None):
+        self.slow_ms = float(os.environ.get("SLOW_QUERY_MS", "200")) if slow_ms is None else slow_ms
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._requests = {}
+
+    def record(self, method, sql, seconds, rows, failed=False):
+        """Account one statement (execute plus its fetches) to the DBHandler method that ran it."""
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = {
+                    "latency": Histogram(LATENCY_BUCKETS), "rows": 0, "errors": 0, "slow": 0,
+                }
+            stats["latency"].observe(seconds)
+            stats["rows"] += rows
+            if failed:
+                stats["errors"] += 1
+            slow = seconds * 1000 >= self.slow_ms
+            if slow:
+                stats["slow"] += 1
+        current = _request_stats.get()
+        if current is not None:
+            # gather_reads threads share the request's dict through the copied context.
+            with current["lock"]:
+                current["queries"] += 1
+                current["db_time"] += seconds
+                current["rows"] += rows
+                repeated = current["statements"].get(sql)
+                if repeated is None:
+                    current["statements"][sql] = [1, method]
+                else:
+                    repeated[0] += 1
+        if slow:
+            slow_log.warning(json.dumps({
+                "event": "slow_query",
+                "method": method,
+                "ms": round(seconds * 1000, 2),
+                "rows": rows,
+                "failed": failed,
+                "endpoint": current["endpoint"] if current else None,
+                "sql": _statement(sql),
+            }))
+
+    def start_request(self, endpoint):
+        """Begin counting round-trips for the current request; returns a token for finish_request."""
+        return _request_stats.set({
+            "endpoint": endpoint or "unknown",
+            "started": time.perf_counter(),
+            "queries": 0,
+            "db_time": 0.0,
+            "rows": 0,
+            "template_time": 0.0,
+            "fs_lookups": 0,
+            "fs_stats": 0,
+            "statements": {},
+            "lock": threading.Lock(),
+        })
+
+    def request_stats(self):
+        """Return the running totals of the current request, or None outside a request."""
+        return _request_stats.get()
+
+    def note(self, key, amount=1):
+        """Add amount to a counter (template_time, fs_lookups, fs_stats) of the current request."""
+        current = _request_stats.get()
+        if current is not None:
+            with current["lock"]:
+                current[key] += amount
+
+    def repeated_statements(self, threshold):
+        """Return [(count, method, sql)] for statements run at least threshold times in this request.
+
+        The same parameterized SQL issued over and over from one page is the N+1 pattern:
+        a per-row lookup that should be a join or an IN (...) batch.
+        """
+        current = _request_stats.get()
+        if current is None:
+            return []
+        with current["lock"]:
+            statements = list(current["statements"].items())
+        return sorted(
+            ((count, method, _statement(sql)) for sql, (count, method) in statements if count >= threshold),
+            reverse=True,
+        )
+
+    def finish_request(self, token):
+        """Record the request's round-trip count by endpoint and stop counting; returns its totals."""
+        current = _request_stats.get()
+        _request_stats.reset(token)
+        if current is None:
+            return None
+        with self._lock:
+            histogram = self._requests.get(current["endpoint"])
+            if histogram is None:
+                histogram = self._requests[current["endpoint"]] = Histogram(ROUND_TRIP_BUCKETS)
+            histogram.observe(current["queries"])
+        return current
+
+    def render_prometheus(self, gauges=None):
+        """Return all metrics in the Prometheus text exposition format.
+
+        gauges is an optional {name: (help, value)} dict appended as plain gauges.
+        """
+        lines = [
+            "# HELP dbhandler_query_duration_seconds Statement time (execute plus fetches) by DBHandler method.",
+            "# TYPE dbhandler_query_duration_seconds histogram",
+        ]
+        with self._lock:
+            methods = sorted(self._methods.items())
+            requests = sorted(self._requests.items())
+            for method, stats in methods:
+                lines.extend(stats["latency"].lines("dbhandler_query_duration_seconds", f'method="{_label(method)}"'))
+            for name, key, help_text in (
+                ("dbhandler_query_rows_total", "rows", "Rows fetched by DBHandler method."),
+                ("dbhandler_query_errors_total", "errors", "Statements that raised, by DBHandler method."),
+                ("dbhandler_slow_queries_total", "slow", "Statements over the slow-query threshold, by DBHandler method."),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for method, stats in methods:
+                    lines.append(f'{name}{{method="{_label(method)}"}} {stats[key]}')
+            lines.append("# HELP http_request_db_round_trips DB statements issued per HTTP request, by endpoint.")
+            lines.append("# TYPE http_request_db_round_trips histogram")
+            for endpoint, histogram in requests:
+                lines.extend(histogram.lines("http_request_db_round_trips", f'endpoint="{_label(endpoint)}"'))
+        for name, (help_text, value) in (gauges or {}).items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _calling_method(owner):
+    """Name of the outermost function of file owner on the stack (the public DBHandler method).
+
+    Statements issued from elsewhere (e.g. migrations) are named module.function of the caller.
+    """
+    frame = sys._getframe(3)
+    caller = frame
+    name = None
+    while frame is not None:
+        if frame.f_code.co_filename == owner:
+            name = frame.f_code.co_name
+        elif name is not None:
+            break
+        frame = frame.f_back
+    if name is None:
+        module = os.path.splitext(os.path.basename(caller.f_code.co_filename))[0]
+        name = f"{module}.{caller.f_code.co_name}"
+    return name
+
+
+class InstrumentedCursor():
+    """Wrap a DB-API cursor so every statement is timed and counted in a QueryMetrics.
+
+    A statement's time covers its execute call and the fetches that follow, and is
+    recorded when the next statement starts or the cursor is closed.
+    """
+    def __init__(self, cursor, metrics, owner):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._owner = owner
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._run(self._cursor.execute, operation, args, kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._run(self._cursor.executemany, operation, args, kwargs)
+
+    def _run(self, call, operation, args, kwargs):
+        self.flush()
+        method = _calling_method(self._owner)
+        start = time.perf_counter()
+        try:
+            result = call(operation, *args, **kwargs)
+        except Exception:
+            self._metrics.record(method, operation, time.perf_counter() - start, 0, failed=True)
+            raise
+        self._pending = [method, operation, time.perf_counter() - start, 0]
+        return result
+
+    def _fetch(self, call, *args):
+        start = time.perf_counter()
+        result = call(*args)
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - start
+            if isinstance(result, list):
+                self._pending[3] += len(result)
+            elif result is not None:
+                self._pending[3] += 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def flush(self):
+        """Record the statement in progress, if any."""
+        if self._pending is not None:
+            method, operation, seconds, rows = self._pending
+            self._pending = None
+            self._metrics.record(method, operation, seconds, rows)
+
+    def close(self):
+        self.flush()
+        return self._cursor.close()
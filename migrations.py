@@ -0,0 +1,204 @@
+from mysql.connector import Error
+
+
+def _column(table, name, definition):
+    """Migration step adding a column unless it already exists.
+
+    ALTER TABLE commits implicitly, so a migration that fails after it is not
+    recorded; the guard lets the re-run skip columns the failed attempt added.
+    """
+    def step(db):
+        db.cursor.execute(
+            """
+            select count(*) from information_schema.columns
+            where table_schema = database() and table_name = %s and column_name = %s
+            """,
+            (table, name),
+        )
+        if not db.cursor.fetchone()[0]:
+            db.cursor.execute(f"alter table {table} add column {name} {definition}")
+    return step
+
+
+def _index(table, name, columns):
+    """Migration step creating an index unless one of that name already exists."""
+    def step(db):
+        db.cursor.execute(
+            """
+            select count(*) from information_schema.statistics
+            where table_schema = database() and table_name = %s and index_name = %s
+            """,
+            (table, name),
+        )
+        if not db.cursor.fetchone()[0]:
+            db.cursor.execute(f"create index {name} on {table} ({columns})")
+    return step
+
+
+# Ordered schema migrations: (version, description, steps). A step is either a
+# SQL statement or a callable receiving the DBHandler (for data backfills).
+# Every step must be idempotent: DDL commits implicitly, so a migration that
+# fails midway is re-run from its first step.
+MIGRATIONS = [
+    (
+        1,
+        "rating_sum/rating_count counters on Recipes and Users",
+        [
+            _column("Recipes", "rating_sum", "bigint not null default 0"),
+            _column("Recipes", "rating_count", "int not null default 0"),
+            _column("Users", "rating_sum", "bigint not null default 0"),
+            _column("Users", "rating_count", "int not null default 0"),
+            lambda db: _require(db.rebuild_rating_aggregates(), "rating aggregate backfill"),
+        ],
+    ),
+    (
+        2,
+        "denormalized UserStats profile counters",
+        [
+            """
+            create table if not exists UserStats (
+                user_id int primary key,
+                likes int not null default 0,
+                followers int not null default 0,
+                reviews int not null default 0,
+                posted int not null default 0,
+                rating_sum bigint not null default 0,
+                rating_count int not null default 0
+            )
+            """,
+            lambda db: _require(db.rebuild_user_stats(), "user stats backfill"),
+        ],
+    ),
+    (
+        3,
+        "precomputed RecipeNeighbors recommendations",
+        [
+            """
+            create table if not exists RecipeNeighbors (
+                recipe_id int not null,
+                neighbor_rank tinyint not null,
+                neighbor_id int not null,
+                score double not null,
+                primary key (recipe_id, neighbor_rank),
+                key recipe_neighbors_neighbor (neighbor_id)
+            )
+            """,
+            lambda db: _require(db.rebuild_recipe_neighbors(), "recipe neighbor backfill"),
+        ],
+    ),
+    (
+        4,
+        "indexes for the hot DBHandler queries",
+        [
+            # Feed/home listings and keyset pages: status filter, (date_posted, recipe_id) order.
+            _index("Recipes", "recipes_status_posted", "status, date_posted, recipe_id"),
+            _index("Recipes", "recipes_status_difficulty_posted", "status, difficulty, date_posted, recipe_id"),
+            _index("Recipes", "recipes_status_category_posted", "status, category, date_posted, recipe_id"),
+            _index("Recipes", "recipes_status_rating", "status, rating, date_posted"),
+            _index("Recipes", "recipes_author_status_posted", "author_id, status, date_posted"),
+            # Liked-set loads and batched liked lookups.
+            _index("Likes", "likes_user_recipe", "user_id, recipe_id"),
+            _index("Notifications", "notifications_user_unread", "user_id, is_read, created_at"),
+            # Latest reviews per recipe and the admin ratings keyset list.
+            _index("Ratings", "ratings_recipe_posted", "recipe_id, date_posted"),
+            _index("Ratings", "ratings_posted_id", "date_posted, rate_id"),
+            # Detail loader children and recommendation candidates.
+            _index("Ingredients", "ingredients_recipe", "recipe_id, ingredient_id"),
+            _index("Ingredients", "ingredients_name", "ingredient"),
+            _index("Tags", "tags_recipe", "recipe_id, tag_id"),
+            _index("Tags", "tags_name", "tag_name"),
+        ],
+    ),
+]
+
+# Representative hot queries checked with EXPLAIN at startup: (label, sql, params).
+HOT_QUERIES = [
+    ("feed page", "select recipe_id from Recipes where status = 'active' order by date_posted desc, recipe_id desc limit 12", ()),
+    ("feed by difficulty",
+     "select recipe_id from Recipes where status = 'active' and difficulty = %s order by date_posted desc, recipe_id desc limit 12",
+     ("Easy",)),
+    ("feed by category",
+     "select recipe_id from Recipes where status = 'active' and category = %s order by date_posted desc, recipe_id desc limit 12",
+     ("Dinner",)),
+    ("popular recipes", "select recipe_id from Recipes where status = 'active' order by rating desc, date_posted desc limit 3", ()),
+    ("profile recipes",
+     "select recipe_id from Recipes where author_id = %s and status = 'active' order by date_posted desc limit 8", (1,)),
+    ("liked lookup", "select recipe_id from Likes where user_id = %s and recipe_id in (%s, %s, %s)", (1, 1, 2, 3)),
+    ("unread notifications",
+     "select notification_id from Notifications where user_id = %s and is_read = 0 order by created_at desc", (1,)),
+    ("latest reviews", "select rate_id from Ratings where recipe_id = %s order by date_posted desc limit 5", (1,)),
+    ("admin ratings page", "select rate_id from Ratings order by date_posted desc, rate_id desc limit 20", ()),
+    ("recipe ingredients", "select ingredient from Ingredients where recipe_id = %s order by ingredient_id", (1,)),
+    ("recipe tags", "select tag_name from Tags where recipe_id = %s order by tag_id", (1,)),
+]
+
+
+def _require(ok, what):
+    if not ok:
+        raise RuntimeError(f"{what} failed")
+
+
+def current_version(db):
+    """Return the highest applied migration version (0 for a fresh database)."""
+    db.cursor.execute(
+        """
+        create table if not exists SchemaVersion (
+            version int primary key,
+            description varchar(255) not null,
+            applied_at datetime not null default current_timestamp
+        )
+        """
+    )
+    db.cursor.execute("select coalesce(max(version), 0) from SchemaVersion")
+    return db.cursor.fetchone()[0]
+
+
+def verify_indexes(db):
+    """EXPLAIN each hot query and warn loudly about full table scans; returns the offending labels."""
+    offenders = []
+    for label, sql, params in HOT_QUERIES:
+        try:
+            db.cursor.execute("explain " + sql, params)
+            columns = [column[0] for column in db.cursor.description]
+            plan = [dict(zip(columns, row)) for row in db.cursor.fetchall()]
+        except Error as err:
+            print(f"Index check skipped for {label}:", err)
+            continue
+        for step in plan:
+            if step.get("type") == "ALL":
+                offenders.append(label)
+                print(
+                    "!" * 72 + "\n"
+                    f"WARNING: full table scan of {step.get('table')} in '{label}' "
+                    f"(~{step.get('rows')} rows, possible keys: {step.get('possible_keys')}).\n"
+                    "Run 'flask migrate' to create the indexes from migration 4.\n"
+                    + "!" * 72
+                )
+    return offenders
+
+
+def migrate(db):
+    """Apply pending migrations in order; returns the list of versions applied."""
+    applied = []
+    version = current_version(db)
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"Applying migration {number}: {description}")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(db)
+                else:
+                    db.cursor.execute(step)
+            db.cursor.execute(
+                "insert into SchemaVersion (version, description) values (%s, %s)",
+                (number, description),
+            )
+            db.cnx.commit()
+        except Error as err:
+            db.cnx.rollback()
+            raise RuntimeError(f"Migration {number} failed: {err}")
+        db.reset_schema_flags()
+        applied.append(number)
+    return applied
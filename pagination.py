@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+def encode_cursor(key):
+    """Encode a sort key tuple (datetimes, numbers) as an opaque URL-safe token."""
+    values = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in key]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, size=None):
+    """Decode a token made by encode_cursor; returns None for missing or malformed tokens.
+
+    size, when given, is the number of values the caller's sort key must have.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list):
+            return None
+        key = []
+        for value in values:
+            if isinstance(value, dict):
+                value = datetime.fromisoformat(value["dt"])
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                return None
+            key.append(value)
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+    if size is not None and len(key) != size:
+        return None
+    return tuple(key)
+
+
+def seek_clause(columns, key, direction):
+    """Return (sql, params) selecting rows after (direction 'after') or before a sort key.
+
+    Rows are assumed ordered by columns descending. The comparison is expanded to
+    "a < x or (a = x and b < y)" so MySQL can range-scan the composite index.
+    """
+    op = "<" if direction == "after" else ">"
+    clauses = []
+    params = []
+    for i, column in enumerate(columns):
+        parts = [f"{prev} = %s" for prev in columns[:i]] + [f"{column} {op} %s"]
+        clauses.append("(" + " and ".join(parts) + ")")
+        params.extend(list(key[:i]) + [key[i]])
+    return "(" + " or ".join(clauses) + ")", params
@@ -0,0 +1,94 @@
+import heapq
+
+# Feature kinds used to find candidate neighbors; category only contributes to the score.
+CANDIDATE_KINDS = ("ingredient", "tag", "author")
+# Features shared by more recipes than this (e.g. "salt") don't generate candidates.
+MAX_POSTING = 1000
+
+
+def features(doc):
+    """Return the feature set {(kind, value)} of a recipe document."""
+    vector = set()
+    for ingredient in doc.get("ingredients") or []:
+        vector.add(("ingredient", ingredient.strip().lower()))
+    for tag in doc.get("tags") or []:
+        vector.add(("tag", tag.strip().lower()))
+    if doc.get("category"):
+        vector.add(("category", doc["category"].strip().lower()))
+    if doc.get("author_id"):
+        vector.add(("author", doc["author_id"]))
+    return vector
+
+
+def similarity(a, b):
+    """Jaccard similarity of two feature sets: |a & b| / |a | b|."""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+def _rank_key(item):
+    """Order (recipe_id, score) pairs best first; equal scores go to the lower id.
+
+    top_neighbors, build_all and merge_neighbor share it, so incremental refreshes
+    and full rebuilds store the same lists.
+    """
+    recipe_id, score = item
+    return (-score, recipe_id)
+
+
+def top_neighbors(doc, candidates, k):
+    """Return the k most similar candidates to doc as [(recipe_id, score)], best first."""
+    vector = features(doc)
+    scored = []
+    for candidate in candidates:
+        if candidate["id"] == doc["id"]:
+            continue
+        score = similarity(vector, features(candidate))
+        if score > 0:
+            scored.append((candidate["id"], score))
+    return heapq.nsmallest(k, scored, key=_rank_key)
+
+
+def merge_neighbor(current, recipe_id, score, k):
+    """Insert or rescore recipe_id in a neighbor list; returns the new list, or None if unchanged.
+
+    current is a [(recipe_id, score)] list, best first, as stored for one recipe.
+    """
+    others = [(rid, s) for rid, s in current if rid != recipe_id]
+    if score <= 0:
+        return others if len(others) != len(current) else None
+    if len(others) >= k and _rank_key((recipe_id, score)) >= _rank_key(others[-1]):
+        return others if len(others) != len(current) else None
+    merged = sorted(others + [(recipe_id, score)], key=_rank_key)[:k]
+    return None if merged == current else merged
+
+
+def build_all(docs, k, max_posting=MAX_POSTING):
+    """Compute top-k neighbors for every document using an inverted feature index.
+
+    Only recipes sharing a selective candidate feature are compared, so the cost
+    follows the overlap between recipes rather than the square of the catalog size.
+    """
+    vectors = {doc["id"]: features(doc) for doc in docs}
+    postings = {}
+    for recipe_id, vector in vectors.items():
+        for key in vector:
+            if key[0] in CANDIDATE_KINDS:
+                postings.setdefault(key, []).append(recipe_id)
+    result = {}
+    for recipe_id, vector in vectors.items():
+        candidates = set()
+        for key in vector:
+            posting = postings.get(key)
+            if posting and len(posting) <= max_posting:
+                candidates.update(posting)
+        candidates.discard(recipe_id)
+        scored = []
+        for other in candidates:
+            score = similarity(vector, vectors[other])
+            if score > 0:
+                scored.append((other, score))
+        result[recipe_id] = heapq.nsmallest(k, scored, key=_rank_key)
+    return result
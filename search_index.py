@@ -0,0 +1,409 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+
+# Runs of Unicode letters and digits (\w without the underscore).
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Relevance weight of a query token matching each recipe field.
+FIELD_WEIGHTS = {
+    "title": 5,
+    "tag": 3,
+    "ingredient": 3,
+    "category": 2,
+    "author": 1,
+}
+
+
+def tokenize(text):
+    """Split text into case- and accent-folded tokens ("Crème" -> "creme").
+
+    Folding matches the accent-insensitive _ai_ci collation the SQL search uses,
+    so indexed text and queries compare the same way with or without accents.
+    """
+    text = unicodedata.normalize("NFKD", (text or "").casefold())
+    return TOKEN_RE.findall("".join(ch for ch in text if not unicodedata.combining(ch)))
+
+
+def _descending(hit):
+    """Sort key turning the descending hit list into an ascending one for bisect."""
+    return tuple(-value for value in hit)
+
+
+class SearchIndex():
+    """In-process inverted index over active recipes for /search and /api/search.
+
+    Each document is tokenized per field (title, category, ingredients, tags, author)
+    into a posting map token -> {recipe_id: weight}. A query matches recipes that
+    contain every query token as a word prefix; hits are ranked by summed field
+    weight, then by date posted (newest first).
+    """
+    def __init__(self, result_cache_size=256):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_dates = {}
+        self._terms = []
+        self._results = OrderedDict()
+        self._result_cache_size = result_cache_size
+        self.ready = False
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def build(self, documents):
+        """Replace the whole index with the given recipe documents."""
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_dates = {}
+            self._terms = []
+            self._results.clear()
+            for doc in documents:
+                self._add(doc, keep_sorted=False)
+            self._terms = sorted(self._postings)
+            self.ready = True
+
+    def add(self, doc):
+        """Index (or re-index) a single recipe document."""
+        with self._lock:
+            self._remove(doc["id"])
+            self._add(doc, keep_sorted=True)
+            self._results.clear()
+
+    def remove(self, recipe_id):
+        """Drop a recipe from the index if present."""
+        with self._lock:
+            if self._remove(recipe_id):
+                self._results.clear()
+
+    def search(self, query, limit=12, offset=0):
+        """Return ranked recipe ids for one page of results."""
+        return [recipe_id for _, _, recipe_id in self.page(query, limit, offset)]
+
+    def page(self, query, limit=12, offset=0, after=None, before=None):
+        """Return one page of (score, timestamp, id) hits.
+
+        after/before are hit tuples from a previous page; the page then starts
+        right after (or ends right before) that hit, found by bisection.
+        """
+        ranked = self._ranked(query)
+        if after is not None:
+            start = bisect_right(ranked, _descending(after), key=_descending)
+            return ranked[start:start + limit]
+        if before is not None:
+            end = bisect_left(ranked, _descending(before), key=_descending)
+            return ranked[max(0, end - limit):end]
+        return ranked[offset:offset + limit]
+
+    def count(self, query):
+        """Return the exact number of recipes matching the query."""
+        return len(self._ranked(query))
+
+    def _doc_weights(self, doc):
+        weights = {}
+        fields = [
+            ("title", [doc.get("title")]),
+            ("category", [doc.get("category")]),
+            ("author", [doc.get("author")]),
+            ("ingredient", doc.get("ingredients") or []),
+            ("tag", doc.get("tags") or []),
+        ]
+        for field, values in fields:
+            for value in values:
+                for token in tokenize(value):
+                    weights[token] = max(weights.get(token, 0), FIELD_WEIGHTS[field])
+        return weights
+
+    def _add(self, doc, keep_sorted):
+        recipe_id = doc["id"]
+        weights = self._doc_weights(doc)
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if keep_sorted:
+                    insort(self._terms, token)
+            postings[recipe_id] = weight
+        self._doc_terms[recipe_id] = tuple(weights)
+        date_posted = doc.get("date_posted")
+        self._doc_dates[recipe_id] = date_posted.timestamp() if date_posted else 0.0
+
+    def _remove(self, recipe_id):
+        terms = self._doc_terms.pop(recipe_id, None)
+        if terms is None:
+            return False
+        self._doc_dates.pop(recipe_id, None)
+        for token in terms:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(recipe_id, None)
+            if not postings:
+                del self._postings[token]
+                pos = bisect_left(self._terms, token)
+                if pos < len(self._terms) and self._terms[pos] == token:
+                    del self._terms[pos]
+        return True
+
+    def _prefix_matches(self, prefix):
+        """Return {recipe_id: best weight} for all terms starting with prefix."""
+        matches = {}
+        pos = bisect_left(self._terms, prefix)
+        while pos < len(self._terms) and self._terms[pos].startswith(prefix):
+            for recipe_id, weight in self._postings[self._terms[pos]].items():
+                if weight > matches.get(recipe_id, 0):
+                    matches[recipe_id] = weight
+            pos += 1
+        return matches
+
+    def _ranked(self, query):
+        """Return the full ranked hit list for a query as (score, timestamp, id) tuples."""
+        tokens = sorted(set(tokenize(query)))
+        if not tokens:
+            return []
+        key = " ".join(tokens)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+            scores = None
+            # Intersect the rarest token first to keep the candidate set small.
+            for matches in sorted((self._prefix_matches(t) for t in tokens), key=len):
+                if scores is None:
+                    scores = dict(matches)
+                else:
+                    scores = {rid: score + matches[rid] for rid, score in scores.items() if rid in matches}
+                if not scores:
+                    break
+            dates = self._doc_dates
+            ranked = sorted(
+                ((score, dates[rid], rid) for rid, score in (scores or {}).items()),
+                reverse=True,
+            )
+            self._results[key] = ranked
+            if len(self._results) > self._result_cache_size:
+                self._results.popitem(last=False)
+            return ranked
+
+
+# Relevance weight of an autocomplete hit per source field.
+SUGGEST_WEIGHTS = {
+    "title": 3,
+    "tag": 2,
+    "ingredient": 1,
+    "category": 1,
+    "author": 1,
+}
+
+
+def _restrict(postings, within):
+    """Yield (recipe_id, weight) from postings, only for ids in within when given."""
+    if within is None:
+        return postings.items()
+    if len(within) < len(postings):
+        return ((rid, postings[rid]) for rid in within if rid in postings)
+    return ((rid, weight) for rid, weight in postings.items() if rid in within)
+
+
+def trigrams(term):
+    """Return the set of padded character trigrams of a term."""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex():
+    """In-memory prefix + trigram index answering /api/search without MySQL.
+
+    Words of active recipe titles, ingredients, tags, categories and author
+    names are kept in a sorted vocabulary for prefix lookups (the flattened
+    equivalent of a trie). When a
+    query token has no prefix hit, terms sharing enough character trigrams with
+    it are used instead, so small typos still return suggestions. Suggestion
+    cards (id, title, image, rating) are held in memory as well.
+
+    A single-token query stops expanding after max_candidates recipes so one- or
+    two-letter queries stay within the latency budget on large catalogs; shorter
+    (closer) vocabulary words are expanded first. Multi-token queries expand the
+    longest token first and only look up the other tokens among its matches, so
+    the intersection is exact.
+    """
+    def __init__(self, min_similarity=0.45, max_candidates=2000):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._doc_terms = {}
+        self._cards = {}
+        self._titles = {}
+        self._terms = []
+        self._trigrams = {}
+        self.min_similarity = min_similarity
+        self.max_candidates = max_candidates
+        self.ready = False
+
+    def __len__(self):
+        return len(self._cards)
+
+    def build(self, documents):
+        """Replace the whole index with the given recipe documents."""
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._cards = {}
+            self._titles = {}
+            self._trigrams = {}
+            for doc in documents:
+                self._add(doc)
+            self._terms = sorted(self._postings)
+            self.ready = True
+
+    def add(self, doc):
+        """Index (or re-index) a single recipe document."""
+        with self._lock:
+            self._remove(doc["id"])
+            new_terms = self._add(doc)
+            for term in new_terms:
+                insort(self._terms, term)
+
+    def remove(self, recipe_id):
+        """Drop a recipe from the index if present."""
+        with self._lock:
+            self._remove(recipe_id)
+
+    def update_card(self, recipe_id, **fields):
+        """Update stored card fields (e.g. rating) of an indexed recipe."""
+        with self._lock:
+            card = self._cards.get(recipe_id)
+            if card is not None:
+                self._cards[recipe_id] = {**card, **fields}
+
+    def suggest(self, query, limit=5):
+        """Return up to limit suggestion cards ranked by match quality, then rating."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        phrase = " ".join(tokens)
+        with self._lock:
+            scores = None
+            limit_candidates = self.max_candidates if len(set(tokens)) == 1 else None
+            # Longer prefixes match fewer recipes; later tokens are only looked up among the survivors.
+            for token in sorted(set(tokens), key=len, reverse=True):
+                matches = self._prefix_matches(token, within=scores, limit=limit_candidates)
+                if not matches and len(token) >= 3:
+                    matches = self._fuzzy_matches(token, within=scores)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {rid: score + matches[rid] for rid, score in scores.items() if rid in matches}
+                if not scores:
+                    return []
+            cards = self._cards
+            titles = self._titles
+            best = heapq.nlargest(
+                limit,
+                scores.items(),
+                key=lambda hit: (
+                    hit[1] + (2 if titles[hit[0]].startswith(phrase) else 0),
+                    cards[hit[0]]["rating"] or 0,
+                    hit[0],
+                ),
+            )
+            return [dict(cards[rid]) for rid, _ in best]
+
+    def _add(self, doc):
+        recipe_id = doc["id"]
+        weights = {}
+        fields = [
+            ("title", [doc.get("title")]),
+            ("ingredient", doc.get("ingredients") or []),
+            ("tag", doc.get("tags") or []),
+            ("category", [doc.get("category")]),
+            ("author", [doc.get("author")]),
+        ]
+        for field, values in fields:
+            for value in values:
+                for token in tokenize(value):
+                    weights[token] = max(weights.get(token, 0), SUGGEST_WEIGHTS[field])
+        new_terms = []
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                new_terms.append(term)
+                for gram in trigrams(term):
+                    self._trigrams.setdefault(gram, set()).add(term)
+            postings[recipe_id] = weight
+        self._doc_terms[recipe_id] = tuple(weights)
+        self._cards[recipe_id] = {
+            "id": recipe_id,
+            "title": doc.get("title"),
+            "image": doc.get("image"),
+            "rating": doc.get("rating"),
+        }
+        self._titles[recipe_id] = " ".join(tokenize(doc.get("title")))
+        return new_terms
+
+    def _remove(self, recipe_id):
+        terms = self._doc_terms.pop(recipe_id, None)
+        if terms is None:
+            return
+        self._cards.pop(recipe_id, None)
+        self._titles.pop(recipe_id, None)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(recipe_id, None)
+            if postings:
+                continue
+            del self._postings[term]
+            pos = bisect_left(self._terms, term)
+            if pos < len(self._terms) and self._terms[pos] == term:
+                del self._terms[pos]
+            for gram in trigrams(term):
+                bucket = self._trigrams.get(gram)
+                if bucket is not None:
+                    bucket.discard(term)
+                    if not bucket:
+                        del self._trigrams[gram]
+
+    def _prefix_matches(self, prefix, within=None, limit=None):
+        """Return {recipe_id: best weight} for terms starting with prefix.
+
+        within restricts the result to those recipe ids; limit stops expanding
+        once that many recipes matched.
+        """
+        matches = {}
+        start = bisect_left(self._terms, prefix)
+        end = start
+        while end < len(self._terms) and self._terms[end].startswith(prefix):
+            end += 1
+        for term in sorted(self._terms[start:end], key=len) if end - start > 1 else self._terms[start:end]:
+            for recipe_id, weight in _restrict(self._postings[term], within):
+                if weight > matches.get(recipe_id, 0):
+                    matches[recipe_id] = weight
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
+
+    def _fuzzy_matches(self, token, within=None):
+        """Return matches for vocabulary terms similar to token (trigram Jaccard)."""
+        grams = trigrams(token)
+        overlap = {}
+        for gram in grams:
+            for term in self._trigrams.get(gram, ()):
+                overlap[term] = overlap.get(term, 0) + 1
+        matches = {}
+        for term, shared in overlap.items():
+            similarity = shared / (len(grams) + len(term) + 1 - shared)
+            if similarity < self.min_similarity:
+                continue
+            for recipe_id, weight in _restrict(self._postings[term], within):
+                score = weight * similarity
+                if score > matches.get(recipe_id, 0):
+                    matches[recipe_id] = score
+        return matches
+
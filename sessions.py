@@ -0,0 +1,110 @@
+import time
+import uuid
+
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict whose contents live in a server-side store, keyed by sid."""
+    def __init__(self, initial=None, sid=None, new=False, saved_at=None):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.saved_at = saved_at
+        self.modified = False
+        self.regenerate = False
+
+    def clear(self):
+        """Empty the session and issue a fresh sid on save (e.g. at login/logout)."""
+        super().clear()
+        self.regenerate = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keep logged-in sessions (user id, role, CSRF token) in a cache store; the cookie holds a signed sid.
+
+    Anonymous sessions (only a CSRF token, usually) stay in a signed cookie as with
+    Flask's default interface, so crawlers and first visits never write to the
+    store and cannot push logged-in sessions out of it. A session moves to the
+    store when "user" is set and leaves it when the user logs out.
+
+    store is any cache.CacheFactory cache (get/set/delete). Unchanged sessions are
+    written back only after half their lifetime, to keep the sliding expiry
+    without a store write on every request.
+    """
+    salt = "server-session"
+    key = "user"
+
+    def __init__(self, store):
+        self.store = store
+        self._cookie_sessions = SecureCookieSessionInterface()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(app.config["SESSION_COOKIE_NAME"])
+        if cookie and app.secret_key:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.get(sid)
+                if data is not None:
+                    data = dict(data)
+                    saved_at = data.pop("_saved_at", None)
+                    return ServerSession(data, sid=sid, saved_at=saved_at)
+            else:
+                try:
+                    data = self._cookie_sessions.get_signing_serializer(app).loads(
+                        cookie, max_age=int(app.permanent_session_lifetime.total_seconds())
+                    )
+                    return ServerSession(data, sid=uuid.uuid4().hex, new=True)
+                except BadSignature:
+                    pass
+        return ServerSession(sid=uuid.uuid4().hex, new=True)
+
+    def save_session(self, app, session, response):
+        name = app.config["SESSION_COOKIE_NAME"]
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if self.key not in session:
+            # Logged out (or never logged in): drop any stored copy, keep the rest in the cookie.
+            if not session.new:
+                self.store.delete(session.sid)
+            if not session:
+                if session.modified or not session.new:
+                    response.delete_cookie(name, domain=domain, path=path)
+                return
+            if session.modified or not session.new or self.should_set_cookie(app, session):
+                self._set_cookie(app, session, response, self._cookie_sessions.get_signing_serializer(app).dumps(dict(session)))
+            return
+        if session.regenerate and not session.new:
+            self.store.delete(session.sid)
+            session.sid = uuid.uuid4().hex
+            session.new = True
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        fresh = session.saved_at is not None and time.time() - session.saved_at < lifetime / 2
+        if not session.modified and not session.new and fresh:
+            return
+        if not self.should_set_cookie(app, session) and not session.new:
+            return
+        self.store.set(session.sid, dict(session, _saved_at=time.time()))
+        self._set_cookie(app, session, response, self._signer(app).sign(session.sid).decode())
+
+    def _set_cookie(self, app, session, response, value):
+        response.set_cookie(
+            app.config["SESSION_COOKIE_NAME"],
+            value,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=self.get_cookie_domain(app),
+            path=self.get_cookie_path(app),
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
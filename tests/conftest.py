@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The application modules live in the project root, not in a package.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,289 @@
+import fnmatch
+import pickle
+import types
+
+import pytest
+
+import cache
+from cache import ALL, CacheFactory, InvalidationBus, RedisCache, SignedPickle, SQLiteCache, TTLCache
+
+SECRET = "test-secret"
+
+
+class FakeClock():
+    """Stands in for the time module inside cache so expiry can be tested without sleeping."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache, "time", fake)
+    return fake
+
+
+class FakeRedis():
+    """The subset of the redis client RedisCache uses, backed by a dict."""
+    def __init__(self, fail=False):
+        self.data = {}
+        self.ttls = {}
+        self.fail = fail
+
+    def _check(self):
+        if self.fail:
+            raise cache.redis.RedisError("connection refused")
+
+    def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self._check()
+        self.data[key] = value
+        self.ttls[key] = ttl
+
+    def delete(self, *keys):
+        self._check()
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match=None, count=None):
+        self._check()
+        return [key for key in list(self.data) if match is None or fnmatch.fnmatchcase(key, match)]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    monkeypatch.setattr(cache, "redis", types.SimpleNamespace(RedisError=type("RedisError", (Exception,), {})))
+    return FakeRedis()
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    lru = TTLCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+
+
+def test_ttl_cache_expires_entries(clock):
+    ttl = TTLCache(maxsize=8, ttl=10)
+    ttl.set("a", 1)
+    clock.advance(9)
+    assert ttl.get("a") == 1
+    clock.advance(2)
+    assert ttl.get("a", "gone") == "gone"
+    assert ttl.stats()["size"] == 0
+
+
+def test_ttl_cache_without_size_cap(clock):
+    unbounded = TTLCache(maxsize=None, ttl=60)
+    for i in range(1000):
+        unbounded.set(i, i)
+    assert unbounded.get(0) == 0
+    assert unbounded.stats()["size"] == 1000
+
+
+def test_ttl_cache_delete_and_clear(clock):
+    local = TTLCache(maxsize=8, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    local.delete("a")
+    assert local.get("a") is None
+    local.clear()
+    assert local.get("b") is None
+
+
+def test_sqlite_cache_set_get_delete(tmp_path, clock):
+    shared = SQLiteCache(tmp_path / "cache.sqlite3", "recipes", SECRET, maxsize=8, ttl=60)
+    shared.set(("feed", 1), {"cards": [1, 2]})
+    assert shared.get(("feed", 1)) == {"cards": [1, 2]}
+    shared.delete(("feed", 1))
+    assert shared.get(("feed", 1)) is None
+    assert (shared.hits, shared.misses) == (1, 1)
+
+
+def test_sqlite_cache_is_shared_and_scoped_by_name(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    first = SQLiteCache(path, "feed", SECRET)
+    second = SQLiteCache(path, "feed", SECRET)
+    other = SQLiteCache(path, "count", SECRET)
+    first.set("k", "v")
+    assert second.get("k") == "v"
+    assert other.get("k") is None
+    second.clear()
+    assert first.get("k") is None
+
+
+def test_sqlite_cache_expires_entries(tmp_path, clock):
+    shared = SQLiteCache(tmp_path / "cache.sqlite3", "feed", SECRET, ttl=10)
+    shared.set("k", "v")
+    clock.advance(11)
+    assert shared.get("k", "gone") == "gone"
+
+
+def test_sqlite_cache_evicts_oldest_writes(tmp_path, clock):
+    shared = SQLiteCache(tmp_path / "cache.sqlite3", "feed", SECRET, maxsize=4, ttl=600)
+    # Eviction runs every 64 writes.
+    for i in range(64):
+        clock.advance(1)
+        shared.set(i, i)
+    assert shared.stats()["size"] == 4
+    assert shared.get(0) is None
+    assert [shared.get(i) for i in range(60, 64)] == [60, 61, 62, 63]
+
+
+def test_sqlite_cache_without_size_cap_only_drops_expired(tmp_path, clock):
+    shared = SQLiteCache(tmp_path / "cache.sqlite3", "session", SECRET, maxsize=None, ttl=100)
+    for i in range(64):
+        clock.advance(1)
+        shared.set(i, i)
+    assert shared.stats()["size"] == 64
+    clock.advance(50)
+    for i in range(64, 128):
+        shared.set(i, i)
+    # Entries 0..13 expired (written more than 100s before the 128th write).
+    assert shared.stats()["size"] == 128 - 14
+    assert shared.get(20) == 20
+
+
+def test_bus_delivers_invalidations_between_workers(tmp_path):
+    path = tmp_path / "bus.sqlite3"
+    bus_a = InvalidationBus(path, poll_interval=0)
+    bus_b = InvalidationBus(path, poll_interval=0)
+    worker_a = TTLCache(maxsize=8, ttl=60, name="feed", bus=bus_a)
+    worker_b = TTLCache(maxsize=8, ttl=60, name="feed", bus=bus_b)
+    worker_a.set("k", 1)
+    worker_b.set("k", 1)
+    worker_b.set("other", 2)
+
+    worker_a.delete("k")
+    assert worker_b.get("k") is None
+    assert worker_b.get("other") == 2
+
+    worker_a.clear()
+    assert worker_b.get("other") is None
+    assert bus_b.stats()["received"] == 2
+
+
+def test_bus_ignores_own_messages_and_reaches_other_subscribers(tmp_path):
+    path = tmp_path / "bus.sqlite3"
+    bus_a = InvalidationBus(path, poll_interval=0)
+    bus_b = InvalidationBus(path, poll_interval=0)
+    seen_a, seen_b = [], []
+    bus_a.subscribe("search_index", seen_a.append)
+    bus_b.subscribe("search_index", seen_b.append)
+    bus_a.publish("search_index", ("recipes", [1, 2], None))
+    bus_a.publish("search_index", ALL)
+    bus_a.poll(force=True)
+    bus_b.poll(force=True)
+    assert seen_a == []
+    assert seen_b == [("recipes", (1, 2), None), ALL]
+
+
+def test_factory_attaches_bus_by_default(tmp_path):
+    first = CacheFactory(backend="local", path=tmp_path / "cache.sqlite3")
+    second = CacheFactory(backend="local", path=tmp_path / "cache.sqlite3")
+    assert first.bus is not None and first.bus.path == second.bus.path
+    assert CacheFactory(backend="local", path=tmp_path / "cache.sqlite3", bus_path=False).bus is None
+    with pytest.raises(RuntimeError):
+        CacheFactory(backend="memcached", path=tmp_path / "cache.sqlite3")
+
+
+def test_redis_cache_round_trip(fake_redis):
+    shared = RedisCache(fake_redis, "feed", SECRET, ttl=0.5)
+    shared.set(("page", 2), [1, 2, 3])
+    assert shared.get(("page", 2)) == [1, 2, 3]
+    assert list(fake_redis.ttls.values()) == [1]
+    assert all(key.startswith("recipes:feed:") for key in fake_redis.data)
+    shared.delete(("page", 2))
+    assert shared.get(("page", 2)) is None
+    assert (shared.hits, shared.misses) == (1, 1)
+
+
+def test_redis_cache_clear_only_touches_its_prefix(fake_redis):
+    feed = RedisCache(fake_redis, "feed", SECRET)
+    count = RedisCache(fake_redis, "count", SECRET)
+    feed.set("a", 1)
+    feed.set("b", 2)
+    count.set("a", 3)
+    feed.clear()
+    assert feed.get("a") is None and feed.get("b") is None
+    assert count.get("a") == 3
+
+
+def test_redis_cache_errors_degrade_to_misses(fake_redis):
+    fake_redis.fail = True
+    shared = RedisCache(fake_redis, "feed", SECRET)
+    shared.set("a", 1)
+    shared.delete("a")
+    shared.clear()
+    assert shared.get("a", "default") == "default"
+
+
+def test_shared_backends_require_a_secret(tmp_path, monkeypatch):
+    monkeypatch.delenv("FLASK_SECRET_KEY", raising=False)
+    with pytest.raises(RuntimeError):
+        CacheFactory(backend="sqlite", path=tmp_path / "cache.sqlite3", bus_path=False)
+    factory = CacheFactory(backend="sqlite", path=tmp_path / "cache.sqlite3", bus_path=False, secret=SECRET)
+    factory.create("feed").set("k", "v")
+    assert factory.caches["feed"].get("k") == "v"
+
+
+def test_signed_pickle_rejects_foreign_payloads():
+    values = SignedPickle(SECRET)
+    assert values.loads(values.dumps({"a": (1, 2)})) == {"a": (1, 2)}
+    with pytest.raises(ValueError):
+        values.loads(pickle.dumps("planted"))
+    with pytest.raises(ValueError):
+        SignedPickle("other-secret").loads(values.dumps("value"))
+
+
+def test_sqlite_cache_drops_unsigned_entries(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    shared = SQLiteCache(path, "session", SECRET)
+    shared.set("sid", {"user": 1})
+    # Another writer plants a plain pickle under the same key.
+    shared._connection().execute(
+        "update cache_entries set value = ? where cache = ?", (pickle.dumps({"user": 2}), "session")
+    )
+    assert shared.get("sid") is None
+    assert shared.stats()["size"] == 0
+    shared.set("sid", {"user": 1})
+    assert SQLiteCache(path, "session", "other-secret").get("sid") is None
+
+
+def test_redis_cache_drops_unsigned_entries(fake_redis):
+    shared = RedisCache(fake_redis, "feed", SECRET)
+    shared.set("a", 1)
+    key = next(iter(fake_redis.data))
+    fake_redis.data[key] = pickle.dumps(2)
+    assert shared.get("a", "default") == "default"
+    assert key not in fake_redis.data
+
+
+def test_bus_round_trips_keys_as_json(tmp_path):
+    path = tmp_path / "bus.sqlite3"
+    bus_a = InvalidationBus(path, poll_interval=0)
+    bus_b = InvalidationBus(path, poll_interval=0)
+    seen = []
+    bus_b.subscribe("feed", seen.append)
+    bus_a.publish("feed", ("Dinner", None, 30, 12, 0))
+    bus_a.publish("feed", {1, 2})  # not JSON-encodable: falls back to ALL
+    bus_b.poll(force=True)
+    assert seen == [("Dinner", None, 30, 12, 0), ALL]
+    payloads = [row[0] for row in bus_b._connection().execute("select cache_key from invalidations")]
+    assert payloads == ['["Dinner", null, 30, 12, 0]', None]
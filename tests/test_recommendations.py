@@ -0,0 +1,23 @@
+from recommendations import build_all, merge_neighbor, top_neighbors
+
+
+def doc(recipe_id, ingredients, author_id=None):
+    return {"id": recipe_id, "ingredients": ingredients, "tags": [], "category": None, "author_id": author_id}
+
+
+def test_equal_scores_rank_lower_ids_first_everywhere():
+    docs = [doc(1, ["a", "b"]), doc(5, ["a", "c"]), doc(3, ["a", "d"]), doc(4, ["a", "e"])]
+    full = build_all(docs, k=2)
+    assert [rid for rid, _ in full[1]] == [3, 4]
+    assert top_neighbors(docs[0], docs[1:], k=2) == full[1]
+
+    # Re-merging an equal-score recipe keeps the order a full rebuild produces.
+    assert merge_neighbor(full[1], 5, full[1][0][1], k=2) is None
+    current = [(3, full[1][0][1]), (5, full[1][0][1])]
+    assert merge_neighbor(current, 4, full[1][0][1], k=2) == full[1]
+
+
+def test_merge_neighbor_drops_removed_and_zero_scores():
+    assert merge_neighbor([(2, 0.5), (3, 0.4)], 3, 0.0, k=2) == [(2, 0.5)]
+    assert merge_neighbor([(2, 0.5)], 9, 0.0, k=2) is None
+    assert merge_neighbor([(2, 0.5)], 9, 0.7, k=2) == [(9, 0.7), (2, 0.5)]
@@ -0,0 +1,83 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("mysql.connector")  # migrations imports its Error class
+
+from cache import CacheFactory  # noqa: E402
+from metrics import QueryBudgetExceeded, QueryMetrics  # noqa: E402
+
+
+class StubDB():
+    """Stands in for dbhandler.DBHandler: no MySQL, autocomplete statements go straight to the metrics."""
+    def __init__(self):
+        self.metrics = QueryMetrics(slow_ms=10_000)
+        self.caches = CacheFactory(backend="local", bus_path=False)
+        self.statements = []
+
+    def autocomplete_recipes(self, query, limit=5):
+        for sql in self.statements:
+            self.metrics.record("autocomplete_recipes", sql, 0.002, 1)
+        return []
+
+    def __getattr__(self, name):
+        # Startup and teardown hooks (build_search_index, release, use_job_queue, ...) are no-ops.
+        return lambda *args, **kwargs: None
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("app")
+    env = {
+        "DB_USER": "test", "DB_PASSWORD": "test", "DB_HOST": "localhost", "DB_NAME": "test",
+        "SESSION_BACKEND": "local", "CACHE_BUS_PATH": "off", "VERIFY_INDEXES": "0",
+        "JOB_QUEUE_PATH": str(tmp / "jobs.sqlite3"), "JOB_WORKERS": "0",
+        "QUERY_BUDGET": "4", "N_PLUS_ONE_THRESHOLD": "3",
+    }
+    with pytest.MonkeyPatch.context() as patch:
+        for key, value in env.items():
+            patch.setenv(key, value)
+        patch.setitem(sys.modules, "dbhandler", types.SimpleNamespace(DBHandler=StubDB))
+        patch.delitem(sys.modules, "app", raising=False)
+        import app
+        app.app.config["TESTING"] = True
+        yield app
+    sys.modules.pop("app", None)
+
+
+@pytest.fixture
+def client(app_module):
+    app_module.mydb.statements = []
+    return app_module.app.test_client()
+
+
+def test_server_timing_reports_the_request_queries(app_module, client):
+    app_module.mydb.statements = ["select 1", "select 2"]
+    response = client.get("/api/search?q=ch")
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert 'desc="2 queries, 2 rows"' in timing
+    assert "db;dur=" in timing and "tpl;dur=" in timing and "total;dur=" in timing
+
+
+def test_query_budget_fails_the_request_under_test(app_module, client):
+    app_module.mydb.statements = [f"select {i}" for i in range(5)]
+    with pytest.raises(QueryBudgetExceeded, match=r"5 DB round-trips \(budget 4\)"):
+        client.get("/api/search?q=ch")
+
+
+def test_repeated_statement_is_reported_as_n_plus_one(app_module, client):
+    app_module.mydb.statements = ["select * from Recipes where recipe_id = %s"] * 3
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1: autocomplete_recipes ran 3x"):
+        client.get("/api/search?q=ch")
+
+
+def test_server_timing_can_be_disabled(app_module, client):
+    app_module.app.config["SERVER_TIMING"] = False
+    try:
+        response = client.get("/api/search?q=ch")
+    finally:
+        app_module.app.config["SERVER_TIMING"] = True
+    assert "Server-Timing" not in response.headers
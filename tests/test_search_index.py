@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from search_index import AutocompleteIndex, SearchIndex, tokenize
+
+
+def doc(recipe_id, title, ingredients=(), tags=(), category=None, author=None):
+    return {
+        "id": recipe_id,
+        "title": title,
+        "ingredients": list(ingredients),
+        "tags": list(tags),
+        "category": category,
+        "author": author,
+        "date_posted": datetime(2025, 1, recipe_id),
+        "rating": None,
+    }
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("Limón crème BRÛLÉE") == ["limon", "creme", "brulee"]
+    assert tokenize("Jalapeño-poppers_2") == ["jalapeno", "poppers", "2"]
+    assert tokenize("Straße") == ["strasse"]
+    assert tokenize(None) == []
+
+
+def test_search_matches_accented_words_with_or_without_accents():
+    index = SearchIndex()
+    index.build([
+        doc(1, "Crème brûlée", ingredients=["cream", "sugar"]),
+        doc(2, "Lemon meringue", ingredients=["lemon", "egg"]),
+        doc(3, "Limón pie", ingredients=["limón"]),
+    ])
+    assert index.search("crème") == [1]
+    assert index.search("creme brulee") == [1]
+    assert index.search("LIMON") == [3]
+    assert index.search("cr me") == []
+
+
+def test_autocomplete_matches_accented_prefixes():
+    index = AutocompleteIndex()
+    index.build([doc(1, "Crème brûlée"), doc(2, "Cream cheese frosting")])
+    assert [card["id"] for card in index.suggest("crèm")] == [1]
+    assert [card["id"] for card in index.suggest("brul")] == [1]
+
+
+def test_autocomplete_intersects_tokens_beyond_the_candidate_cap():
+    index = AutocompleteIndex(max_candidates=10)
+    docs = [doc(i, f"Chicken{i} stew") for i in range(1, 29)]
+    docs.append(doc(29, "Chicken29 with garlic"))
+    index.build(docs)
+    # "chi" alone expands the shortest terms first and stops at the cap.
+    assert 29 not in [card["id"] for card in index.suggest("chi", limit=50)]
+    assert [card["id"] for card in index.suggest("chi garlic")] == [29]
+
+
+def test_autocomplete_matches_category_and_author():
+    index = AutocompleteIndex()
+    index.build([
+        doc(1, "Tomato soup", category="Soup", author="Ana Pérez"),
+        doc(2, "Apple pie", category="Dessert", author="Ben Stone"),
+    ])
+    assert [card["id"] for card in index.suggest("dess")] == [2]
+    assert [card["id"] for card in index.suggest("perez")] == [1]